@@ -99,6 +99,22 @@ class AxisAlignedBoundingBox:
             (x_min <= x <= x_max) and
             (y_min <= y <= y_max))
 
+    def distance_squared(self, x, y):
+        """
+        @return the squared distance from (x, y) to the nearest point in the box, which is 0 if the box contains (x, y)
+
+        >>> box = AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=2, half_size_y=2)
+        >>> box.distance_squared(1, -1)
+        0
+        >>> box.distance_squared(5, 0)
+        9
+        >>> box.distance_squared(-5, 6)
+        25
+        """
+        delta_x = max(self.center_x - self.half_size_x - x, 0, x - self.center_x - self.half_size_x)
+        delta_y = max(self.center_y - self.half_size_y - y, 0, y - self.center_y - self.half_size_y)
+        return delta_x**2 + delta_y**2
+
     def intersects(self, other):
         """
         @param other AxisAlignedBoundingBox
@@ -171,6 +187,28 @@ class AxisAlignedBoundingBox:
             and self_y_min <= other_y_max
             and self_y_max >= other_y_min)
 
+    def contains_box(self, other):
+        """
+        @param other AxisAlignedBoundingBox
+        @return true if this contains every point of the other AABB, including the points on its edges
+
+        >>> box = AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=2, half_size_y=2)
+        >>> box.contains_box(box)
+        True
+        >>> box.contains_box(AxisAlignedBoundingBox(center_x=1, center_y=-1, half_size_x=1, half_size_y=1))
+        True
+        >>> box.contains_box(AxisAlignedBoundingBox(center_x=2, center_y=0, half_size_x=1, half_size_y=1))
+        False
+        >>> box.contains_box(AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=3, half_size_y=1))
+        False
+        """
+        assert other is not None
+
+        return (self.center_x - self.half_size_x <= other.center_x - other.half_size_x
+            and other.center_x + other.half_size_x <= self.center_x + self.half_size_x
+            and self.center_y - self.half_size_y <= other.center_y - other.half_size_y
+            and other.center_y + other.half_size_y <= self.center_y + self.half_size_y)
+
     def __repr__(self):
         """
         >>> repr(AxisAlignedBoundingBox(center_x=1, center_y=2, half_size_x=3, half_size_y=4))
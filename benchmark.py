@@ -0,0 +1,493 @@
+"""
+Benchmarks PointQuadTree over a matrix of point distributions, sizes, and node capacities.
+
+Each scenario times every operation separately: insert (building the whole tree), remove,
+churn (a remove followed by an insert), translate_point, small, large and empty region queries,
+and get_all_points.  Each scenario is run once to warm up and then repeatedly, and the reported
+time for an operation is the median, over the repetitions, of the time per operation.
+Every run is seeded, so the same arguments always produce the same workload.
+
+With --memory, each scenario instead measures, with tracemalloc, the bytes allocated for the point
+objects and, separately, the bytes that the tree allocates to hold them.
+
+Examples:
+    python benchmark.py --output baseline.json
+    python benchmark.py --distributions uniform --sizes 1000000 --compare baseline.json
+    python benchmark.py --profile --sizes 1000 --node-capacities 1 4 20 100
+    python benchmark.py --instrumentation latency --compare baseline.json
+    python benchmark.py --memory --node-capacities 1 4 20 100 --output memory_baseline.json
+"""
+
+from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+from point_quad_tree_hooks import LatencyHistogramRecorder
+import argparse
+import cProfile
+import gc
+import json
+import math
+import platform
+import pstats
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+DEFAULT_NODE_CAPACITIES = (20,)
+DEFAULT_REPETITIONS = 3
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+
+# The number of times that each operation other than insert is timed, per repetition.
+NUM_OPERATIONS = 1000
+
+# Small queries are sized to hold about this many points of a uniform distribution.
+SMALL_QUERY_EXPECTED_POINTS = 10
+LARGE_QUERY_HALF_SIZE = 0.25
+TRANSLATE_DISTANCE = 0.001
+
+NUM_CLUSTERS = 10
+CLUSTER_STANDARD_DEVIATION = 0.02
+LINE_NOISE = 0.001
+POINTS_PER_DUPLICATE_POSITION = 10
+
+OPERATIONS = (
+    'insert',
+    'remove',
+    'churn',
+    'translate_point',
+    'query_small',
+    'query_large',
+    'query_empty',
+    'get_all_points',
+)
+
+
+def _clamp(value):
+    return min(max(value, 0.0), 1.0)
+
+
+def generate_uniform_positions(rng, num_points):
+    return [(rng.random(), rng.random()) for i in range(num_points)]
+
+
+def generate_clustered_positions(rng, num_points):
+    """
+    Gaussian clusters around NUM_CLUSTERS random centers.
+    """
+    centers = [(rng.random(), rng.random()) for i in range(NUM_CLUSTERS)]
+    positions = []
+    for i in range(num_points):
+        center_x, center_y = rng.choice(centers)
+        positions.append((
+            _clamp(rng.gauss(center_x, CLUSTER_STANDARD_DEVIATION)),
+            _clamp(rng.gauss(center_y, CLUSTER_STANDARD_DEVIATION))))
+    return positions
+
+
+def generate_line_positions(rng, num_points):
+    """
+    Points along the diagonal, which subdivides the tree deeply along one direction.
+    """
+    positions = []
+    for i in range(num_points):
+        t = rng.random()
+        positions.append((t, _clamp(t + rng.uniform(-LINE_NOISE, LINE_NOISE))))
+    return positions
+
+
+def generate_duplicate_positions(rng, num_points):
+    """
+    About POINTS_PER_DUPLICATE_POSITION points share each position.
+    """
+    num_positions = max(1, num_points // POINTS_PER_DUPLICATE_POSITION)
+    distinct_positions = generate_uniform_positions(rng, num_positions)
+    return [rng.choice(distinct_positions) for i in range(num_points)]
+
+
+DISTRIBUTIONS = {
+    'uniform': generate_uniform_positions,
+    'clustered': generate_clustered_positions,
+    'line': generate_line_positions,
+    'duplicates': generate_duplicate_positions,
+}
+
+
+def _enable_stats(tree):
+    tree.enable_stats()
+
+
+def _enable_latency_histograms(tree):
+    tree.add_operation_hook(LatencyHistogramRecorder())
+
+
+# Functions that enable instrumentation on a tree, for measuring the instrumentation's overhead.
+INSTRUMENTATIONS = {
+    'none': lambda tree: None,
+    'stats': _enable_stats,
+    'latency': _enable_latency_histograms,
+}
+
+
+class BenchmarkScenario:
+    """
+    >>> scenario = BenchmarkScenario('clustered', 200, node_capacity=4, seed=1)
+    >>> times = scenario.run()
+    >>> sorted(times) == sorted(OPERATIONS)
+    True
+    >>> all(seconds >= 0 for seconds in times.values())
+    True
+
+    The workload is reproducible:
+    >>> scenario._positions == BenchmarkScenario('clustered', 200, node_capacity=4, seed=1)._positions
+    True
+    """
+
+    def __init__(self, distribution, num_points, node_capacity, seed, instrumentation='none'):
+        """
+        @param distribution String A key of DISTRIBUTIONS
+        @param num_points Integer
+        @param node_capacity Integer The node-capacity to use for the PointQuadTree
+        @param seed Integer The random-number-generator seed
+        @param instrumentation String A key of INSTRUMENTATIONS
+        """
+        self.distribution = distribution
+        self.num_points = num_points
+        self.node_capacity = node_capacity
+        self._seed = seed
+        self._enable_instrumentation = INSTRUMENTATIONS[instrumentation]
+
+        rng = random.Random(seed)
+        self._generate_positions = DISTRIBUTIONS[distribution]
+        self._positions = self._generate_positions(rng, num_points)
+
+        small_query_half_size = 0.5 * math.sqrt(SMALL_QUERY_EXPECTED_POINTS / num_points)
+        self._small_queries = [self._create_query(rng, small_query_half_size) for i in range(NUM_OPERATIONS)]
+        self._large_queries = [self._create_query(rng, LARGE_QUERY_HALF_SIZE) for i in range(NUM_OPERATIONS)]
+        # Zero-sized queries descend to a leaf but almost never contain a point.
+        self._empty_queries = [self._create_query(rng, 0) for i in range(NUM_OPERATIONS)]
+
+    @staticmethod
+    def _create_query(rng, half_size):
+        return AxisAlignedBoundingBox(center_x=rng.random(), center_y=rng.random(), half_size_x=half_size, half_size_y=half_size)
+
+    def run(self):
+        """
+        @return {operation: seconds per operation}
+        """
+        rng = random.Random(self._seed)
+        tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=self.node_capacity)
+        self._enable_instrumentation(tree)
+        points = [Point(x, y) for (x, y) in self._positions]
+
+        times = {}
+        times['insert'] = self._time(self._insert, tree, points) / len(points)
+        times['query_small'] = self._time(self._query, tree, self._small_queries) / NUM_OPERATIONS
+        times['query_large'] = self._time(self._query, tree, self._large_queries) / NUM_OPERATIONS
+        times['query_empty'] = self._time(self._query, tree, self._empty_queries) / NUM_OPERATIONS
+        times['get_all_points'] = self._time(tree.get_all_points)
+
+        translations = [(rng.choice(points), rng.uniform(-TRANSLATE_DISTANCE, TRANSLATE_DISTANCE), rng.uniform(-TRANSLATE_DISTANCE, TRANSLATE_DISTANCE)) for i in range(NUM_OPERATIONS)]
+        times['translate_point'] = self._time(self._translate, tree, translations) / NUM_OPERATIONS
+
+        rng.shuffle(points)
+        num_churned = min(NUM_OPERATIONS, len(points))
+        new_points = [Point(x, y) for (x, y) in self._generate_positions(rng, num_churned)]
+        times['churn'] = self._time(self._churn, tree, points[:num_churned], new_points) / num_churned
+
+        points_to_remove = new_points[:NUM_OPERATIONS // 2] + points[num_churned:][:NUM_OPERATIONS - NUM_OPERATIONS // 2]
+        times['remove'] = self._time(self._remove, tree, points_to_remove) / len(points_to_remove)
+
+        return times
+
+    @staticmethod
+    def _time(function, *args):
+        start_time = time.perf_counter()
+        function(*args)
+        return time.perf_counter() - start_time
+
+    @staticmethod
+    def _insert(tree, points):
+        for point in points:
+            tree.insert(point)
+
+    @staticmethod
+    def _remove(tree, points):
+        for point in points:
+            tree.remove(point)
+
+    @staticmethod
+    def _churn(tree, old_points, new_points):
+        for old_point, new_point in zip(old_points, new_points):
+            tree.remove(old_point)
+            tree.insert(new_point)
+
+    @staticmethod
+    def _translate(tree, translations):
+        for point, x, y in translations:
+            # Keep the points in the tree, so that every operation is a translation.
+            if not tree.boundary.contains(point.x + x, point.y + y):
+                x, y = -x, -y
+            tree.translate_point(point, x, y)
+
+    @staticmethod
+    def _query(tree, regions):
+        for region in regions:
+            tree.query_points_in_region(region)
+
+
+def measure_memory(distribution, num_points, node_capacity, seed):
+    """
+    @return {'point_bytes_per_point', 'tree_bytes_per_point', 'tree_bytes_per_node', 'node_count'}, where the tree's bytes exclude the points
+
+    >>> memory = measure_memory('uniform', 1000, node_capacity=4, seed=0)
+    >>> memory['point_bytes_per_point'] > 0 and memory['tree_bytes_per_point'] > 0
+    True
+    >>> memory['tree_bytes_per_node'] * memory['node_count'] == memory['tree_bytes_per_point'] * 1000
+    True
+    """
+    positions = DISTRIBUTIONS[distribution](random.Random(seed), num_points)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        memory_before_points = tracemalloc.get_traced_memory()[0]
+        points = [Point(x, y) for (x, y) in positions]
+        memory_before_tree = tracemalloc.get_traced_memory()[0]
+        tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=node_capacity)
+        for point in points:
+            tree.insert(point)
+        gc.collect()
+        memory_after_tree = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    # The array holding the points belongs to the benchmark, not to the points or the tree.
+    point_bytes = memory_before_tree - memory_before_points - sys.getsizeof(points)
+    tree_bytes = memory_after_tree - memory_before_tree
+    node_count = sum(1 for node in tree._node_iterator())
+    return {
+        'point_bytes_per_point': point_bytes / num_points,
+        'tree_bytes_per_point': tree_bytes / num_points,
+        'tree_bytes_per_node': tree_bytes / node_count,
+        'node_count': node_count,
+    }
+
+
+def run_memory_benchmarks(distributions, sizes, node_capacities, seed):
+    """
+    @return an array of result dictionaries, whose operation is 'memory'
+    """
+    results = []
+    for distribution in distributions:
+        for num_points in sizes:
+            for node_capacity in node_capacities:
+                print('Measuring memory: distribution={}, num_points={}, node_capacity={}.'.format(distribution, num_points, node_capacity), file=sys.stderr)
+                result = {
+                    'distribution': distribution,
+                    'num_points': num_points,
+                    'node_capacity': node_capacity,
+                    'operation': 'memory',
+                }
+                result.update(measure_memory(distribution, num_points, node_capacity, seed))
+                results.append(result)
+    return results
+
+
+def run_benchmarks(distributions, sizes, node_capacities, repetitions, seed, instrumentation='none'):
+    """
+    @return an array of result dictionaries
+    """
+    results = []
+    for distribution in distributions:
+        for num_points in sizes:
+            for node_capacity in node_capacities:
+                scenario = BenchmarkScenario(distribution, num_points, node_capacity, seed, instrumentation)
+                print('Benchmarking: distribution={}, num_points={}, node_capacity={}.'.format(distribution, num_points, node_capacity), file=sys.stderr)
+
+                # Warm up.
+                scenario.run()
+
+                repetition_times = [scenario.run() for i in range(repetitions)]
+                for operation in OPERATIONS:
+                    seconds = [times[operation] for times in repetition_times]
+                    results.append({
+                        'distribution': distribution,
+                        'num_points': num_points,
+                        'node_capacity': node_capacity,
+                        'operation': operation,
+                        'seconds_per_operation': statistics.median(seconds),
+                        'repetitions': seconds,
+                    })
+    return results
+
+
+def profile(distributions, sizes, node_capacities, seed):
+    """
+    Prints the cProfile stats of running each scenario once.
+    """
+    for distribution in distributions:
+        for num_points in sizes:
+            for node_capacity in node_capacities:
+                print('Profiling PointQuadTree: distribution={}, num_points={}, node_capacity={}, seed={}.'.format(distribution, num_points, node_capacity, seed))
+                scenario = BenchmarkScenario(distribution, num_points, node_capacity, seed)
+                profiler = cProfile.Profile()
+                profiler.runcall(scenario.run)
+                stats_restrictions = 'point_quad_tree.py|axis_aligned_bounding_box.py|point.py'
+                pstats.Stats(profiler).strip_dirs().sort_stats('cumulative').print_stats(stats_restrictions, 0.5)
+
+
+def _get_result_key(result):
+    return (result['distribution'], result['num_points'], result['node_capacity'], result['operation'])
+
+
+def compare(baseline_results, results, threshold, metric='seconds_per_operation'):
+    """
+    @param threshold Number The fractional increase beyond which a result is a regression
+    @param metric String The result field to compare
+    @return an array of (result_key, baseline_value, value, is_regression) for the results that are in the baseline
+
+    >>> baseline = [{'distribution': 'uniform', 'num_points': 10, 'node_capacity': 1, 'operation': 'insert', 'seconds_per_operation': 1.0}]
+    >>> faster = [dict(baseline[0], seconds_per_operation=0.5)]
+    >>> slower = [dict(baseline[0], seconds_per_operation=1.2)]
+    >>> compare(baseline, faster, 0.1)
+    [(('uniform', 10, 1, 'insert'), 1.0, 0.5, False)]
+    >>> compare(baseline, slower, 0.1)
+    [(('uniform', 10, 1, 'insert'), 1.0, 1.2, True)]
+    >>> compare(baseline, slower, 0.5)
+    [(('uniform', 10, 1, 'insert'), 1.0, 1.2, False)]
+
+    >>> memory_baseline = [{'distribution': 'uniform', 'num_points': 10, 'node_capacity': 1, 'operation': 'memory', 'tree_bytes_per_point': 100.0}]
+    >>> compare(memory_baseline, [dict(memory_baseline[0], tree_bytes_per_point=120.0)], 0.1, metric='tree_bytes_per_point')
+    [(('uniform', 10, 1, 'memory'), 100.0, 120.0, True)]
+    """
+    baseline_values_by_key = {_get_result_key(result): result[metric] for result in baseline_results if metric in result}
+    comparisons = []
+    for result in results:
+        key = _get_result_key(result)
+        if key in baseline_values_by_key:
+            baseline_value = baseline_values_by_key[key]
+            value = result[metric]
+            comparisons.append((key, baseline_value, value, value > baseline_value * (1 + threshold)))
+    return comparisons
+
+
+def print_results(results):
+    print('{:<12} {:>10} {:>9} {:<16} {:>16}'.format('distribution', 'num_points', 'capacity', 'operation', 'us/operation'))
+    for result in results:
+        print('{:<12} {:>10} {:>9} {:<16} {:>16.3f}'.format(
+            result['distribution'],
+            result['num_points'],
+            result['node_capacity'],
+            result['operation'],
+            result['seconds_per_operation'] * 1e6))
+
+
+def print_memory_results(results):
+    print('{:<12} {:>10} {:>9} {:>10} {:>16} {:>16} {:>15}'.format('distribution', 'num_points', 'capacity', 'nodes', 'tree bytes/point', 'tree bytes/node', 'point bytes/point'))
+    for result in results:
+        print('{:<12} {:>10} {:>9} {:>10} {:>16.1f} {:>16.1f} {:>15.1f}'.format(
+            result['distribution'],
+            result['num_points'],
+            result['node_capacity'],
+            result['node_count'],
+            result['tree_bytes_per_point'],
+            result['tree_bytes_per_node'],
+            result['point_bytes_per_point']))
+
+
+def print_comparisons(comparisons, unit='us', scale=1e6):
+    """
+    @param unit String The unit of the compared values, after scaling
+    @param scale Number The factor to scale the compared values by
+    """
+    print('{:<12} {:>10} {:>9} {:<16} {:>14} {:>14} {:>8}'.format('distribution', 'num_points', 'capacity', 'operation', 'baseline ({})'.format(unit), 'current ({})'.format(unit), 'change'))
+    for (key, baseline_value, value, is_regression) in comparisons:
+        distribution, num_points, node_capacity, operation = key
+        print('{:<12} {:>10} {:>9} {:<16} {:>14.3f} {:>14.3f} {:>+7.1%}{}'.format(
+            distribution,
+            num_points,
+            node_capacity,
+            operation,
+            baseline_value * scale,
+            value * scale,
+            value / baseline_value - 1,
+            '  REGRESSION' if is_regression else ''))
+
+
+def parse_arguments(arguments):
+    parser = argparse.ArgumentParser(description='Benchmarks PointQuadTree.')
+    parser.add_argument('--distributions', nargs='+', choices=sorted(DISTRIBUTIONS), default=sorted(DISTRIBUTIONS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--node-capacities', nargs='+', type=int, default=DEFAULT_NODE_CAPACITIES)
+    parser.add_argument('--repetitions', type=int, default=DEFAULT_REPETITIONS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--instrumentation', choices=sorted(INSTRUMENTATIONS), default='none', help='instrumentation to enable on the benchmarked trees')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare against the results in this JSON file, and fail on regressions')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD, help='the fractional slowdown, or growth in tree bytes per point, that counts as a regression')
+    parser.add_argument('--profile', action='store_true', help='print cProfile stats of one run of each scenario instead of benchmarking')
+    parser.add_argument('--memory', action='store_true', help='measure the memory of each scenario instead of its speed')
+    return parser.parse_args(arguments)
+
+
+def main(arguments):
+    """
+    @return the process exit code, which is 1 if there are regressions
+    """
+    options = parse_arguments(arguments)
+
+    if options.profile:
+        profile(options.distributions, options.sizes, options.node_capacities, options.seed)
+        return 0
+
+    if options.memory:
+        results = run_memory_benchmarks(options.distributions, options.sizes, options.node_capacities, options.seed)
+        print_memory_results(results)
+    else:
+        results = run_benchmarks(options.distributions, options.sizes, options.node_capacities, options.repetitions, options.seed, options.instrumentation)
+        print_results(results)
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump({
+                'python_version': platform.python_version(),
+                'platform': platform.platform(),
+                'seed': options.seed,
+                'repetitions': options.repetitions,
+                'instrumentation': options.instrumentation,
+                'memory': options.memory,
+                'results': results,
+            }, output_file, indent=2)
+
+    if options.compare:
+        with open(options.compare) as baseline_file:
+            baseline_results = json.load(baseline_file)['results']
+        print()
+        if options.memory:
+            comparisons = compare(baseline_results, results, options.threshold, metric='tree_bytes_per_point')
+            print_comparisons(comparisons, unit='B/point', scale=1)
+        else:
+            comparisons = compare(baseline_results, results, options.threshold)
+            print_comparisons(comparisons)
+        if any(is_regression for (key, baseline_seconds, seconds, is_regression) in comparisons):
+            return 1
+
+    return 0
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree_complexity
+    module_dependencies = [point_quad_tree_complexity]
+
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,184 @@
+"""
+Benchmarks the accuracy and speed of PointQuadTree.approximate_field against its exact sum (theta=0).
+
+Each kernel is evaluated at a sample of the points, for several values of theta.  Reports the time
+per evaluation, the nodes visited, and the relative error of the field against the exact field.
+Also reports the cost that keeping the aggregates adds to inserting and translating points.
+
+Usage: python benchmark_barnes_hut.py [theta ...]
+"""
+
+from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+import math
+import random
+import statistics
+import sys
+import time
+
+NUM_POINTS = 20000
+NODE_CAPACITY = 8
+NUM_TARGETS = 200
+SEED = 0
+DEFAULT_THETAS = (0.25, 0.5, 1.0)
+
+# The distance within which gravity is softened, so that close points do not dominate the field.
+SOFTENING = 0.001
+
+# The flocking kernel of point_quad_tree_viewer, scaled to the unit square: points push apart closer
+# than FLOCK_IDEAL_DISTANCE and pull together farther, up to FLOCK_RADIUS.
+FLOCK_IDEAL_DISTANCE = 0.03
+FLOCK_RADIUS = 0.06
+
+
+def gravity(dx, dy, weight):
+    """
+    >>> gravity(0, 0, 1)
+    (0, 0)
+    >>> fx, fy = gravity(2, 0, 1)
+    >>> round(fx, 3), fy
+    (0.25, 0.0)
+    """
+    if dx == 0 and dy == 0:
+        return 0, 0
+    distance_squared = dx**2 + dy**2 + SOFTENING**2
+    scale = weight / (distance_squared * math.sqrt(distance_squared))
+    return dx * scale, dy * scale
+
+
+def flock(dx, dy, weight):
+    """
+    >>> flock(0, 0, 1), flock(1, 0, 1)
+    ((0, 0), (0, 0))
+    >>> fx, fy = flock(FLOCK_IDEAL_DISTANCE / 2, 0, 1)
+    >>> fx < 0, fy
+    (True, 0.0)
+    """
+    if (dx == 0 and dy == 0) or abs(dx) > FLOCK_RADIUS or abs(dy) > FLOCK_RADIUS:
+        return 0, 0
+    distance_squared = dx**2 + dy**2
+    scale = weight * (FLOCK_IDEAL_DISTANCE**2 - distance_squared) / math.sqrt(distance_squared)
+    return -dx * scale, -dy * scale
+
+
+# {name: (kernel, cutoff)}.  The flocking kernel's cutoff holds its square of side 2 * FLOCK_RADIUS.
+KERNELS = {
+    'gravity': (gravity, None),
+    'flock': (flock, FLOCK_RADIUS * math.sqrt(2)),
+}
+
+
+def generate_points(rng, num_points):
+    """
+    @return points in the unit square, half uniformly and half in gaussian clusters
+    """
+    centers = [(rng.uniform(0.2, 0.8), rng.uniform(0.2, 0.8)) for i in range(10)]
+    points = []
+    for i in range(num_points):
+        if i % 2 == 0:
+            points.append(Point(rng.random(), rng.random()))
+        else:
+            center_x, center_y = rng.choice(centers)
+            points.append(Point(min(max(rng.gauss(center_x, 0.05), 0), 1), min(max(rng.gauss(center_y, 0.05), 0), 1)))
+    return points
+
+
+def measure_field(tree, targets, theta, kernel, cutoff=None):
+    """
+    @return (fields, seconds per evaluation, nodes visited per evaluation)
+
+    theta=0 is exact:
+    >>> rng = random.Random(0)
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=4)
+    >>> points = generate_points(rng, 100)
+    >>> tree.insert_points(points) == [True] * 100
+    True
+    >>> tree.enable_aggregates()
+    >>> fields, seconds, nodes_visited = measure_field(tree, points[:5], 0, gravity)
+    >>> exact_fields = [tuple(map(sum, zip(*(gravity(point.x - target.x, point.y - target.y, 1) for point in points)))) for target in points[:5]]
+    >>> max(get_relative_error(field, exact_field) for field, exact_field in zip(fields, exact_fields)) < 1e-12
+    True
+    """
+    with tree.collect_stats() as stats:
+        start_time = time.perf_counter()
+        fields = [tree.approximate_field(target.x, target.y, theta, kernel, cutoff) for target in targets]
+        seconds = time.perf_counter() - start_time
+    return fields, seconds / len(targets), stats.get_operation_stats('approximate_field').nodes_visited / len(targets)
+
+
+def get_relative_error(field, exact_field):
+    """
+    >>> get_relative_error((1, 0), (2, 0))
+    0.5
+    """
+    error = math.hypot(field[0] - exact_field[0], field[1] - exact_field[1])
+    magnitude = math.hypot(*exact_field)
+    return error / magnitude if magnitude else error
+
+
+def measure_maintenance(points, num_translations, rng):
+    """
+    @return {(operation, aggregates_enabled): microseconds per call}
+    """
+    translations = [(rng.choice(points), rng.uniform(-0.001, 0.001), rng.uniform(-0.001, 0.001)) for i in range(num_translations)]
+    times = {}
+    for aggregates_enabled in (False, True):
+        tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=NODE_CAPACITY)
+        if aggregates_enabled:
+            tree.enable_aggregates()
+
+        start_time = time.perf_counter()
+        for point in points:
+            tree.insert(point)
+        times['insert', aggregates_enabled] = (time.perf_counter() - start_time) / len(points) * 1e6
+
+        start_time = time.perf_counter()
+        for point, x, y in translations:
+            # Translate there and back, so the points stay in the tree for the second pass.
+            tree.translate_point(point, x, y)
+            tree.translate_point(point, -x, -y)
+        times['translate_point', aggregates_enabled] = (time.perf_counter() - start_time) / (2 * len(translations)) * 1e6
+    return times
+
+
+def main(thetas):
+    print('Benchmarking approximate_field: num_points={}, node_capacity={}, num_targets={}, seed={}.'.format(
+        NUM_POINTS, NODE_CAPACITY, NUM_TARGETS, SEED))
+    rng = random.Random(SEED)
+    points = generate_points(rng, NUM_POINTS)
+    targets = rng.sample(points, NUM_TARGETS)
+
+    maintenance_times = measure_maintenance(points, NUM_TARGETS * 10, rng)
+    for operation in ('insert', 'translate_point'):
+        print('{}: {:.1f}us without aggregates, {:.1f}us with aggregates'.format(
+            operation, maintenance_times[operation, False], maintenance_times[operation, True]))
+
+    tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=NODE_CAPACITY)
+    tree.insert_points(points)
+    tree.enable_aggregates()
+
+    print('{:<8} {:>6} {:>10} {:>14} {:>8} {:>16} {:>16}'.format('kernel', 'theta', 'ms/eval', 'nodes visited', 'speedup', 'median rel error', 'max rel error'))
+    for kernel_name, (kernel, cutoff) in sorted(KERNELS.items()):
+        exact_fields, exact_seconds, exact_nodes_visited = measure_field(tree, targets, 0, kernel, cutoff)
+        print('{:<8} {:>6} {:>10.3f} {:>14.0f} {:>7.2f}x {:>16} {:>16}'.format(kernel_name, 0, exact_seconds * 1e3, exact_nodes_visited, 1, '-', '-'))
+        for theta in thetas:
+            fields, seconds, nodes_visited = measure_field(tree, targets, theta, kernel, cutoff)
+            errors = [get_relative_error(field, exact_field) for field, exact_field in zip(fields, exact_fields)]
+            print('{:<8} {:>6} {:>10.3f} {:>14.0f} {:>7.2f}x {:>16.4f} {:>16.4f}'.format(
+                kernel_name, theta, seconds * 1e3, nodes_visited, exact_seconds / seconds, statistics.median(errors), max(errors)))
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree
+    module_dependencies = [point_quad_tree]
+
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        thetas = [float(arg) for arg in sys.argv[1:]] or DEFAULT_THETAS
+        main(thetas)
@@ -0,0 +1,112 @@
+"""
+Benchmarks bursty ingest into BufferedPointQuadTree against PointQuadTree.
+
+Each burst inserts new points and removes old ones, and a fraction of the points that a burst
+inserts are removed again later in the same burst.  A small region query follows every burst.
+Reports the throughput of the mutations, including the query that applies them.
+
+Usage: python benchmark_buffering.py [burst_size ...]
+"""
+
+from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+from buffered_point_quad_tree import BufferedPointQuadTree
+import random
+import sys
+import time
+
+NUM_POINTS = 20000
+NODE_CAPACITY = 20
+NUM_MUTATIONS = 50000
+QUERY_HALF_SIZE = 0.01
+SEED = 0
+DEFAULT_BURST_SIZES = (10, 100, 1000, 10000)
+
+# The fraction of each burst's inserted points that the burst removes again.
+TRANSIENT_FRACTION = 0.3
+
+
+def generate_bursts(rng, num_points, burst_size, num_mutations):
+    """
+    @return (initial_points, bursts), where each burst is an array of ('insert' or 'remove', point)
+
+    >>> initial_points, bursts = generate_bursts(random.Random(0), 10, burst_size=10, num_mutations=100)
+    >>> len(initial_points), len(bursts), sum(len(burst) for burst in bursts)
+    (10, 10, 100)
+    """
+    points = [Point(rng.random(), rng.random()) for i in range(num_points)]
+    initial_points = list(points)
+    bursts = []
+    for burst_index in range(num_mutations // burst_size):
+        burst = []
+        transient_points = []
+        while len(burst) < burst_size:
+            choice = rng.random()
+            if choice < 0.4 or not points:
+                point = Point(rng.random(), rng.random())
+                burst.append(('insert', point))
+                if rng.random() < TRANSIENT_FRACTION:
+                    transient_points.append(point)
+                else:
+                    points.append(point)
+            elif choice < 0.7 and transient_points:
+                burst.append(('remove', transient_points.pop(rng.randrange(len(transient_points)))))
+            else:
+                index = rng.randrange(len(points))
+                points[index], points[-1] = points[-1], points[index]
+                burst.append(('remove', points.pop()))
+        bursts.append(burst)
+    return initial_points, bursts
+
+
+def run(tree, initial_points, bursts, queries):
+    """
+    @param tree PointQuadTree or BufferedPointQuadTree
+    @return mutations per second
+    """
+    for point in initial_points:
+        tree.insert(point)
+    tree.get_all_points()
+
+    num_mutations = 0
+    start_time = time.perf_counter()
+    for burst, query in zip(bursts, queries):
+        for mutation, point in burst:
+            if mutation == 'insert':
+                tree.insert(point)
+            else:
+                tree.remove(point)
+        tree.query_points_in_region(query)
+        num_mutations += len(burst)
+    return num_mutations / (time.perf_counter() - start_time)
+
+
+def main(burst_sizes):
+    print('Benchmarking bursty ingest: num_points={}, node_capacity={}, num_mutations={}, transient_fraction={}, seed={}.'.format(
+        NUM_POINTS, NODE_CAPACITY, NUM_MUTATIONS, TRANSIENT_FRACTION, SEED))
+    print('{:>10} {:>20} {:>20} {:>8}'.format('burst_size', 'immediate (mut/s)', 'buffered (mut/s)', 'speedup'))
+    boundary = AxisAlignedBoundingBox.positive_quadrant_box(1, 1)
+    for burst_size in burst_sizes:
+        rng = random.Random(SEED)
+        initial_points, bursts = generate_bursts(rng, NUM_POINTS, burst_size, NUM_MUTATIONS)
+        queries = [AxisAlignedBoundingBox(rng.random(), rng.random(), QUERY_HALF_SIZE, QUERY_HALF_SIZE) for burst in bursts]
+
+        immediate_rate = run(PointQuadTree(boundary=boundary, node_capacity=NODE_CAPACITY), initial_points, bursts, queries)
+        buffered_rate = run(BufferedPointQuadTree(boundary=boundary, node_capacity=NODE_CAPACITY), initial_points, bursts, queries)
+        print('{:>10} {:>20.0f} {:>20.0f} {:>7.2f}x'.format(burst_size, immediate_rate, buffered_rate, buffered_rate / immediate_rate))
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import buffered_point_quad_tree
+    module_dependencies = [buffered_point_quad_tree]
+
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        burst_sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_BURST_SIZES
+        main(burst_sizes)
@@ -0,0 +1,118 @@
+"""
+Benchmarks incremental checkpoints against the change rate: the fraction of the points that are translated
+between checkpoints, either uniformly or concentrated in a hotspot.  Compares each checkpoint's time and size
+against a base image of the whole tree, and measures the overhead of change tracking on translate_point.
+
+Frames are written to memory, so the times do not include the disk.
+
+Usage: python benchmark_checkpoints.py [change_rate ...]
+"""
+
+from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+import point_quad_tree_checkpoints
+import io
+import random
+import sys
+import time
+
+NUM_POINTS = 100000
+NODE_CAPACITY = 8
+NUM_CHECKPOINTS = 5
+STEP_SIZE = 0.002
+SEED = 0
+DEFAULT_CHANGE_RATES = (0.0001, 0.001, 0.01, 0.1)
+
+# The hotspot's translations are of the points in this region, which holds about 4% of them.
+HOTSPOT = AxisAlignedBoundingBox(center_x=0.3, center_y=0.6, half_size_x=0.1, half_size_y=0.1)
+
+
+def translate_points(tree, points, rng):
+    """
+    Translates each point by a small random step, in one translate_point per point.
+    """
+    for point in points:
+        tree.translate_point(point, rng.uniform(-STEP_SIZE, STEP_SIZE), rng.uniform(-STEP_SIZE, STEP_SIZE))
+
+
+def measure_checkpoints(tree, candidate_points, num_changes, rng):
+    """
+    @return (seconds per checkpoint, bytes per checkpoint, node records per checkpoint)
+
+    >>> rng = random.Random(0)
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=4)
+    >>> points = [Point(rng.random(), rng.random()) for i in range(1000)]
+    >>> _ = tree.insert_points(points)
+    >>> base_record_count = point_quad_tree_checkpoints.write_base_image(tree, io.BytesIO())
+    >>> seconds, num_bytes, num_records = measure_checkpoints(tree, points, 10, rng)
+    >>> 0 < num_records < base_record_count / 10
+    True
+    """
+    seconds = 0
+    num_bytes = 0
+    num_records = 0
+    for i in range(NUM_CHECKPOINTS):
+        translate_points(tree, rng.sample(candidate_points, min(num_changes, len(candidate_points))), rng)
+        file = io.BytesIO()
+        start_time = time.perf_counter()
+        num_records += point_quad_tree_checkpoints.write_checkpoint(tree, file)
+        seconds += time.perf_counter() - start_time
+        num_bytes += file.tell()
+    return seconds / NUM_CHECKPOINTS, num_bytes / NUM_CHECKPOINTS, num_records / NUM_CHECKPOINTS
+
+
+def measure_translate(tree, points, rng):
+    """
+    @return seconds per translate_point
+    """
+    start_time = time.perf_counter()
+    translate_points(tree, points, rng)
+    return (time.perf_counter() - start_time) / len(points)
+
+
+def main(change_rates):
+    print('Benchmarking checkpoints: num_points={}, node_capacity={}, num_checkpoints={}, seed={}.'.format(
+        NUM_POINTS, NODE_CAPACITY, NUM_CHECKPOINTS, SEED))
+    rng = random.Random(SEED)
+    tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=NODE_CAPACITY)
+    points = [Point(rng.random(), rng.random()) for i in range(NUM_POINTS)]
+    tree.insert_points(points)
+    hotspot_points = tree.query_points_in_region(HOTSPOT)
+
+    sample_points = rng.sample(points, 10000)
+    untracked_seconds = measure_translate(tree, sample_points, rng)
+
+    file = io.BytesIO()
+    start_time = time.perf_counter()
+    base_record_count = point_quad_tree_checkpoints.write_base_image(tree, file)
+    base_seconds = time.perf_counter() - start_time
+    base_bytes = file.tell()
+    print('Base image: {:.1f} ms, {:.1f} MB, {} node records.'.format(base_seconds * 1e3, base_bytes / 1e6, base_record_count))
+
+    tracked_seconds = measure_translate(tree, sample_points, rng)
+    print('translate_point: {:.2f} us untracked, {:.2f} us tracked.'.format(untracked_seconds * 1e6, tracked_seconds * 1e6))
+    point_quad_tree_checkpoints.write_checkpoint(tree, io.BytesIO())
+
+    print('{:>10} {:>10} {:>10} {:>16} {:>12} {:>14} {:>10}'.format(
+        'changes', 'traffic', 'records', 'checkpoint (ms)', 'size (KB)', 'of base time', 'of size'))
+    for change_rate in change_rates:
+        num_changes = max(1, int(change_rate * NUM_POINTS))
+        for traffic, candidate_points in (('uniform', points), ('hotspot', hotspot_points)):
+            seconds, num_bytes, num_records = measure_checkpoints(tree, candidate_points, num_changes, rng)
+            print('{:>10} {:>10} {:>10.0f} {:>16.2f} {:>12.1f} {:>13.1%} {:>9.1%}'.format(
+                num_changes, traffic, num_records, seconds * 1e3, num_bytes / 1e3, seconds / base_seconds, num_bytes / base_bytes))
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    module_dependencies = [point_quad_tree_checkpoints]
+
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        change_rates = [float(arg) for arg in sys.argv[1:]] or DEFAULT_CHANGE_RATES
+        main(change_rates)
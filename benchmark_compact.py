@@ -0,0 +1,112 @@
+"""
+Benchmarks CompactPointQuadTree against a PointQuadTree of Point objects, indexing the same (x, y, id) records.
+
+For each size, reports the time to build each tree from the records, the memory that building it
+allocates (including, for PointQuadTree, the Point objects that wrap the records), and the time of
+small and large region queries.
+
+Usage: python benchmark_compact.py [num_points ...]
+"""
+
+from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+from compact_point_quad_tree import CompactPointQuadTree
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+NODE_CAPACITY = 20
+NUM_QUERIES = 1000
+SMALL_QUERY_HALF_SIZE = 0.01
+LARGE_QUERY_HALF_SIZE = 0.1
+SEED = 0
+DEFAULT_SIZES = (10000, 100000, 1000000)
+
+
+class IdPoint(Point):
+    def __init__(self, x, y, point_id):
+        super().__init__(x, y)
+        self.point_id = point_id
+
+
+def build_point_tree(records):
+    tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=NODE_CAPACITY)
+    for x, y, point_id in records:
+        tree.insert(IdPoint(x, y, point_id))
+    return tree
+
+
+def query_point_tree(tree, region):
+    return [point.point_id for point in tree.query_points_in_region(region)]
+
+
+def build_compact_tree(records):
+    tree = CompactPointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=NODE_CAPACITY)
+    tree.insert_many(records)
+    return tree
+
+
+def query_compact_tree(tree, region):
+    return tree.query_ids_in_region(region)
+
+
+def measure(build, query, records, small_queries, large_queries):
+    """
+    @return (build_seconds_per_point, bytes_per_point, small_query_seconds, large_query_seconds)
+
+    >>> records = [(0.5, 0.5, 1), (0.25, 0.25, 2)]
+    >>> queries = [AxisAlignedBoundingBox(0.5, 0.5, 0.1, 0.1)]
+    >>> all(value > 0 for value in measure(build_compact_tree, query_compact_tree, records, queries, queries))
+    True
+    """
+    gc.collect()
+    tracemalloc.start()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    tree = build(records)
+    end_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start_time = time.perf_counter()
+    build(records)
+    build_seconds = time.perf_counter() - start_time
+
+    query_seconds = []
+    for queries in (small_queries, large_queries):
+        start_time = time.perf_counter()
+        for region in queries:
+            query(tree, region)
+        query_seconds.append((time.perf_counter() - start_time) / len(queries))
+
+    return build_seconds / len(records), (end_memory - start_memory) / len(records), query_seconds[0], query_seconds[1]
+
+
+def main(sizes):
+    print('Benchmarking compact storage: node_capacity={}, num_queries={}, seed={}.'.format(NODE_CAPACITY, NUM_QUERIES, SEED))
+    print('{:>10} {:<10} {:>16} {:>14} {:>16} {:>16}'.format('num_points', 'storage', 'build (us/point)', 'bytes/point', 'small query (us)', 'large query (us)'))
+    for num_points in sizes:
+        rng = random.Random(SEED)
+        records = [(rng.random(), rng.random(), point_id) for point_id in range(num_points)]
+        small_queries = [AxisAlignedBoundingBox(rng.random(), rng.random(), SMALL_QUERY_HALF_SIZE, SMALL_QUERY_HALF_SIZE) for i in range(NUM_QUERIES)]
+        large_queries = [AxisAlignedBoundingBox(rng.random(), rng.random(), LARGE_QUERY_HALF_SIZE, LARGE_QUERY_HALF_SIZE) for i in range(NUM_QUERIES // 10)]
+        for name, build, query in (('Point', build_point_tree, query_point_tree), ('compact', build_compact_tree, query_compact_tree)):
+            build_seconds, bytes_per_point, small_query_seconds, large_query_seconds = measure(build, query, records, small_queries, large_queries)
+            print('{:>10} {:<10} {:>16.2f} {:>14.1f} {:>16.1f} {:>16.1f}'.format(
+                num_points, name, build_seconds * 1e6, bytes_per_point, small_query_seconds * 1e6, large_query_seconds * 1e6))
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import compact_point_quad_tree
+    module_dependencies = [compact_point_quad_tree]
+
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+        main(sizes)
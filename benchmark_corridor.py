@@ -0,0 +1,112 @@
+"""
+Benchmarks PointQuadTree.query_points_near_polyline against querying the bounding box of each of a
+route's segments, widened by the corridor's width, and then testing each point in it.
+
+Routes are random walks of diagonal segments, whose bounding boxes cover an area mostly far from them.
+
+Usage: python benchmark_corridor.py [num_segments ...]
+"""
+
+from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+from corridor import Corridor
+import math
+import random
+import sys
+import time
+
+NUM_POINTS = 100000
+NODE_CAPACITY = 8
+NUM_QUERIES = 20
+WIDTH = 0.005
+SEGMENT_LENGTH = 0.3
+SEED = 0
+DEFAULT_SEGMENT_COUNTS = (1, 4, 16)
+
+
+def generate_route(rng, num_segments):
+    """
+    @return the vertices of a route of num_segments diagonal segments of SEGMENT_LENGTH, within the unit square
+
+    >>> vertices = generate_route(random.Random(0), 4)
+    >>> len(vertices), all(0 <= x <= 1 and 0 <= y <= 1 for (x, y) in vertices)
+    (5, True)
+    """
+    vertices = [(rng.random(), rng.random())]
+    while len(vertices) <= num_segments:
+        x, y = vertices[-1]
+        angle = math.pi / 4 + math.pi / 2 * rng.randrange(4) + rng.uniform(-0.2, 0.2)
+        next_x = x + SEGMENT_LENGTH * math.cos(angle)
+        next_y = y + SEGMENT_LENGTH * math.sin(angle)
+        if 0 <= next_x <= 1 and 0 <= next_y <= 1:
+            vertices.append((next_x, next_y))
+    return vertices
+
+
+def query_bounding_boxes_then_filter(tree, vertices, width):
+    """
+    @return the Point's within width of the route, by testing every point in each segment's widened bounding box
+
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=2)
+    >>> for i in range(300):
+    ...     _ = tree.insert(Point(random.random(), random.random()))
+    >>> vertices = generate_route(random.Random(0), 4)
+    >>> sorted(map(id, query_bounding_boxes_then_filter(tree, vertices, 0.05))) == sorted(map(id, tree.query_points_near_polyline(vertices, 0.05)))
+    True
+    """
+    points_by_id = {}
+    for (x1, y1), (x2, y2) in zip(vertices, vertices[1:]):
+        corridor = Corridor([(x1, y1), (x2, y2)], width)
+        bounding_box = AxisAlignedBoundingBox(
+            center_x=(x1 + x2) / 2,
+            center_y=(y1 + y2) / 2,
+            half_size_x=abs(x2 - x1) / 2 + width,
+            half_size_y=abs(y2 - y1) / 2 + width)
+        for point in tree.query_points_in_region(bounding_box):
+            if corridor.contains_point(point):
+                points_by_id[id(point)] = point
+    return list(points_by_id.values())
+
+
+def measure(tree, query, routes):
+    """
+    @return (seconds per query, mean points returned)
+    """
+    num_points_returned = 0
+    start_time = time.perf_counter()
+    for vertices in routes:
+        num_points_returned += len(query(tree, vertices, WIDTH))
+    return (time.perf_counter() - start_time) / len(routes), num_points_returned / len(routes)
+
+
+def main(segment_counts):
+    print('Benchmarking corridor queries: num_points={}, node_capacity={}, num_queries={}, width={}, segment_length={}, seed={}.'.format(
+        NUM_POINTS, NODE_CAPACITY, NUM_QUERIES, WIDTH, SEGMENT_LENGTH, SEED))
+    rng = random.Random(SEED)
+    tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=NODE_CAPACITY)
+    for i in range(NUM_POINTS):
+        tree.insert(Point(rng.random(), rng.random()))
+
+    print('{:>10} {:>10} {:>20} {:>20} {:>8}'.format('segments', 'points', 'bbox+filter (ms)', 'corridor (ms)', 'speedup'))
+    for num_segments in segment_counts:
+        routes = [generate_route(rng, num_segments) for i in range(NUM_QUERIES)]
+        filter_seconds, num_points_returned = measure(tree, query_bounding_boxes_then_filter, routes)
+        corridor_seconds, _ = measure(tree, PointQuadTree.query_points_near_polyline, routes)
+        print('{:>10} {:>10.0f} {:>20.2f} {:>20.2f} {:>7.2f}x'.format(
+            num_segments, num_points_returned, filter_seconds * 1e3, corridor_seconds * 1e3, filter_seconds / corridor_seconds))
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree
+    module_dependencies = [point_quad_tree]
+
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        segment_counts = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SEGMENT_COUNTS
+        main(segment_counts)
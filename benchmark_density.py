@@ -0,0 +1,81 @@
+"""
+Benchmarks PointQuadTree.density_grid against counting each cell with query_points_in_region.
+
+Usage: python benchmark_density.py [cells_per_side ...]
+"""
+
+from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+import random
+import sys
+import time
+
+NUM_POINTS = 100000
+NODE_CAPACITY = 8
+SEED = 0
+DEFAULT_CELLS_PER_SIDE = (16, 64, 256)
+
+
+def query_each_cell(tree, region, cols, rows):
+    """
+    @return grid[row][col] counts, from a query of each cell.  Points on the edges between cells are counted in each of them.
+
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=4)
+    >>> tree.insert_points([Point(0.25, 0.25), Point(0.75, 0.25), Point(0.8, 0.9)])
+    [True, True, True]
+    >>> query_each_cell(tree, tree.boundary, 2, 2) == tree.density_grid(tree.boundary, 2, 2)
+    True
+    """
+    cell_half_width = (region.x_max() - region.x_min()) / cols / 2
+    cell_half_height = (region.y_max() - region.y_min()) / rows / 2
+    return [
+        [
+            len(tree.query_points_in_region(AxisAlignedBoundingBox(
+                center_x=region.x_min() + (2 * col + 1) * cell_half_width,
+                center_y=region.y_min() + (2 * row + 1) * cell_half_height,
+                half_size_x=cell_half_width,
+                half_size_y=cell_half_height)))
+            for col in range(cols)]
+        for row in range(rows)]
+
+
+def measure(function, *args):
+    """
+    @return seconds
+    """
+    start_time = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start_time
+
+
+def main(cells_per_side):
+    print('Benchmarking density grids: num_points={}, node_capacity={}, seed={}.'.format(NUM_POINTS, NODE_CAPACITY, SEED))
+    rng = random.Random(SEED)
+    tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=NODE_CAPACITY)
+    tree.insert_points(Point(rng.random(), rng.random()) for i in range(NUM_POINTS))
+
+    print('{:>8} {:>18} {:>18} {:>24}'.format('cells', 'per-cell (ms)', 'density_grid (ms)', 'with aggregates (ms)'))
+    for cells in cells_per_side:
+        query_seconds = measure(query_each_cell, tree, tree.boundary, cells, cells)
+        tree.disable_aggregates()
+        grid_seconds = measure(tree.density_grid, tree.boundary, cells, cells)
+        tree.enable_aggregates()
+        aggregate_grid_seconds = measure(tree.density_grid, tree.boundary, cells, cells)
+        print('{:>8} {:>18.1f} {:>18.1f} {:>24.1f}'.format(
+            '{0}x{0}'.format(cells), query_seconds * 1e3, grid_seconds * 1e3, aggregate_grid_seconds * 1e3))
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree
+    module_dependencies = [point_quad_tree]
+
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        cells_per_side = [int(arg) for arg in sys.argv[1:]] or DEFAULT_CELLS_PER_SIDE
+        main(cells_per_side)
@@ -0,0 +1,109 @@
+"""
+Benchmarks the query throughput of a PagedPointQuadTree against the size of its page cache, on a tree
+several times larger than most of the caches, and compares it with an in-memory CompactPointQuadTree.
+
+The tree is built once and reopened for each cache size.  Each cache is warmed up by one round of the
+queries before a second round is timed.  The pages that miss the cache are mostly read from the operating
+system's file cache rather than from the disk, so this measures the cost of a miss in Python, which is
+a lower bound of its cost on a cold disk.
+
+Usage: python benchmark_paging.py [cache_size ...]
+"""
+
+from axis_aligned_bounding_box import AxisAlignedBoundingBox
+from compact_point_quad_tree import CompactPointQuadTree
+from paged_point_quad_tree import PagedPointQuadTree
+import os
+import random
+import sys
+import tempfile
+import time
+
+NUM_POINTS = 200000
+NODE_CAPACITY = 32
+NUM_QUERIES = 2000
+QUERY_HALF_SIZE = 0.01
+SEED = 0
+
+# Fractions of the tree's pages.
+DEFAULT_CACHE_FRACTIONS = (0.01, 0.05, 0.1, 0.25, 0.5, 1)
+
+
+def build_tree(path, records):
+    """
+    Builds the tree in the file at path, with a cache large enough to hold all of it.
+    @return the number of pages in the tree
+    """
+    with PagedPointQuadTree(path, AxisAlignedBoundingBox.positive_quadrant_box(1, 1), NODE_CAPACITY, cache_size=len(records)) as tree:
+        tree.insert_many(records)
+        return tree.page_count
+
+
+def measure(tree, regions):
+    """
+    @return (queries per second, page reads per query)
+
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     path = os.path.join(directory, 'tree.pages')
+    ...     rng = random.Random(0)
+    ...     page_count = build_tree(path, [(rng.random(), rng.random(), point_id) for point_id in range(1000)])
+    ...     with PagedPointQuadTree.open(path, cache_size=page_count) as tree:
+    ...         print(page_count > 1, measure(tree, [AxisAlignedBoundingBox(0.5, 0.5, 0.1, 0.1)])[1])
+    True 0.0
+    """
+    for region in regions:
+        tree.query_ids_in_region(region)
+
+    page_reads = tree.page_reads
+    start_time = time.perf_counter()
+    for region in regions:
+        tree.query_ids_in_region(region)
+    seconds = time.perf_counter() - start_time
+    return len(regions) / seconds, (tree.page_reads - page_reads) / len(regions)
+
+
+def main(cache_sizes):
+    print('Benchmarking paging: num_points={}, node_capacity={}, num_queries={}, query_half_size={}, seed={}.'.format(
+        NUM_POINTS, NODE_CAPACITY, NUM_QUERIES, QUERY_HALF_SIZE, SEED))
+    rng = random.Random(SEED)
+    records = [(rng.random(), rng.random(), point_id) for point_id in range(NUM_POINTS)]
+    regions = [AxisAlignedBoundingBox(rng.random(), rng.random(), QUERY_HALF_SIZE, QUERY_HALF_SIZE) for i in range(NUM_QUERIES)]
+
+    compact_tree = CompactPointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=NODE_CAPACITY)
+    compact_tree.insert_many(records)
+    start_time = time.perf_counter()
+    for region in regions:
+        compact_tree.query_ids_in_region(region)
+    compact_queries_per_second = NUM_QUERIES / (time.perf_counter() - start_time)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tree.pages')
+        page_count = build_tree(path, records)
+        with PagedPointQuadTree.open(path) as tree:
+            page_size = tree.page_size
+        print('The tree has {} pages of {} bytes ({:.1f} MB). CompactPointQuadTree: {:.0f} queries/s.'.format(
+            page_count, page_size, page_count * page_size / 1e6, compact_queries_per_second))
+
+        print('{:>12} {:>10} {:>12} {:>12} {:>16}'.format('cache pages', 'of tree', 'cache (MB)', 'queries/s', 'reads/query'))
+        for cache_size in (cache_sizes or [max(1, int(fraction * page_count)) for fraction in DEFAULT_CACHE_FRACTIONS]):
+            with PagedPointQuadTree.open(path, cache_size=cache_size) as tree:
+                queries_per_second, reads_per_query = measure(tree, regions)
+            print('{:>12} {:>9.0%} {:>12.1f} {:>12.0f} {:>16.1f}'.format(
+                cache_size, cache_size / page_count, cache_size * page_size / 1e6, queries_per_second, reads_per_query))
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import paged_point_quad_tree
+    module_dependencies = [paged_point_quad_tree]
+
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        cache_sizes = [int(arg) for arg in sys.argv[1:]]
+        main(cache_sizes)
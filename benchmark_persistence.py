@@ -0,0 +1,115 @@
+"""
+Benchmarks PersistentPointQuadTree snapshots against deep-copying a PointQuadTree.
+
+For each strategy, applies a sequence of mutations to a tree of NUM_POINTS points and keeps a
+version after every mutation, then reports the time per mutation (including taking the version)
+and the memory retained per version.
+"""
+
+from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+from persistent_point_quad_tree import PersistentPointQuadTree
+import copy
+import random
+import time
+import tracemalloc
+
+NUM_POINTS = 10000
+NODE_CAPACITY = 20
+SEED = 0
+
+# Deep copies are expensive, so fewer versions are kept for that strategy.
+NUM_PERSISTENT_VERSIONS = 1000
+NUM_DEEP_COPY_VERSIONS = 20
+
+
+class PersistenceBenchmarkRunner:
+    def __init__(self, tree_class, take_version):
+        """
+        @param tree_class The PointQuadTree-compatible class to benchmark
+        @param take_version Function(tree) -> version
+        """
+        boundary = AxisAlignedBoundingBox.positive_quadrant_box(1, 1)
+        self._tree = tree_class(boundary=boundary, node_capacity=NODE_CAPACITY)
+        self._take_version = take_version
+        self._points = []
+
+    def run(self, seed, num_points, num_versions):
+        """
+        @param seed Integer The random-number-generator seed
+        @param num_points Integer The number of points in the tree
+        @param num_versions Integer The number of mutations to apply, each followed by taking a version
+        @return (seconds_per_mutation, bytes_per_version)
+        """
+        random.seed(seed)
+        for i in range(num_points):
+            self._insert_random_point()
+
+        versions = []
+        tracemalloc.start()
+        start_memory, _ = tracemalloc.get_traced_memory()
+        start_time = time.perf_counter()
+        for i in range(num_versions):
+            self._mutate()
+            versions.append(self._take_version(self._tree))
+        elapsed_time = time.perf_counter() - start_time
+        end_memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return elapsed_time / num_versions, (end_memory - start_memory) / num_versions
+
+    def _mutate(self):
+        """
+        Applies one of insert, remove, or translate_point, chosen at random.
+        """
+        choice = random.randrange(3)
+        if choice == 0:
+            self._insert_random_point()
+        elif choice == 1:
+            point = self._points.pop(random.randrange(len(self._points)))
+            self._tree.remove(point)
+        else:
+            point = random.choice(self._points)
+            translate_result = self._tree.translate_point(point, random.uniform(-0.01, 0.01), random.uniform(-0.01, 0.01))
+            if translate_result == PointQuadTree.TranslatePointResult.removed:
+                self._points.remove(point)
+
+    def _insert_random_point(self):
+        point = Point(random.random(), random.random())
+        self._tree.insert(point)
+        self._points.append(point)
+
+
+def benchmark(name, tree_class, take_version, num_versions):
+    """
+    @param name String
+    @param tree_class The PointQuadTree-compatible class to benchmark
+    @param take_version Function(tree) -> version
+    @param num_versions Integer
+    """
+    runner = PersistenceBenchmarkRunner(tree_class, take_version)
+    seconds_per_mutation, bytes_per_version = runner.run(SEED, NUM_POINTS, num_versions)
+    print('{:<12} {:>10} {:>22.1f} {:>18.0f}'.format(name, num_versions, seconds_per_mutation * 1e6, bytes_per_version))
+
+
+def main():
+    print('Benchmarking versioning: num_points={}, node_capacity={}, seed={}.'.format(NUM_POINTS, NODE_CAPACITY, SEED))
+    print('{:<12} {:>10} {:>22} {:>18}'.format('strategy', 'versions', 'us/(mutation+version)', 'bytes/version'))
+    benchmark('persistent', PersistentPointQuadTree, PersistentPointQuadTree.snapshot, NUM_PERSISTENT_VERSIONS)
+    benchmark('deep-copy', PointQuadTree, copy.deepcopy, NUM_DEEP_COPY_VERSIONS)
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import persistent_point_quad_tree
+    module_dependencies = [persistent_point_quad_tree]
+
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        main()
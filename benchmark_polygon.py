@@ -0,0 +1,124 @@
+"""
+Benchmarks PointQuadTree.query_points_in_polygon against querying the polygon's bounding box and
+then testing each point in it against the polygon.
+
+The fences are star-shaped polygons: spiky stars, whose bounding boxes hold many points outside of
+them, and noisy circles, whose many edges make each point-in-polygon test expensive.
+
+Usage: python benchmark_polygon.py [num_vertices ...]
+"""
+
+from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+from polygon import Polygon
+import math
+import random
+import sys
+import time
+
+NUM_POINTS = 100000
+NODE_CAPACITY = 8
+NUM_QUERIES = 5
+FENCE_RADIUS = 0.2
+SEED = 0
+DEFAULT_VERTEX_COUNTS = (16, 128, 512)
+
+
+def generate_star(rng, num_vertices):
+    """
+    @return the vertices of a star whose points alternate between FENCE_RADIUS and a fifth of it
+
+    >>> len(generate_star(random.Random(0), 16))
+    16
+    """
+    return _generate_star_shape(rng, num_vertices, lambda index: FENCE_RADIUS if index % 2 == 0 else FENCE_RADIUS / 5)
+
+
+def generate_noisy_circle(rng, num_vertices):
+    """
+    @return the vertices of a circle whose radius varies by up to 10% at each vertex
+    """
+    return _generate_star_shape(rng, num_vertices, lambda index: FENCE_RADIUS * rng.uniform(0.9, 1.1))
+
+
+def _generate_star_shape(rng, num_vertices, get_radius):
+    center_x = rng.uniform(FENCE_RADIUS, 1 - FENCE_RADIUS)
+    center_y = rng.uniform(FENCE_RADIUS, 1 - FENCE_RADIUS)
+    vertices = []
+    for index in range(num_vertices):
+        angle = 2 * math.pi * index / num_vertices
+        radius = get_radius(index)
+        vertices.append((center_x + radius * math.cos(angle), center_y + radius * math.sin(angle)))
+    return vertices
+
+
+FENCES = {
+    'star': generate_star,
+    'noisy_circle': generate_noisy_circle,
+}
+
+
+def query_bounding_box_then_filter(tree, vertices):
+    """
+    @return the Point's in the polygon, by testing every point in its bounding box
+
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=2)
+    >>> points = [Point(random.random(), random.random()) for i in range(200)]
+    >>> for point in points:
+    ...     _ = tree.insert(point)
+    >>> vertices = generate_star(random.Random(0), 16)
+    >>> sorted(map(id, query_bounding_box_then_filter(tree, vertices))) == sorted(map(id, tree.query_points_in_polygon(vertices)))
+    True
+    """
+    polygon = Polygon(vertices)
+    bounding_box = AxisAlignedBoundingBox(
+        center_x=(polygon.x_min + polygon.x_max) / 2,
+        center_y=(polygon.y_min + polygon.y_max) / 2,
+        half_size_x=(polygon.x_max - polygon.x_min) / 2,
+        half_size_y=(polygon.y_max - polygon.y_min) / 2)
+    return [point for point in tree.query_points_in_region(bounding_box) if polygon.contains_point(point)]
+
+
+def measure(tree, query, fences):
+    """
+    @return (seconds per query, mean points returned)
+    """
+    num_points_returned = 0
+    start_time = time.perf_counter()
+    for vertices in fences:
+        num_points_returned += len(query(tree, vertices))
+    return (time.perf_counter() - start_time) / len(fences), num_points_returned / len(fences)
+
+
+def main(vertex_counts):
+    print('Benchmarking polygon queries: num_points={}, node_capacity={}, num_queries={}, fence_radius={}, seed={}.'.format(
+        NUM_POINTS, NODE_CAPACITY, NUM_QUERIES, FENCE_RADIUS, SEED))
+    rng = random.Random(SEED)
+    tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=NODE_CAPACITY)
+    for i in range(NUM_POINTS):
+        tree.insert(Point(rng.random(), rng.random()))
+
+    print('{:<14} {:>10} {:>10} {:>20} {:>20} {:>8}'.format('fence', 'vertices', 'points', 'bbox+filter (ms)', 'polygon (ms)', 'speedup'))
+    for fence_name, generate_fence in sorted(FENCES.items()):
+        for num_vertices in vertex_counts:
+            fences = [generate_fence(rng, num_vertices) for i in range(NUM_QUERIES)]
+            filter_seconds, num_points_returned = measure(tree, query_bounding_box_then_filter, fences)
+            polygon_seconds, _ = measure(tree, PointQuadTree.query_points_in_polygon, fences)
+            print('{:<14} {:>10} {:>10.0f} {:>20.2f} {:>20.2f} {:>7.2f}x'.format(
+                fence_name, num_vertices, num_points_returned, filter_seconds * 1e3, polygon_seconds * 1e3, filter_seconds / polygon_seconds))
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree
+    module_dependencies = [point_quad_tree]
+
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        vertex_counts = [int(arg) for arg in sys.argv[1:]] or DEFAULT_VERTEX_COUNTS
+        main(vertex_counts)
@@ -0,0 +1,100 @@
+"""
+Benchmarks PointQuadTree.remove_points_in_region against querying the region and then removing each
+point, and against querying the region and then calling remove_points, for regions of several sizes.
+
+Each region is purged from a fresh copy of the same tree.
+
+Usage: python benchmark_region_removal.py [region_half_size ...]
+"""
+
+from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+import random
+import sys
+import time
+
+NUM_POINTS = 50000
+NODE_CAPACITY = 8
+NUM_REGIONS = 5
+SEED = 0
+DEFAULT_REGION_HALF_SIZES = (0.01, 0.05, 0.2, 0.5)
+
+
+def query_then_remove_each(tree, region):
+    """
+    @return the Point's that were removed
+
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=2)
+    >>> _ = tree.insert_points([Point(0.1, 0.1), Point(0.2, 0.2), Point(0.9, 0.9)])
+    >>> query_then_remove_each(tree, AxisAlignedBoundingBox(center_x=0.15, center_y=0.15, half_size_x=0.1, half_size_y=0.1))
+    [(0.1,0.1), (0.2,0.2)]
+    >>> tree.get_all_points()
+    [(0.9,0.9)]
+    """
+    points = tree.query_points_in_region(region)
+    for point in points:
+        tree.remove(point)
+    return points
+
+
+def query_then_remove_points(tree, region):
+    points = tree.query_points_in_region(region)
+    tree.remove_points(points)
+    return points
+
+
+def measure(points, removal, regions):
+    """
+    @return (seconds per removal, mean points removed)
+
+    Every removal removes the same points:
+    >>> rng = random.Random(0)
+    >>> points = [Point(rng.random(), rng.random()) for i in range(1000)]
+    >>> regions = [AxisAlignedBoundingBox(0.5, 0.5, 0.2, 0.2)]
+    >>> removals = (query_then_remove_each, query_then_remove_points, PointQuadTree.remove_points_in_region)
+    >>> len(set(measure(points, removal, regions)[1] for removal in removals))
+    1
+    """
+    seconds = 0
+    num_points_removed = 0
+    for region in regions:
+        tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=NODE_CAPACITY)
+        tree.insert_points(points)
+        start_time = time.perf_counter()
+        num_points_removed += len(removal(tree, region))
+        seconds += time.perf_counter() - start_time
+    return seconds / len(regions), num_points_removed / len(regions)
+
+
+def main(region_half_sizes):
+    print('Benchmarking region removal: num_points={}, node_capacity={}, num_regions={}, seed={}.'.format(
+        NUM_POINTS, NODE_CAPACITY, NUM_REGIONS, SEED))
+    rng = random.Random(SEED)
+    points = [Point(rng.random(), rng.random()) for i in range(NUM_POINTS)]
+
+    print('{:>10} {:>10} {:>20} {:>20} {:>20} {:>8}'.format(
+        'half size', 'points', 'remove each (ms)', 'remove_points (ms)', 'in region (ms)', 'speedup'))
+    for half_size in region_half_sizes:
+        regions = [AxisAlignedBoundingBox(rng.uniform(half_size, 1 - half_size), rng.uniform(half_size, 1 - half_size), half_size, half_size)
+            for i in range(NUM_REGIONS)]
+        each_seconds, num_points_removed = measure(points, query_then_remove_each, regions)
+        batch_seconds, _ = measure(points, query_then_remove_points, regions)
+        region_seconds, _ = measure(points, PointQuadTree.remove_points_in_region, regions)
+        print('{:>10} {:>10.0f} {:>20.2f} {:>20.2f} {:>20.2f} {:>7.2f}x'.format(
+            half_size, num_points_removed, each_seconds * 1e3, batch_seconds * 1e3, region_seconds * 1e3, each_seconds / region_seconds))
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree
+    module_dependencies = [point_quad_tree]
+
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        region_half_sizes = [float(arg) for arg in sys.argv[1:]] or DEFAULT_REGION_HALF_SIZES
+        main(region_half_sizes)
@@ -0,0 +1,90 @@
+"""
+Benchmarks PointQuadTree.sample_points against querying the points in a region, or all of the points,
+and then sampling them with random.sample, for regions of several sizes.
+
+Usage: python benchmark_sampling.py [k ...]
+"""
+
+from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+import random
+import sys
+import time
+
+NUM_POINTS = 100000
+NODE_CAPACITY = 8
+NUM_QUERIES = 50
+SEED = 0
+DEFAULT_KS = (1, 100)
+
+# None samples from the whole tree.
+REGION_HALF_SIZES = (0.05, 0.2, 0.5, None)
+
+
+def query_then_sample(tree, k, region, rng):
+    """
+    @return k random Point's in the region, or all of them if it has fewer, by querying all of them
+
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=2)
+    >>> _ = tree.insert_points([Point(0.1, 0.1), Point(0.2, 0.2), Point(0.9, 0.9)])
+    >>> sorted(query_then_sample(tree, 5, AxisAlignedBoundingBox(center_x=0.15, center_y=0.15, half_size_x=0.1, half_size_y=0.1), random.Random(0)))
+    [(0.1,0.1), (0.2,0.2)]
+    >>> len(query_then_sample(tree, 2, None, random.Random(0)))
+    2
+    """
+    points = tree.get_all_points() if region is None else tree.query_points_in_region(region)
+    return rng.sample(points, min(k, len(points)))
+
+
+def sample(tree, k, region, rng):
+    return tree.sample_points(k, region, rng)
+
+
+def measure(tree, sampling, k, regions, rng):
+    """
+    @return seconds per sampling
+    """
+    start_time = time.perf_counter()
+    for region in regions:
+        sampling(tree, k, region, rng)
+    return (time.perf_counter() - start_time) / len(regions)
+
+
+def main(ks):
+    print('Benchmarking sampling: num_points={}, node_capacity={}, num_queries={}, seed={}.'.format(
+        NUM_POINTS, NODE_CAPACITY, NUM_QUERIES, SEED))
+    rng = random.Random(SEED)
+    tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=NODE_CAPACITY)
+    tree.insert_points([Point(rng.random(), rng.random()) for i in range(NUM_POINTS)])
+    tree.enable_aggregates()
+
+    print('{:>10} {:>6} {:>10} {:>20} {:>20} {:>8}'.format('half size', 'k', 'points', 'query+sample (ms)', 'sample_points (ms)', 'speedup'))
+    for half_size in REGION_HALF_SIZES:
+        if half_size is None:
+            regions = [None] * NUM_QUERIES
+            num_points = NUM_POINTS
+        else:
+            regions = [AxisAlignedBoundingBox(rng.uniform(half_size, 1 - half_size), rng.uniform(half_size, 1 - half_size), half_size, half_size)
+                for i in range(NUM_QUERIES)]
+            num_points = sum(len(tree.query_points_in_region(region)) for region in regions) / len(regions)
+        for k in ks:
+            query_seconds = measure(tree, query_then_sample, k, regions, rng)
+            sample_seconds = measure(tree, sample, k, regions, rng)
+            print('{:>10} {:>6} {:>10.0f} {:>20.3f} {:>20.3f} {:>7.2f}x'.format(
+                'all' if half_size is None else half_size, k, num_points, query_seconds * 1e3, sample_seconds * 1e3, query_seconds / sample_seconds))
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree
+    module_dependencies = [point_quad_tree]
+
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        ks = [int(arg) for arg in sys.argv[1:]] or DEFAULT_KS
+        main(ks)
@@ -0,0 +1,136 @@
+"""
+Measures the latency and throughput of PointQuadTreeServer with many concurrent client coroutines.
+
+The server runs in its own process on a Unix socket.  Each coroutine pipelines its requests over
+one of a few shared connections: mostly small region queries, with some translates and nearest
+queries mixed in.
+
+Usage: python benchmark_server.py [num_coroutines ...]
+"""
+
+from point_quad_tree import AxisAlignedBoundingBox
+from point_quad_tree_server import PointQuadTreeClient, serve
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+NUM_POINTS = 20000
+NUM_CONNECTIONS = 4
+REQUESTS_PER_COROUTINE = 200
+QUERY_HALF_SIZE = 0.01
+NODE_CAPACITY = 20
+SEED = 0
+DEFAULT_NUM_COROUTINES = (1, 10, 100, 1000)
+
+
+def run_server(path):
+    asyncio.run(serve(path, AxisAlignedBoundingBox.positive_quadrant_box(1, 1), NODE_CAPACITY))
+
+
+async def connect(path):
+    """
+    Retries until the server process is listening.
+    @return PointQuadTreeClient
+    """
+    while True:
+        try:
+            return await PointQuadTreeClient.connect(path=path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            await asyncio.sleep(0.05)
+
+
+async def run_coroutine(client, rng, latencies):
+    """
+    @param rng random.Random
+    @param latencies array to append the latency of each request to
+    """
+    for i in range(REQUESTS_PER_COROUTINE):
+        choice = rng.random()
+        start_time = time.perf_counter()
+        if choice < 0.8:
+            region = AxisAlignedBoundingBox(center_x=rng.random(), center_y=rng.random(), half_size_x=QUERY_HALF_SIZE, half_size_y=QUERY_HALF_SIZE)
+            await client.query_points_in_region(region)
+        elif choice < 0.9:
+            await client.query_nearest_point(rng.random(), rng.random())
+        else:
+            await client.translate_point(rng.randrange(NUM_POINTS), rng.uniform(-0.001, 0.001), rng.uniform(-0.001, 0.001))
+        latencies.append(time.perf_counter() - start_time)
+
+
+async def benchmark(path, num_coroutines):
+    """
+    @return (requests_per_second, sorted_latencies)
+    """
+    clients = [await connect(path) for i in range(NUM_CONNECTIONS)]
+    latencies = []
+    start_time = time.perf_counter()
+    await asyncio.gather(*(
+        run_coroutine(clients[i % NUM_CONNECTIONS], random.Random(SEED + i), latencies)
+        for i in range(num_coroutines)))
+    elapsed_time = time.perf_counter() - start_time
+    for client in clients:
+        await client.close()
+    return len(latencies) / elapsed_time, sorted(latencies)
+
+
+async def populate(path):
+    client = await connect(path)
+    rng = random.Random(SEED)
+    await asyncio.gather(*(client.insert(point_id, rng.random(), rng.random()) for point_id in range(NUM_POINTS)))
+    await client.close()
+
+
+def get_percentile(sorted_values, percentile):
+    """
+    >>> get_percentile([1, 2, 3, 4], 50)
+    2
+    >>> get_percentile([1, 2, 3, 4], 100)
+    4
+    """
+    index = max(0, int(round(len(sorted_values) * percentile / 100)) - 1)
+    return sorted_values[index]
+
+
+def main(num_coroutines_options):
+    print('Benchmarking server: num_points={}, num_connections={}, requests_per_coroutine={}, node_capacity={}, seed={}.'.format(
+        NUM_POINTS, NUM_CONNECTIONS, REQUESTS_PER_COROUTINE, NODE_CAPACITY, SEED))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'point_quad_tree.sock')
+        server_process = multiprocessing.Process(target=run_server, args=(path,), daemon=True)
+        server_process.start()
+        try:
+            asyncio.run(populate(path))
+            print('{:>10} {:>14} {:>10} {:>10} {:>10}'.format('coroutines', 'requests/s', 'p50 (ms)', 'p99 (ms)', 'p999 (ms)'))
+            for num_coroutines in num_coroutines_options:
+                requests_per_second, latencies = asyncio.run(benchmark(path, num_coroutines))
+                print('{:>10} {:>14.0f} {:>10.3f} {:>10.3f} {:>10.3f}'.format(
+                    num_coroutines,
+                    requests_per_second,
+                    1000 * get_percentile(latencies, 50),
+                    1000 * get_percentile(latencies, 99),
+                    1000 * get_percentile(latencies, 99.9)))
+        finally:
+            server_process.terminate()
+            server_process.join()
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree_server
+    module_dependencies = [point_quad_tree_server]
+
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        num_coroutines_options = [int(arg) for arg in sys.argv[1:]] or DEFAULT_NUM_COROUTINES
+        main(num_coroutines_options)
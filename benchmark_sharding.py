@@ -0,0 +1,121 @@
+"""
+Measures how ShardedPointQuadTree's bulk build and batched queries scale with the number of
+worker processes, from 1 to the number of cores, against a single in-process PointQuadTree.
+
+Usage: python benchmark_sharding.py [max_workers]
+"""
+
+from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+from sharded_point_quad_tree import ShardedPointQuadTree
+import os
+import random
+import sys
+import time
+
+NUM_POINTS = 200000
+NUM_QUERIES = 100000
+QUERY_BATCH_SIZE = 10000
+QUERY_HALF_SIZE = 0.005
+NODE_CAPACITY = 20
+SEED = 0
+
+
+def get_grid_dimensions(num_shards):
+    """
+    @return (columns, rows) of the most square grid with num_shards cells
+
+    >>> [get_grid_dimensions(n) for n in (1, 2, 4, 6, 7)]
+    [(1, 1), (2, 1), (2, 2), (3, 2), (7, 1)]
+    """
+    rows = max(row for row in range(1, int(num_shards**0.5) + 1) if num_shards % row == 0)
+    return num_shards // rows, rows
+
+
+def create_workload(seed):
+    """
+    @return (points, query_regions)
+    """
+    random.seed(seed)
+    points = [Point(random.random(), random.random()) for i in range(NUM_POINTS)]
+    query_regions = [
+        AxisAlignedBoundingBox(center_x=random.random(), center_y=random.random(), half_size_x=QUERY_HALF_SIZE, half_size_y=QUERY_HALF_SIZE)
+        for i in range(NUM_QUERIES)]
+    return points, query_regions
+
+
+def benchmark_single_process(boundary, points, query_regions):
+    """
+    @return (build_seconds, query_seconds)
+    """
+    start_time = time.perf_counter()
+    tree = PointQuadTree(boundary=boundary, node_capacity=NODE_CAPACITY)
+    for point in points:
+        tree.insert(point)
+    build_time = time.perf_counter()
+
+    for region in query_regions:
+        tree.query_points_in_region(region)
+    query_time = time.perf_counter()
+
+    return build_time - start_time, query_time - build_time
+
+
+def benchmark_sharded(boundary, num_workers, points, query_regions):
+    """
+    @return (build_seconds, query_seconds)
+    """
+    columns, rows = get_grid_dimensions(num_workers)
+    with ShardedPointQuadTree(boundary=boundary, node_capacity=NODE_CAPACITY, columns=columns, rows=rows) as tree:
+        # Start the worker processes before timing.
+        tree.query_points_in_region(boundary)
+
+        start_time = time.perf_counter()
+        tree.insert_points(points)
+        build_time = time.perf_counter()
+
+        for batch_start in range(0, len(query_regions), QUERY_BATCH_SIZE):
+            tree.query_points_in_regions(query_regions[batch_start:batch_start + QUERY_BATCH_SIZE])
+        query_time = time.perf_counter()
+
+    return build_time - start_time, query_time - build_time
+
+
+def print_result(name, build_seconds, query_seconds, baseline_query_seconds):
+    print('{:<16} {:>10.2f} {:>14.0f} {:>10.2f}x'.format(
+        name,
+        build_seconds,
+        NUM_QUERIES / query_seconds,
+        baseline_query_seconds / query_seconds))
+
+
+def main(max_workers):
+    print('Benchmarking sharding: num_points={}, num_queries={}, batch_size={}, node_capacity={}, seed={}.'.format(
+        NUM_POINTS, NUM_QUERIES, QUERY_BATCH_SIZE, NODE_CAPACITY, SEED))
+    boundary = AxisAlignedBoundingBox.positive_quadrant_box(1, 1)
+    points, query_regions = create_workload(SEED)
+
+    print('{:<16} {:>10} {:>14} {:>11}'.format('tree', 'build (s)', 'queries/s', 'speedup'))
+    build_seconds, baseline_query_seconds = benchmark_single_process(boundary, points, query_regions)
+    print_result('single-process', build_seconds, baseline_query_seconds, baseline_query_seconds)
+
+    for num_workers in range(1, max_workers + 1):
+        build_seconds, query_seconds = benchmark_sharded(boundary, num_workers, points, query_regions)
+        print_result('{} workers'.format(num_workers), build_seconds, query_seconds, baseline_query_seconds)
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import sharded_point_quad_tree
+    module_dependencies = [sharded_point_quad_tree]
+
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+        main(max_workers)
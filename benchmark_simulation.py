@@ -0,0 +1,170 @@
+"""
+Runs the moving-points simulation of point_quad_tree_viewer for a number of ticks, as fast as possible
+and without a display, so that it can run in CI.
+
+Reports the ticks per second and the time spent in each tree operation, which a LatencyHistogramRecorder
+hook measures.  The hook adds a few microseconds to each operation: pass --no-operation-times to measure
+the ticks per second without it.
+
+With --vectorized, runs VectorizedPointQuadTreeSimulation, whose exact flocking moves every point at once.
+
+Usage: python benchmark_simulation.py [--ticks 200] [--points 1000] [--insertion-rate 5] [--exact-flocking | --vectorized] [--min-ticks-per-second 10]
+"""
+
+from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox
+from point_quad_tree_hooks import LatencyHistogramRecorder
+from point_quad_tree_simulation import PointQuadTreeSimulation, VectorizedPointQuadTreeSimulation
+
+import argparse
+import json
+import random
+import sys
+import time
+
+# The viewer's window.
+BOUNDARY_WIDTH, BOUNDARY_HEIGHT = 640, 480
+
+DEFAULT_TICKS = 200
+DEFAULT_POINTS = 1000
+DEFAULT_INSERTION_RATE = 5
+DEFAULT_NODE_CAPACITY = 20
+DEFAULT_COLLISION_AREA_RADIUS = 8
+
+
+def run_simulation(num_ticks, num_points, insertion_rate, node_capacity, collision_area_radius, approximate_flocking, seed, operation_times=True, vectorized=False):
+    """
+    @param num_points Integer The number of random points to insert before the first tick
+    @param insertion_rate Number The random points to insert (or, if negative, remove) per tick
+    @param vectorized Boolean Whether to run a VectorizedPointQuadTreeSimulation, which ignores approximate_flocking
+    @return {'ticks_per_second', 'mean_points', 'final_points', 'operations': {operation: {'count', 'seconds'}}}
+
+    Runs are repeatable:
+    >>> results = [run_simulation(20, 100, 2, 4, 8, approximate_flocking, seed=0) for approximate_flocking in (True, True, False)]
+    >>> results[0]['final_points'] == results[1]['final_points'], results[0]['mean_points'] > 90
+    (True, True)
+    >>> sorted(results[0]['operations']), sorted(results[2]['operations'])
+    (['approximate_field', 'get_all_points', 'insert', 'translate_point'], ['get_all_points', 'insert', 'query_points_in_region', 'translate_point'])
+    >>> results[0]['operations']['insert']['count'], results[0]['operations']['get_all_points']['count']
+    (40, 20)
+
+    The vectorized simulation queries the tree once, and moves the points once, per tick:
+    >>> result = run_simulation(20, 100, 2, 4, 8, False, seed=0, vectorized=True)
+    >>> sorted((operation, result['operations'][operation]['count']) for operation in result['operations'])
+    [('insert', 40), ('query_point_pairs_in_range', 20), ('translate_points', 20)]
+    """
+    tree = PointQuadTree(
+        boundary=AxisAlignedBoundingBox.positive_quadrant_box(BOUNDARY_WIDTH, BOUNDARY_HEIGHT),
+        node_capacity=node_capacity)
+    simulation_class = VectorizedPointQuadTreeSimulation if vectorized else PointQuadTreeSimulation
+    simulation = simulation_class(tree, collision_area_radius, rng=random.Random(seed))
+    simulation.has_approximate_flocking = approximate_flocking
+    for i in range(num_points):
+        simulation.add_random_point()
+    simulation.random_point_insertion_rate = insertion_rate
+
+    # Only the ticks are timed and recorded, not counting the points between them.
+    recorder = LatencyHistogramRecorder()
+    seconds = 0
+    total_points = 0
+    for i in range(num_ticks):
+        if operation_times:
+            tree.add_operation_hook(recorder)
+        start_time = time.perf_counter()
+        simulation.tick()
+        seconds += time.perf_counter() - start_time
+        if operation_times:
+            tree.remove_operation_hook(recorder)
+        total_points += len(tree.get_all_points())
+
+    operations = {}
+    for operation in recorder.operations():
+        histogram = recorder.get_latency_histogram(operation)
+        operations[operation] = {'count': histogram.count, 'seconds': histogram.total / 1e9}
+
+    return {
+        'ticks_per_second': num_ticks / seconds,
+        'mean_points': total_points / num_ticks,
+        'final_points': len(tree.get_all_points()),
+        'operations': operations,
+    }
+
+
+def print_results(results):
+    print('{:.1f} ticks/s, {:.0f} points on average, {} points at the end'.format(
+        results['ticks_per_second'], results['mean_points'], results['final_points']))
+    operations = results['operations']
+    if not operations:
+        return
+
+    tick_seconds = sum(operation['seconds'] for operation in operations.values())
+    print('{:<28} {:>10} {:>12} {:>12} {:>8}'.format('operation', 'calls', 'total (ms)', 'mean (us)', 'share'))
+    for operation_name, operation in sorted(operations.items(), key=lambda item: -item[1]['seconds']):
+        print('{:<28} {:>10} {:>12.1f} {:>12.2f} {:>7.1%}'.format(
+            operation_name,
+            operation['count'],
+            operation['seconds'] * 1e3,
+            operation['seconds'] / operation['count'] * 1e6 if operation['count'] else 0,
+            operation['seconds'] / tick_seconds))
+
+
+def parse_arguments(arguments):
+    parser = argparse.ArgumentParser(description="Runs point_quad_tree_viewer's simulation without a display.")
+    parser.add_argument('--ticks', type=int, default=DEFAULT_TICKS)
+    parser.add_argument('--points', type=int, default=DEFAULT_POINTS, help='the points to insert before the first tick')
+    parser.add_argument('--insertion-rate', type=float, default=DEFAULT_INSERTION_RATE, help='the points to insert per tick, or remove if negative')
+    parser.add_argument('--node-capacity', type=int, default=DEFAULT_NODE_CAPACITY)
+    parser.add_argument('--collision-area-radius', type=float, default=DEFAULT_COLLISION_AREA_RADIUS)
+    flocking = parser.add_mutually_exclusive_group()
+    flocking.add_argument('--exact-flocking', action='store_true', help="query each point's collision area instead of approximating with Barnes-Hut")
+    flocking.add_argument('--vectorized', action='store_true', help='flock exactly, moving every point at once with NumPy')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-operation-times', action='store_true', help='do not time each tree operation')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--min-ticks-per-second', type=float, help='fail if the simulation is slower than this')
+    return parser.parse_args(arguments)
+
+
+def main(arguments):
+    """
+    @return the process exit code, which is 1 if the simulation is slower than --min-ticks-per-second
+    """
+    options = parse_arguments(arguments)
+    print('Simulating: ticks={}, points={}, insertion_rate={}, node_capacity={}, collision_area_radius={}, flocking={}, seed={}.'.format(
+        options.ticks, options.points, options.insertion_rate, options.node_capacity, options.collision_area_radius,
+        'vectorized' if options.vectorized else 'exact' if options.exact_flocking else 'approximate', options.seed))
+    results = run_simulation(
+        options.ticks,
+        options.points,
+        options.insertion_rate,
+        options.node_capacity,
+        options.collision_area_radius,
+        not options.exact_flocking,
+        options.seed,
+        operation_times=not options.no_operation_times,
+        vectorized=options.vectorized)
+    print_results(results)
+
+    if options.output:
+        with open(options.output, 'w') as output_file:
+            json.dump({'options': vars(options), 'results': results}, output_file, indent=2)
+
+    if options.min_ticks_per_second is not None and results['ticks_per_second'] < options.min_ticks_per_second:
+        print('FAILED: {:.1f} ticks/s is below the minimum of {}.'.format(results['ticks_per_second'], options.min_ticks_per_second))
+        return 1
+    return 0
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree_simulation
+    module_dependencies = [point_quad_tree_simulation]
+
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        sys.exit(main(sys.argv[1:]))
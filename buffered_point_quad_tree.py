@@ -0,0 +1,226 @@
+"""
+A PointQuadTree front end that buffers inserts and removes, and applies them lazily.
+
+Mutations go into a log instead of restructuring the tree immediately.  A remove of a point whose
+insert is still in the log cancels the insert, so a point that comes and goes within a burst never
+touches the tree.  The log is applied, with PointQuadTree.remove_points and insert_points, as one
+grouped descent of the tree per kind of mutation, before the next query or on an explicit flush().
+
+Points are matched in the log by identity, as PointQuadTree matches them for points that do not
+define equality.
+"""
+
+from point import Point
+from axis_aligned_bounding_box import AxisAlignedBoundingBox
+from point_quad_tree import PointQuadTree
+
+
+class BufferedPointQuadTree:
+    """
+    >>> tree = BufferedPointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(4, 4), node_capacity=1)
+    >>> p1, p2, p3 = Point(1, 1), Point(2, 2), Point(3, 3)
+    >>> tree.insert(p1), tree.insert(p2), tree.insert(p3), tree.insert(Point(5, 5))
+    (True, True, True, False)
+    >>> tree.remove(p2)
+    True
+    >>> tree.pending_mutation_count()
+    2
+
+    Queries apply the buffered mutations first:
+    >>> tree.get_all_points()
+    [(1,1), (3,3)]
+    >>> tree.pending_mutation_count()
+    0
+
+    Removing a point and then inserting it again keeps both, in order, because whether the point is
+    in the tree is not known until the log is flushed:
+    >>> tree.remove(p1)
+    >>> tree.insert(p1)
+    True
+    >>> tree.pending_mutation_count()
+    2
+    >>> tree.flush()
+    (1, 1)
+    >>> p4 = Point(1, 2)
+    >>> tree.remove(p4), tree.insert(p4), tree.flush()
+    (None, True, (1, 0))
+    >>> tree.remove(p4), tree.flush()
+    (None, (0, 1))
+
+    flush() reports how many buffered inserts and removes it applied:
+    >>> tree.remove(p3)
+    >>> tree.remove(Point(3, 3))
+    >>> tree.flush()
+    (0, 1)
+    >>> tree.query_points_in_region(tree.boundary)
+    [(1,1)]
+    >>> tree.query_nearest_point(4, 4)
+    (1,1)
+
+    Translating a buffered point moves it before it is inserted:
+    >>> tree.insert(p2)
+    True
+    >>> tree.translate_point(p2, 1, 1) == PointQuadTree.TranslatePointResult.translated
+    True
+    >>> tree.translate_point(p2, 2, 2) == PointQuadTree.TranslatePointResult.removed
+    True
+    >>> tree.translate_point(p1, 1, 1) == PointQuadTree.TranslatePointResult.translated
+    True
+    >>> tree.get_all_points()
+    [(2,2)]
+    """
+
+    def __init__(self, boundary, node_capacity, max_pending_mutations=None):
+        """
+        @param boundary AxisAlignedBoundingBox
+        @param node_capacity Integer the maximum number of points that each node in the tree can hold
+        @param max_pending_mutations Integer The log is flushed when it reaches this size, or None to only flush before queries and on flush()
+
+        >>> tree = BufferedPointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(4, 4), node_capacity=1, max_pending_mutations=2)
+        >>> tree.insert(Point(1, 1)), tree.insert(Point(2, 2))
+        (True, True)
+        >>> tree.pending_mutation_count()
+        0
+        """
+        assert max_pending_mutations is None or max_pending_mutations >= 1
+
+        self.boundary = boundary
+        self._tree = PointQuadTree(boundary=boundary, node_capacity=node_capacity)
+        self._max_pending_mutations = max_pending_mutations
+
+        # The buffered mutations, as {id(point): point}.  The removes are applied before the inserts, so a
+        # point in both was removed and then inserted again.
+        self._pending_inserts = {}
+        self._pending_removes = {}
+
+    @property
+    def tree(self):
+        """
+        @return PointQuadTree The underlying tree, which does not include the buffered mutations until they are flushed
+        """
+        return self._tree
+
+    def pending_mutation_count(self):
+        return len(self._pending_inserts) + len(self._pending_removes)
+
+    def flush(self):
+        """
+        Applies the buffered mutations to the tree.
+        @return (inserted_count, removed_count)
+        """
+        removed_count = 0
+        if self._pending_removes:
+            removed_count = sum(self._tree.remove_points(list(self._pending_removes.values())))
+            self._pending_removes = {}
+
+        inserted_count = 0
+        if self._pending_inserts:
+            inserted_count = sum(self._tree.insert_points(list(self._pending_inserts.values())))
+            self._pending_inserts = {}
+
+        return inserted_count, removed_count
+
+    def get_all_points(self):
+        """
+        @return an array of all Point's contained in this tree
+        """
+        self.flush()
+        return self._tree.get_all_points()
+
+    def query_points_in_region(self, region):
+        """
+        @param region AxisAlignedBoundingBox
+        @return an array of Point's in the region
+        """
+        self.flush()
+        return self._tree.query_points_in_region(region)
+
+    def query_nearest_point(self, x, y):
+        """
+        @return the Point closest to (x, y), or None if the tree is empty
+        """
+        self.flush()
+        return self._tree.query_nearest_point(x, y)
+
+    def insert(self, point):
+        """
+        Buffers inserting the point.  Inserting a point that is buffered to be removed keeps the remove,
+        which is applied first.
+        @param point Point
+        @return True if the point will be inserted, false otherwise (if the point is not in the tree's region)
+        """
+        assert point
+
+        if not self.boundary.contains_point(point):
+            return False
+
+        self._pending_inserts[id(point)] = point
+        self._flush_if_full()
+        return True
+
+    def remove(self, point):
+        """
+        Buffers removing the point.  Removing a point that is buffered to be inserted cancels the insert.
+
+        Whether a point that is not buffered is in the tree is not known until the log is flushed, so
+        unlike PointQuadTree.remove, this returns None for those points.  See flush().
+
+        @param point Point
+        @return True if the point's insert was cancelled, None otherwise
+        """
+        assert point
+
+        if self._pending_inserts.pop(id(point), None) is not None:
+            return True
+
+        self._pending_removes[id(point)] = point
+        self._flush_if_full()
+        return None
+
+    def translate_point(self, point, x, y):
+        """
+        @param point Point
+        @param x, y Number The amount to translate the point by.
+        @return PointQuadTree.TranslatePointResult
+        """
+        assert point
+
+        if id(point) in self._pending_removes:
+            if id(point) not in self._pending_inserts:
+                return PointQuadTree.TranslatePointResult.not_in_tree
+            # The buffered remove finds the point by its position, so apply it before moving the point.
+            self.flush()
+
+        if id(point) in self._pending_inserts:
+            point.translate(x, y)
+            if self.boundary.contains_point(point):
+                return PointQuadTree.TranslatePointResult.translated
+            del self._pending_inserts[id(point)]
+            return PointQuadTree.TranslatePointResult.removed
+
+        # The buffered mutations are of other points, so they do not change this translation.
+        return self._tree.translate_point(point, x, y)
+
+    def clear(self):
+        self._pending_inserts = {}
+        self._pending_removes = {}
+        self._tree.clear()
+
+    def _flush_if_full(self):
+        if self._max_pending_mutations is not None and self.pending_mutation_count() >= self._max_pending_mutations:
+            self.flush()
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree
+    module_dependencies = [point_quad_tree]
+
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    run_tests()
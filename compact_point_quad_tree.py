@@ -0,0 +1,293 @@
+"""
+A point quadtree that stores raw coordinates and integer ids in compact arrays, instead of point objects.
+
+Each node keeps its points' x and y coordinates in array('d') and their ids in array('q'), and its
+boundary as four floats, so indexing a feed of (x, y, id) records allocates no per-point objects
+and tests points without attribute lookups.  Queries return ids, or (x, y, id) tuples.  Keep any
+other per-point data outside of the tree, indexed by id.
+
+The tree has the structure of PointQuadTree: every node holds up to node_capacity points, a full
+node subdivides into upper-left, upper-right, lower-left, and lower-right subtrees, a point goes to
+the first subtree whose boundary contains it, and removing a point bubbles up a point from a leaf.
+"""
+
+from axis_aligned_bounding_box import AxisAlignedBoundingBox
+from array import array
+
+
+class _Node:
+    __slots__ = ('x_min', 'x_max', 'y_min', 'y_max', 'xs', 'ys', 'ids', 'subtrees')
+
+    def __init__(self, x_min, x_max, y_min, y_max):
+        self.x_min = x_min
+        self.x_max = x_max
+        self.y_min = y_min
+        self.y_max = y_max
+        self.xs = array('d')
+        self.ys = array('d')
+        self.ids = array('q')
+
+        # [upper-left, upper-right, lower-left, lower-right], or None if the node has not subdivided
+        self.subtrees = None
+
+
+class CompactPointQuadTree:
+    """
+    >>> tree = CompactPointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=4, half_size_y=4), node_capacity=1)
+    >>> tree.insert(1, 1, 10), tree.insert(-1, -1, 11), tree.insert(5, 5, 12)
+    (True, True, False)
+    >>> tree.insert_many([(2, 2, 13), (-2, 2, 14), (0, 0, 15), (9, 9, 16)])
+    3
+    >>> len(tree)
+    5
+    >>> tree.get_all_ids()
+    [10, 14, 15, 13, 11]
+
+    >>> region = AxisAlignedBoundingBox(center_x=1, center_y=1, half_size_x=1, half_size_y=1)
+    >>> tree.query_ids_in_region(region)
+    [10, 15, 13]
+    >>> tree.query_points_in_region(region)
+    [(1.0, 1.0, 10), (0.0, 0.0, 15), (2.0, 2.0, 13)]
+
+    A point is removed by its position and id:
+    >>> tree.remove(1, 1, 10)
+    True
+    >>> tree.remove(1, 1, 10), tree.remove(2, 2, 99)
+    (False, False)
+    >>> tree.get_all_ids()
+    [15, 14, 13, 11]
+    >>> tree.remove(2, 2, 13), tree.remove(-2, 2, 14), tree.remove(0, 0, 15), tree.remove(-1, -1, 11)
+    (True, True, True, True)
+    >>> len(tree), tree.get_all_ids(), tree._root.subtrees
+    (0, [], None)
+    """
+
+    def __init__(self, boundary, node_capacity):
+        """
+        @param boundary AxisAlignedBoundingBox
+        @param node_capacity Integer the maximum number of points that each node in the tree can hold
+        """
+        assert node_capacity >= 1
+
+        self.boundary = boundary
+        self._node_capacity = node_capacity
+        self.clear()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def node_capacity(self):
+        return self._node_capacity
+
+    def clear(self):
+        self._root = _Node(self.boundary.x_min(), self.boundary.x_max(), self.boundary.y_min(), self.boundary.y_max())
+        self._count = 0
+
+    def insert(self, x, y, point_id):
+        """
+        @param x, y Number
+        @param point_id Integer A signed 64-bit id
+        @return True if the point was inserted, false otherwise (if the point is not in the tree's region)
+        """
+        root = self._root
+        if not (root.x_min <= x <= root.x_max and root.y_min <= y <= root.y_max):
+            return False
+
+        node_capacity = self._node_capacity
+        node = root
+        while len(node.ids) >= node_capacity:
+            if node.subtrees is None:
+                node.subtrees = CompactPointQuadTree._create_subtrees(node)
+            node = node.subtrees[CompactPointQuadTree._get_subtree_index(node, x, y)]
+
+        node.xs.append(x)
+        node.ys.append(y)
+        node.ids.append(point_id)
+        self._count += 1
+        return True
+
+    def insert_many(self, records):
+        """
+        @param records iterable((x, y, id)), such as an array of tuples or the rows of a NumPy array
+        @return the number of records that were inserted
+        """
+        insert = self.insert
+        inserted_count = 0
+        for x, y, point_id in records:
+            if insert(x, y, int(point_id)):
+                inserted_count += 1
+        return inserted_count
+
+    def remove(self, x, y, point_id):
+        """
+        @return True if the point was removed, false otherwise (if there is no point with the id at the position)
+        """
+        path = []
+        node = self._root
+        if not (node.x_min <= x <= node.x_max and node.y_min <= y <= node.y_max):
+            return False
+
+        # Points are only ever inserted into the subtree that _get_subtree_index chooses, so one path leads to the point.
+        while True:
+            path.append(node)
+            index = CompactPointQuadTree._find(node, x, y, point_id)
+            if index is not None:
+                break
+            if node.subtrees is None:
+                return False
+            node = node.subtrees[CompactPointQuadTree._get_subtree_index(node, x, y)]
+
+        del node.xs[index]
+        del node.ys[index]
+        del node.ids[index]
+        if node.subtrees is not None:
+            # Keep the nodes at the top of the tree full.
+            CompactPointQuadTree._bubble_up_point(node)
+        for node in reversed(path):
+            CompactPointQuadTree._remove_empty_subtrees(node)
+        self._count -= 1
+        return True
+
+    def get_all_ids(self):
+        """
+        @return an array of the ids of every point in the tree
+        """
+        ids = []
+        CompactPointQuadTree._extend_all_ids(self._root, ids)
+        return ids
+
+    def query_ids_in_region(self, region):
+        """
+        @param region AxisAlignedBoundingBox
+        @return an array of the ids of the points in the region
+        """
+        ids = []
+        CompactPointQuadTree._query_ids_in_region(self._root, region.x_min(), region.x_max(), region.y_min(), region.y_max(), ids)
+        return ids
+
+    def query_points_in_region(self, region):
+        """
+        @param region AxisAlignedBoundingBox
+        @return an array of (x, y, id) of the points in the region
+        """
+        points = []
+        CompactPointQuadTree._query_points_in_region(self._root, region.x_min(), region.x_max(), region.y_min(), region.y_max(), points)
+        return points
+
+    @staticmethod
+    def _query_ids_in_region(node, x_min, x_max, y_min, y_max, ids):
+        if node.x_min > x_max or node.x_max < x_min or node.y_min > y_max or node.y_max < y_min:
+            return
+
+        if x_min <= node.x_min and node.x_max <= x_max and y_min <= node.y_min and node.y_max <= y_max:
+            # The region contains the whole node, so it contains every point below it.
+            CompactPointQuadTree._extend_all_ids(node, ids)
+            return
+
+        for x, y, point_id in zip(node.xs, node.ys, node.ids):
+            if x_min <= x <= x_max and y_min <= y <= y_max:
+                ids.append(point_id)
+
+        if node.subtrees is not None:
+            for subtree in node.subtrees:
+                CompactPointQuadTree._query_ids_in_region(subtree, x_min, x_max, y_min, y_max, ids)
+
+    @staticmethod
+    def _query_points_in_region(node, x_min, x_max, y_min, y_max, points):
+        if node.x_min > x_max or node.x_max < x_min or node.y_min > y_max or node.y_max < y_min:
+            return
+
+        for point in zip(node.xs, node.ys, node.ids):
+            if x_min <= point[0] <= x_max and y_min <= point[1] <= y_max:
+                points.append(point)
+
+        if node.subtrees is not None:
+            for subtree in node.subtrees:
+                CompactPointQuadTree._query_points_in_region(subtree, x_min, x_max, y_min, y_max, points)
+
+    @staticmethod
+    def _extend_all_ids(node, ids):
+        ids.extend(node.ids)
+        if node.subtrees is not None:
+            for subtree in node.subtrees:
+                CompactPointQuadTree._extend_all_ids(subtree, ids)
+
+    @staticmethod
+    def _find(node, x, y, point_id):
+        """
+        @return the index of the point in the node, or None if it is not in the node
+        """
+        ids = node.ids
+        for index in range(len(ids)):
+            if ids[index] == point_id and node.xs[index] == x and node.ys[index] == y:
+                return index
+        return None
+
+    @staticmethod
+    def _bubble_up_point(node):
+        """
+        Moves a point from a leaf below node into node, and then removes the subtrees that that empties.
+        """
+        path = []
+        leaf = node
+        while leaf.subtrees is not None:
+            path.append(leaf)
+            leaf = next((subtree for subtree in leaf.subtrees if subtree.ids), None)
+            if leaf is None:
+                return
+
+        node.xs.append(leaf.xs.pop())
+        node.ys.append(leaf.ys.pop())
+        node.ids.append(leaf.ids.pop())
+        for parent in reversed(path):
+            CompactPointQuadTree._remove_empty_subtrees(parent)
+
+    @staticmethod
+    def _remove_empty_subtrees(node):
+        if node.subtrees is not None and not any(subtree.ids for subtree in node.subtrees):
+            node.subtrees = None
+
+    @staticmethod
+    def _create_subtrees(node):
+        """
+        @return [upper-left, upper-right, lower-left, lower-right]
+        """
+        center_x = (node.x_min + node.x_max) / 2
+        center_y = (node.y_min + node.y_max) / 2
+        return [
+            _Node(node.x_min, center_x, center_y, node.y_max),
+            _Node(center_x, node.x_max, center_y, node.y_max),
+            _Node(node.x_min, center_x, node.y_min, center_y),
+            _Node(center_x, node.x_max, node.y_min, center_y),
+        ]
+
+    @staticmethod
+    def _get_subtree_index(node, x, y):
+        """
+        @return the index of the first subtree whose boundary contains (x, y), which is in node's boundary
+
+        Points on the center lines go to the first subtree, in the order upper-left, upper-right, lower-left, lower-right:
+        >>> node = _Node(0, 2, 0, 2)
+        >>> [CompactPointQuadTree._get_subtree_index(node, x, y) for (x, y) in ((0, 2), (2, 2), (0, 0), (2, 0), (1, 1), (2, 1), (1, 0))]
+        [0, 1, 2, 3, 0, 1, 2]
+        """
+        index = 0 if x <= (node.x_min + node.x_max) / 2 else 1
+        if y < (node.y_min + node.y_max) / 2:
+            index += 2
+        return index
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import axis_aligned_bounding_box
+    module_dependencies = [axis_aligned_bounding_box]
+
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    run_tests()
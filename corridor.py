@@ -0,0 +1,146 @@
+"""
+Corridors around polylines, for querying the points near a route.
+"""
+
+from polygon import BoxClassification, segment_intersects_box
+
+
+class Corridor:
+    """
+    The points within a distance of a polyline: the union of a capsule around each of its segments.
+
+    >>> route = Corridor([(0, 0), (4, 4), (8, 0)], width=1)
+    >>> route.contains(2, 2), route.contains(3, 1), route.contains(4, 0), route.contains(4, 5), route.contains(9, 0)
+    (True, False, False, True, True)
+    """
+
+    def __init__(self, vertices, width):
+        """
+        @param vertices iterable((x, y)) The polyline's vertices, in order.  One vertex makes a circle.
+        @param width Number The maximum distance of a point from the polyline
+
+        >>> Corridor([], width=1)
+        Traceback (most recent call last):
+        AssertionError
+        >>> Corridor([(0, 0)], width=-1)
+        Traceback (most recent call last):
+        AssertionError
+        """
+        vertices = [(x, y) for (x, y) in vertices]
+        assert vertices
+        assert width >= 0
+
+        self.width = width
+
+        # The segments as (x1, y1, x2, y2).
+        if len(vertices) == 1:
+            self.segments = [vertices[0] + vertices[0]]
+        else:
+            self.segments = [vertex + next_vertex for vertex, next_vertex in zip(vertices, vertices[1:])]
+
+    def contains(self, x, y):
+        """
+        @return True if (x, y) is within width of the polyline
+        """
+        return Corridor._is_near_any_segment(x, y, self.segments, self.width**2)
+
+    def contains_point(self, point):
+        return self.contains(point.x, point.y)
+
+    def get_box_contains_point(self, box, near_segments):
+        """
+        @param near_segments The segments near the box, from classify_box
+        @return function(Point) -> Boolean, which is only correct for points in the box
+        """
+        width_squared = self.width**2
+        return lambda point: Corridor._is_near_any_segment(point.x, point.y, near_segments, width_squared)
+
+    def classify_box(self, box, segments=None):
+        """
+        @param box AxisAlignedBoundingBox
+        @param segments The segments that may be near the box, or None for all of them
+        @return (BoxClassification, near_segments), where near_segments are the segments within width of the box.
+            Only these can be near a box inside of this one, so pass them when classifying its subdivisions.
+
+        A box is inside the corridor if one segment's capsule holds all of its corners:
+        >>> from axis_aligned_bounding_box import AxisAlignedBoundingBox
+        >>> route = Corridor([(0, 0), (8, 0), (8, 8)], width=2)
+        >>> route.classify_box(AxisAlignedBoundingBox(center_x=4, center_y=0, half_size_x=1, half_size_y=1))[0] == BoxClassification.inside
+        True
+        >>> route.classify_box(AxisAlignedBoundingBox(center_x=4, center_y=4, half_size_x=1, half_size_y=1))[0] == BoxClassification.outside
+        True
+        >>> classification, near_segments = route.classify_box(AxisAlignedBoundingBox(center_x=7, center_y=2, half_size_x=2, half_size_y=2))
+        >>> classification == BoxClassification.crossing, near_segments
+        (True, [(0, 0, 8, 0), (8, 0, 8, 8)])
+        """
+        if segments is None:
+            segments = self.segments
+
+        x_min = box.x_min()
+        x_max = box.x_max()
+        y_min = box.y_min()
+        y_max = box.y_max()
+        corners = ((x_min, y_min), (x_min, y_max), (x_max, y_min), (x_max, y_max))
+        width_squared = self.width**2
+
+        near_segments = []
+        for segment in segments:
+            corner_distances_squared = [Corridor._get_segment_distance_squared(x, y, segment) for (x, y) in corners]
+            if max(corner_distances_squared) <= width_squared:
+                # The capsule is convex, so it holds the whole box.
+                return BoxClassification.inside, [segment]
+
+            if segment_intersects_box(segment, x_min, x_max, y_min, y_max):
+                near_segments.append(segment)
+                continue
+
+            # The segment is outside of the box, so its closest approach is at a corner of the box or an end of the segment.
+            x1, y1, x2, y2 = segment
+            distance_squared = min(min(corner_distances_squared), box.distance_squared(x1, y1), box.distance_squared(x2, y2))
+            if distance_squared <= width_squared:
+                near_segments.append(segment)
+
+        if near_segments:
+            return BoxClassification.crossing, near_segments
+        return BoxClassification.outside, near_segments
+
+    @staticmethod
+    def _is_near_any_segment(x, y, segments, width_squared):
+        for segment in segments:
+            if Corridor._get_segment_distance_squared(x, y, segment) <= width_squared:
+                return True
+        return False
+
+    @staticmethod
+    def _get_segment_distance_squared(x, y, segment):
+        """
+        @return the squared distance from (x, y) to the closest point on the segment
+
+        >>> Corridor._get_segment_distance_squared(1, 1, (0, 0, 2, 0)), Corridor._get_segment_distance_squared(4, 0, (0, 0, 2, 0)), Corridor._get_segment_distance_squared(1, 1, (0, 0, 0, 0))
+        (1.0, 4.0, 2)
+        """
+        x1, y1, x2, y2 = segment
+        dx = x2 - x1
+        dy = y2 - y1
+        length_squared = dx * dx + dy * dy
+        if length_squared == 0:
+            return (x - x1)**2 + (y - y1)**2
+
+        # The position of the closest point along the segment, from 0 at (x1, y1) to 1 at (x2, y2).
+        t = min(max(((x - x1) * dx + (y - y1) * dy) / length_squared, 0.0), 1.0)
+        return (x - x1 - t * dx)**2 + (y - y1 - t * dy)**2
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import polygon
+    module_dependencies = [polygon]
+
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    run_tests()
@@ -0,0 +1,565 @@
+"""
+A point quadtree whose nodes are stored in fixed-size pages of a file, for point sets larger than memory.
+
+The tree has the structure and the interface of CompactPointQuadTree: it indexes raw (x, y, id)
+records, and queries return ids or (x, y, id) tuples.  Each node is one page of the file, holding its
+boundary, the page of its first subtree, and the arrays of its points' coordinates and ids, with room
+for node_capacity points.  A node's four subtrees are four consecutive pages, and the pages of removed
+subtrees are reused.  The nodes are searched, and points routed to subtrees, with CompactPointQuadTree's
+own methods, so the two trees put points on the center lines in the same subtrees.
+
+Only a bounded LRU cache of the pages is held in memory.  Pages that are mutated are written back when
+they are evicted from the cache, or by flush() or close().  A mutation keeps the pages that it touches in
+the cache until it finishes, so the cache may briefly exceed its size by a few pages per level of the tree.
+
+The file is in the machine's byte order.  Reopen it with PagedPointQuadTree.open.
+"""
+
+from axis_aligned_bounding_box import AxisAlignedBoundingBox
+from compact_point_quad_tree import CompactPointQuadTree
+from array import array
+import collections
+import struct
+
+# magic, boundary (x min, x max, y min, y max), node capacity, point count, page count, first free page
+_FILE_HEADER = struct.Struct('=8sddddIqqq')
+_MAGIC = b'PQTPAGES'
+
+# boundary (x min, x max, y min, y max), point count, page of the first subtree (0 if none)
+_NODE_HEADER = struct.Struct('=ddddIq')
+
+_COORDINATE_SIZE = array('d').itemsize
+_ID_SIZE = array('q').itemsize
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+class _Node:
+    __slots__ = ('page', 'x_min', 'x_max', 'y_min', 'y_max', 'xs', 'ys', 'ids', 'subtree_page')
+
+    def __init__(self, page, x_min, x_max, y_min, y_max):
+        self.page = page
+        self.x_min = x_min
+        self.x_max = x_max
+        self.y_min = y_min
+        self.y_max = y_max
+        self.xs = array('d')
+        self.ys = array('d')
+        self.ids = array('q')
+
+        # The page of the upper-left subtree, followed by the upper-right, lower-left, and lower-right
+        # subtrees, or 0 if the node has not subdivided.  The root is page 0, so it is never a subtree.
+        self.subtree_page = 0
+
+
+class _PageCache:
+    """
+    An LRU cache of the nodes in a file's pages, which writes the mutated nodes back to the file.
+    """
+
+    def __init__(self, file, node_capacity, size):
+        """
+        @param file A binary file opened for reading and writing
+        @param size Integer The number of pages to keep in memory
+        """
+        assert size >= 1
+
+        self._file = file
+        self._node_capacity = node_capacity
+        self.page_size = _NODE_HEADER.size + node_capacity * (2 * _COORDINATE_SIZE + _ID_SIZE)
+        self.size = size
+
+        # {page: _Node}, from the least to the most recently used
+        self._nodes = collections.OrderedDict()
+        self._dirty_pages = set()
+
+        self.reads = 0
+        self.writes = 0
+
+    def get(self, page):
+        """
+        @return the _Node of the page, reading it from the file if it is not in the cache
+        """
+        node = self._nodes.get(page)
+        if node is None:
+            node = self._read(page)
+            self._nodes[page] = node
+        else:
+            self._nodes.move_to_end(page)
+        return node
+
+    def add(self, node):
+        """
+        Adds a new or overwritten node to the cache, to be written to the file.
+        """
+        self._nodes[node.page] = node
+        self._nodes.move_to_end(node.page)
+        self._dirty_pages.add(node.page)
+
+    def discard(self, page):
+        """
+        Drops the page from the cache without writing it, because it is no longer used.
+        """
+        self._nodes.pop(page, None)
+        self._dirty_pages.discard(page)
+
+    def mark_dirty(self, node):
+        self._dirty_pages.add(node.page)
+
+    def evict(self):
+        """
+        Evicts the least recently used pages until the cache is within its size, writing the dirty ones.
+        """
+        nodes = self._nodes
+        while len(nodes) > self.size:
+            page, node = nodes.popitem(last=False)
+            if page in self._dirty_pages:
+                self._dirty_pages.remove(page)
+                self._write(node)
+
+    def flush(self):
+        """
+        Writes every dirty page, keeping them in the cache.
+        """
+        for page in sorted(self._dirty_pages):
+            self._write(self._nodes[page])
+        self._dirty_pages.clear()
+
+    def clear(self):
+        self._nodes.clear()
+        self._dirty_pages.clear()
+
+    def get_page_offset(self, page):
+        return _FILE_HEADER.size + page * self.page_size
+
+    def _read(self, page):
+        self.reads += 1
+        self._file.seek(self.get_page_offset(page))
+        data = self._file.read(self.page_size)
+        x_min, x_max, y_min, y_max, count, subtree_page = _NODE_HEADER.unpack_from(data)
+        node = _Node(page, x_min, x_max, y_min, y_max)
+        node.subtree_page = subtree_page
+
+        coordinates_size = self._node_capacity * _COORDINATE_SIZE
+        offset = _NODE_HEADER.size
+        node.xs.frombytes(data[offset:offset + count * _COORDINATE_SIZE])
+        offset += coordinates_size
+        node.ys.frombytes(data[offset:offset + count * _COORDINATE_SIZE])
+        offset += coordinates_size
+        node.ids.frombytes(data[offset:offset + count * _ID_SIZE])
+        return node
+
+    def _write(self, node):
+        self.writes += 1
+        data = bytearray(self.page_size)
+        _NODE_HEADER.pack_into(data, 0, node.x_min, node.x_max, node.y_min, node.y_max, len(node.ids), node.subtree_page)
+
+        coordinates_size = self._node_capacity * _COORDINATE_SIZE
+        offset = _NODE_HEADER.size
+        for values, values_size in ((node.xs, coordinates_size), (node.ys, coordinates_size), (node.ids, None)):
+            values_bytes = values.tobytes()
+            data[offset:offset + len(values_bytes)] = values_bytes
+            if values_size is not None:
+                offset += values_size
+
+        self._file.seek(self.get_page_offset(node.page))
+        self._file.write(data)
+
+
+class PagedPointQuadTree:
+    """
+    >>> import os, tempfile
+    >>> directory = tempfile.TemporaryDirectory()
+    >>> path = os.path.join(directory.name, 'tree.pages')
+    >>> tree = PagedPointQuadTree(path, boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=4, half_size_y=4), node_capacity=1, cache_size=2)
+    >>> tree.insert(1, 1, 10), tree.insert(-1, -1, 11), tree.insert(5, 5, 12)
+    (True, True, False)
+    >>> tree.insert_many([(2, 2, 13), (-2, 2, 14), (0, 0, 15), (9, 9, 16)])
+    3
+    >>> len(tree), tree.page_size
+    (5, 68)
+    >>> tree.get_all_ids()
+    [10, 14, 15, 13, 11]
+
+    >>> region = AxisAlignedBoundingBox(center_x=1, center_y=1, half_size_x=1, half_size_y=1)
+    >>> tree.query_ids_in_region(region)
+    [10, 15, 13]
+    >>> tree.query_points_in_region(region)
+    [(1.0, 1.0, 10), (0.0, 0.0, 15), (2.0, 2.0, 13)]
+
+    A point is removed by its position and id, like in CompactPointQuadTree:
+    >>> tree.remove(1, 1, 10)
+    True
+    >>> tree.remove(1, 1, 10), tree.remove(2, 2, 99)
+    (False, False)
+    >>> tree.get_all_ids()
+    [15, 14, 13, 11]
+
+    The file holds the tree after a flush or a close:
+    >>> tree.close()
+    >>> tree = PagedPointQuadTree.open(path, cache_size=2)
+    >>> len(tree), tree.get_all_ids(), tree.query_points_in_region(region)
+    (4, [15, 14, 13, 11], [(0.0, 0.0, 15), (2.0, 2.0, 13)])
+    >>> tree.remove(2, 2, 13), tree.remove(-2, 2, 14), tree.remove(0, 0, 15), tree.remove(-1, -1, 11)
+    (True, True, True, True)
+    >>> len(tree), tree.get_all_ids(), tree._cache.get(0).subtree_page
+    (0, [], 0)
+    >>> tree.close()
+
+    With a cache much smaller than the tree, it answers like a CompactPointQuadTree:
+    >>> import random
+    >>> rng = random.Random(0)
+    >>> boundary = AxisAlignedBoundingBox.positive_quadrant_box(1, 1)
+    >>> tree = PagedPointQuadTree(path, boundary=boundary, node_capacity=4, cache_size=8)
+    >>> compact_tree = CompactPointQuadTree(boundary=boundary, node_capacity=4)
+    >>> records = [(rng.random(), rng.random(), point_id) for point_id in range(2000)]
+    >>> tree.insert_many(records), compact_tree.insert_many(records)
+    (2000, 2000)
+    >>> all(tree.remove(*record) for record in records[::3]), all(compact_tree.remove(*record) for record in records[::3])
+    (True, True)
+    >>> tree.insert_many(records[::6]), compact_tree.insert_many(records[::6])
+    (334, 334)
+    >>> regions = [AxisAlignedBoundingBox(rng.random(), rng.random(), 0.1, 0.2) for i in range(20)]
+    >>> all(tree.query_points_in_region(region) == compact_tree.query_points_in_region(region) for region in regions)
+    True
+    >>> tree.get_all_ids() == compact_tree.get_all_ids(), tree.page_writes > 0, len(tree._cache._nodes)
+    (True, True, 8)
+    >>> tree.close()
+    >>> tree = PagedPointQuadTree.open(path)
+    >>> tree.get_all_ids() == compact_tree.get_all_ids()
+    True
+    >>> tree.close()
+    >>> directory.cleanup()
+    """
+
+    def __init__(self, path, boundary, node_capacity, cache_size=DEFAULT_CACHE_SIZE):
+        """
+        Creates a new, empty tree in the file at path, replacing the file if it exists.
+
+        @param path The path of the file to store the tree's pages in
+        @param boundary AxisAlignedBoundingBox
+        @param node_capacity Integer the maximum number of points that each node in the tree can hold
+        @param cache_size Integer The number of pages to keep in memory
+        """
+        assert node_capacity >= 1
+
+        self._open(open(path, 'w+b'), boundary, node_capacity, cache_size)
+        self.clear()
+
+    @staticmethod
+    def open(path, cache_size=DEFAULT_CACHE_SIZE):
+        """
+        Opens a tree that was saved to the file at path by flush or close.
+        @return PagedPointQuadTree
+        """
+        file = open(path, 'r+b')
+        magic, x_min, x_max, y_min, y_max, node_capacity, count, page_count, free_page = _FILE_HEADER.unpack(file.read(_FILE_HEADER.size))
+        assert magic == _MAGIC, 'Not a PagedPointQuadTree file: {}'.format(path)
+
+        tree = PagedPointQuadTree.__new__(PagedPointQuadTree)
+        boundary = AxisAlignedBoundingBox(
+            center_x=(x_min + x_max) / 2, center_y=(y_min + y_max) / 2, half_size_x=(x_max - x_min) / 2, half_size_y=(y_max - y_min) / 2)
+        tree._open(file, boundary, node_capacity, cache_size)
+        tree._count = count
+        tree._page_count = page_count
+        tree._free_page = free_page
+        return tree
+
+    def _open(self, file, boundary, node_capacity, cache_size):
+        self.boundary = boundary
+        self._node_capacity = node_capacity
+        self._file = file
+        self._cache = _PageCache(file, node_capacity, cache_size)
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+
+    @property
+    def node_capacity(self):
+        return self._node_capacity
+
+    @property
+    def page_size(self):
+        """
+        @return the number of bytes in each page, which holds one node
+        """
+        return self._cache.page_size
+
+    @property
+    def page_count(self):
+        """
+        @return the number of pages in the file, including the unused ones
+        """
+        return self._page_count
+
+    @property
+    def cache_size(self):
+        """
+        @return the number of pages to keep in memory
+        """
+        return self._cache.size
+
+    @property
+    def page_reads(self):
+        """
+        @return the number of pages read from the file, which are the cache's misses
+        """
+        return self._cache.reads
+
+    @property
+    def page_writes(self):
+        """
+        @return the number of pages written to the file
+        """
+        return self._cache.writes
+
+    def clear(self):
+        self._cache.clear()
+        self._file.truncate(_FILE_HEADER.size)
+        self._cache.add(_Node(0, self.boundary.x_min(), self.boundary.x_max(), self.boundary.y_min(), self.boundary.y_max()))
+        self._count = 0
+        self._page_count = 1
+
+        # The first page of the most recently removed 4 subtrees, which holds the next one, or 0 if none.
+        self._free_page = 0
+
+    def flush(self):
+        """
+        Writes the mutated pages and the tree's header to the file.
+        """
+        self._cache.flush()
+        self._file.seek(0)
+        self._file.write(_FILE_HEADER.pack(
+            _MAGIC, self.boundary.x_min(), self.boundary.x_max(), self.boundary.y_min(), self.boundary.y_max(),
+            self._node_capacity, self._count, self._page_count, self._free_page))
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def insert(self, x, y, point_id):
+        """
+        @param x, y Number
+        @param point_id Integer A signed 64-bit id
+        @return True if the point was inserted, false otherwise (if the point is not in the tree's region)
+        """
+        cache = self._cache
+        root = cache.get(0)
+        if not (root.x_min <= x <= root.x_max and root.y_min <= y <= root.y_max):
+            return False
+
+        node_capacity = self._node_capacity
+        node = root
+        while len(node.ids) >= node_capacity:
+            if node.subtree_page == 0:
+                self._create_subtrees(node)
+            node = cache.get(node.subtree_page + CompactPointQuadTree._get_subtree_index(node, x, y))
+
+        node.xs.append(x)
+        node.ys.append(y)
+        node.ids.append(point_id)
+        cache.mark_dirty(node)
+        self._count += 1
+        cache.evict()
+        return True
+
+    insert_many = CompactPointQuadTree.insert_many
+
+    def remove(self, x, y, point_id):
+        """
+        @return True if the point was removed, false otherwise (if there is no point with the id at the position)
+        """
+        cache = self._cache
+        path = []
+        node = cache.get(0)
+        if not (node.x_min <= x <= node.x_max and node.y_min <= y <= node.y_max):
+            return False
+
+        # Points are only ever inserted into the subtree that _get_subtree_index chooses, so one path leads to the point.
+        while True:
+            path.append(node)
+            index = CompactPointQuadTree._find(node, x, y, point_id)
+            if index is not None:
+                break
+            if node.subtree_page == 0:
+                cache.evict()
+                return False
+            node = cache.get(node.subtree_page + CompactPointQuadTree._get_subtree_index(node, x, y))
+
+        del node.xs[index]
+        del node.ys[index]
+        del node.ids[index]
+        cache.mark_dirty(node)
+        if node.subtree_page != 0:
+            # Keep the nodes at the top of the tree full.
+            self._bubble_up_point(node)
+        for node in reversed(path):
+            self._remove_empty_subtrees(node)
+        self._count -= 1
+        cache.evict()
+        return True
+
+    def get_all_ids(self):
+        """
+        @return an array of the ids of every point in the tree
+        """
+        ids = []
+        self._extend_all_ids(0, ids)
+        return ids
+
+    def query_ids_in_region(self, region):
+        """
+        @param region AxisAlignedBoundingBox
+        @return an array of the ids of the points in the region
+        """
+        ids = []
+        self._query_ids_in_region(0, region.x_min(), region.x_max(), region.y_min(), region.y_max(), ids)
+        return ids
+
+    def query_points_in_region(self, region):
+        """
+        @param region AxisAlignedBoundingBox
+        @return an array of (x, y, id) of the points in the region
+        """
+        points = []
+        self._query_points_in_region(0, region.x_min(), region.x_max(), region.y_min(), region.y_max(), points)
+        return points
+
+    def _read_node(self, page):
+        """
+        @return the _Node of the page, for reading only, so that the cache may evict it at once
+        """
+        node = self._cache.get(page)
+        self._cache.evict()
+        return node
+
+    def _query_ids_in_region(self, page, x_min, x_max, y_min, y_max, ids):
+        node = self._read_node(page)
+        if node.x_min > x_max or node.x_max < x_min or node.y_min > y_max or node.y_max < y_min:
+            return
+
+        if x_min <= node.x_min and node.x_max <= x_max and y_min <= node.y_min and node.y_max <= y_max:
+            # The region contains the whole node, so it contains every point below it.
+            self._extend_all_ids(page, ids)
+            return
+
+        for x, y, point_id in zip(node.xs, node.ys, node.ids):
+            if x_min <= x <= x_max and y_min <= y <= y_max:
+                ids.append(point_id)
+
+        if node.subtree_page != 0:
+            for subtree_page in range(node.subtree_page, node.subtree_page + 4):
+                self._query_ids_in_region(subtree_page, x_min, x_max, y_min, y_max, ids)
+
+    def _query_points_in_region(self, page, x_min, x_max, y_min, y_max, points):
+        node = self._read_node(page)
+        if node.x_min > x_max or node.x_max < x_min or node.y_min > y_max or node.y_max < y_min:
+            return
+
+        for point in zip(node.xs, node.ys, node.ids):
+            if x_min <= point[0] <= x_max and y_min <= point[1] <= y_max:
+                points.append(point)
+
+        if node.subtree_page != 0:
+            for subtree_page in range(node.subtree_page, node.subtree_page + 4):
+                self._query_points_in_region(subtree_page, x_min, x_max, y_min, y_max, points)
+
+    def _extend_all_ids(self, page, ids):
+        node = self._read_node(page)
+        ids.extend(node.ids)
+        if node.subtree_page != 0:
+            for subtree_page in range(node.subtree_page, node.subtree_page + 4):
+                self._extend_all_ids(subtree_page, ids)
+
+    def _bubble_up_point(self, node):
+        """
+        Moves a point from a leaf below node into node, and then removes the subtrees that that empties.
+        """
+        cache = self._cache
+        path = []
+        leaf = node
+        while leaf.subtree_page != 0:
+            path.append(leaf)
+            subtrees = [cache.get(page) for page in range(leaf.subtree_page, leaf.subtree_page + 4)]
+            leaf = next((subtree for subtree in subtrees if subtree.ids), None)
+            if leaf is None:
+                return
+
+        node.xs.append(leaf.xs.pop())
+        node.ys.append(leaf.ys.pop())
+        node.ids.append(leaf.ids.pop())
+        cache.mark_dirty(node)
+        cache.mark_dirty(leaf)
+        for parent in reversed(path):
+            self._remove_empty_subtrees(parent)
+
+    def _remove_empty_subtrees(self, node):
+        if node.subtree_page == 0:
+            return
+        cache = self._cache
+        if not any(cache.get(page).ids for page in range(node.subtree_page, node.subtree_page + 4)):
+            self._free_subtree_pages(node.subtree_page)
+            node.subtree_page = 0
+            cache.mark_dirty(node)
+
+    def _create_subtrees(self, node):
+        """
+        Adds the nodes of the [upper-left, upper-right, lower-left, lower-right] subtrees to four consecutive pages.
+        """
+        page = self._allocate_subtree_pages()
+        center_x = (node.x_min + node.x_max) / 2
+        center_y = (node.y_min + node.y_max) / 2
+        for subtree in (
+                _Node(page, node.x_min, center_x, center_y, node.y_max),
+                _Node(page + 1, center_x, node.x_max, center_y, node.y_max),
+                _Node(page + 2, node.x_min, center_x, node.y_min, center_y),
+                _Node(page + 3, center_x, node.x_max, node.y_min, center_y)):
+            self._cache.add(subtree)
+        node.subtree_page = page
+        self._cache.mark_dirty(node)
+
+    def _allocate_subtree_pages(self):
+        """
+        @return the first of four consecutive unused pages
+        """
+        page = self._free_page
+        if page != 0:
+            self._free_page = self._cache.get(page).subtree_page
+        else:
+            page = self._page_count
+            self._page_count += 4
+        return page
+
+    def _free_subtree_pages(self, page):
+        """
+        Adds the four consecutive pages, which hold empty leaves, to the list of unused pages.
+        """
+        for unused_page in range(page + 1, page + 4):
+            self._cache.discard(unused_page)
+        free_node = _Node(page, 0, 0, 0, 0)
+        free_node.subtree_page = self._free_page
+        self._cache.add(free_node)
+        self._free_page = page
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import axis_aligned_bounding_box
+    import compact_point_quad_tree
+    module_dependencies = [axis_aligned_bounding_box, compact_point_quad_tree]
+
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    run_tests()
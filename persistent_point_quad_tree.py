@@ -0,0 +1,433 @@
+"""
+A persistent (copy-on-write) variant of PointQuadTree.
+
+Mutating a PersistentPointQuadTree copies only the nodes on the root-to-leaf path that the
+mutation touches; every other node is shared with earlier versions.  This makes snapshot()
+O(1), and old snapshots stay queryable while the live tree keeps changing.  A version is
+garbage-collected as soon as the last snapshot referencing it is dropped.
+
+Nodes store each point together with the coordinates it had when the node was created, so
+a snapshot keeps answering queries with the positions the points had at that version, even
+after translate_point moves them in the live tree.  The point objects themselves are shared
+between versions, and translate_point moves them in place, so snapshot queries return each point
+together with its position at that version.
+"""
+
+from point import Point
+from axis_aligned_bounding_box import AxisAlignedBoundingBox
+from point_quad_tree import PointQuadTree
+
+# (factor_x, factor_y) for the upper-left, upper-right, lower-left, and lower-right subtrees.
+_QUADRANT_FACTORS = ((-1, +1), (+1, +1), (-1, -1), (+1, -1))
+
+
+class _Node:
+    """
+    An immutable tree node.
+    """
+    __slots__ = ('boundary', 'entries', 'subtrees')
+
+    def __init__(self, boundary, entries=(), subtrees=None):
+        """
+        @param boundary AxisAlignedBoundingBox
+        @param entries tuple((x, y, Point))
+        @param subtrees tuple(_Node) of length 4, or None if the node has not subdivided
+        """
+        self.boundary = boundary
+        self.entries = entries
+        self.subtrees = subtrees
+
+
+class PointQuadTreeSnapshot:
+    """
+    A read-only view of one version of a PersistentPointQuadTree.
+
+    >>> tree = PersistentPointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=4, half_size_y=4), node_capacity=1)
+    >>> p1 = Point(1, 1)
+    >>> tree.insert(p1)
+    True
+    >>> snapshot = tree.snapshot()
+    >>> tree.insert(Point(2, 2))
+    True
+    >>> tree.translate_point(p1, -2, -2) == PointQuadTree.TranslatePointResult.translated
+    True
+
+    The snapshot still sees the points, and positions, it was taken with:
+    >>> [(x, y) for x, y, point in snapshot.get_all_points()]
+    [(1, 1)]
+    >>> [(x, y, point is p1) for x, y, point in snapshot.query_points_in_region(AxisAlignedBoundingBox(center_x=1, center_y=1, half_size_x=0.5, half_size_y=0.5))]
+    [(1, 1, True)]
+    >>> snapshot.query_points_in_region(AxisAlignedBoundingBox(center_x=-1, center_y=-1, half_size_x=0.5, half_size_y=0.5))
+    []
+
+    ...while the live tree sees the current version:
+    >>> tree.get_all_points()
+    [(-1,-1), (2,2)]
+    """
+
+    def __init__(self, root):
+        """
+        @param root _Node
+        """
+        self._root = root
+
+    @property
+    def boundary(self):
+        return self._root.boundary
+
+    def get_all_points(self):
+        """
+        @return an array of (x, y, Point) for all Point's contained in this version, where (x, y) is the point's position at this version
+        """
+        entries = []
+        _collect_all_entries(self._root, entries)
+        return entries
+
+    def query_points_in_region(self, region):
+        """
+        @param region AxisAlignedBoundingBox
+        @return an array of (x, y, Point) for the Point's whose position (x, y) at this version is in the region
+        """
+        entries = []
+        _collect_entries_in_region(self._root, region, entries)
+        return entries
+
+
+class PersistentPointQuadTree:
+    """
+    Has the same interface and behavior as PointQuadTree, plus snapshot().
+
+    >>> tree = PersistentPointQuadTree(boundary=AxisAlignedBoundingBox(center_x=8, center_y=0, half_size_x=8, half_size_y=4), node_capacity=2)
+    >>> tree.insert(Point(17, 0))
+    False
+    >>> p1, p2, p3 = Point(7, 1), Point(9, 1), Point(7, -1)
+    >>> tree.insert(p1)
+    True
+    >>> tree.insert(p2)
+    True
+    >>> before = tree.snapshot()
+    >>> tree.insert(p3)
+    True
+    >>> tree.get_all_points()
+    [(7,1), (9,1), (7,-1)]
+    >>> tree.query_points_in_region(AxisAlignedBoundingBox.positive_quadrant_box(16, 16))
+    [(7,1), (9,1)]
+
+    Mutations copy only the path they touch.  The untouched root entries are shared:
+    >>> tree.snapshot()._root.entries is before._root.entries
+    True
+    >>> [point for x, y, point in before.get_all_points()]
+    [(7,1), (9,1)]
+
+    Removing bubbles points up from the leaves, like PointQuadTree:
+    >>> tree.remove(p1)
+    True
+    >>> tree.remove(p1)
+    False
+    >>> tree.get_all_points()
+    [(9,1), (7,-1)]
+    >>> tree.snapshot()._root.subtrees is None
+    True
+    >>> [point for x, y, point in before.get_all_points()]
+    [(7,1), (9,1)]
+
+    >>> tree.clear()
+    >>> tree.get_all_points()
+    []
+    >>> [point for x, y, point in before.get_all_points()]
+    [(7,1), (9,1)]
+    """
+
+    def __init__(self, boundary, node_capacity):
+        """
+        @param boundary AxisAlignedBoundingBox
+        @param node_capacity Integer the maximum number of points that each node in the tree can hold
+
+        node_capacity must be at least 1:
+        >>> PersistentPointQuadTree(boundary=None, node_capacity=0)
+        Traceback (most recent call last):
+        AssertionError
+        """
+        assert node_capacity >= 1
+
+        self._node_capacity = node_capacity
+        self._root = _Node(boundary)
+
+    @property
+    def boundary(self):
+        return self._root.boundary
+
+    def snapshot(self):
+        """
+        O(1).  The snapshot is unaffected by later mutations of this tree.
+        @return PointQuadTreeSnapshot of the current version
+        """
+        return PointQuadTreeSnapshot(self._root)
+
+    def get_all_points(self):
+        """
+        @return an array of all Point's contained in this tree
+        """
+        return [point for x, y, point in self.snapshot().get_all_points()]
+
+    def query_points_in_region(self, region):
+        """
+        @param region AxisAlignedBoundingBox
+        @return an array of Point's in the region
+        """
+        return [point for x, y, point in self.snapshot().query_points_in_region(region)]
+
+    def insert(self, point):
+        """
+        @param point Point
+        @return True if the point was inserted, false otherwise (if the point is not in the tree's region)
+        """
+        if not self.boundary.contains_point(point):
+            return False
+
+        self._root = _insert(self._root, (point.x, point.y, point), self._node_capacity)
+        return True
+
+    def clear(self):
+        self._root = _Node(self.boundary)
+
+    def remove(self, point):
+        """
+        @param point Point
+        @return True if the point was removed, false otherwise (if the point is not in the tree)
+        """
+        assert point
+
+        if not self.boundary.contains_point(point):
+            return False
+
+        new_root = _remove(self._root, point)
+        if new_root is None:
+            return False
+
+        self._root = new_root
+        return True
+
+    def translate_point(self, point, x, y):
+        """
+        If the translated position is outside the tree's boundary, the point will be removed.
+
+        @param point Point
+        @param x, y Number The amount to translate the point by.
+        @return PointQuadTree.TranslatePointResult
+
+        >>> tree = PersistentPointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=3, half_size_y=3), node_capacity=1)
+        >>> tree.translate_point(Point(0, 0), x=1, y=1) == PointQuadTree.TranslatePointResult.not_in_tree
+        True
+        >>> tree.translate_point(Point(4, 4), x=1, y=1) == PointQuadTree.TranslatePointResult.out_of_bounds
+        True
+
+        Translate a deep point within its node, then into another node:
+        >>> p1, p2, p3 = Point(1, 1), Point(2, 2), Point(3, 3)
+        >>> for point in (p1, p2, p3):
+        ...     tree.insert(point)
+        True
+        True
+        True
+        >>> tree.translate_point(p3, -0.5, -0.5) == PointQuadTree.TranslatePointResult.translated
+        True
+        >>> tree.translate_point(p3, -5.5, -5.5) == PointQuadTree.TranslatePointResult.translated
+        True
+        >>> tree.get_all_points()
+        [(1,1), (2,2), (-3.0,-3.0)]
+
+        Translate a point out of the tree:
+        >>> tree.translate_point(p2, 2, 2) == PointQuadTree.TranslatePointResult.removed
+        True
+        >>> tree.get_all_points()
+        [(1,1), (-3.0,-3.0)]
+        """
+        assert point
+
+        if not self.boundary.contains_point(point):
+            return PointQuadTree.TranslatePointResult.out_of_bounds
+
+        # Fast path: the point stays within the node that holds it.
+        new_root = _replace_entry(self._root, point, (point.x + x, point.y + y, point))
+        if new_root is not None:
+            self._root = new_root
+            point.translate(x, y)
+            return PointQuadTree.TranslatePointResult.translated
+
+        new_root = _remove(self._root, point)
+        if new_root is None:
+            return PointQuadTree.TranslatePointResult.not_in_tree
+
+        point.translate(x, y)
+        if self.boundary.contains_point(point):
+            new_root = _insert(new_root, (point.x, point.y, point), self._node_capacity)
+            result = PointQuadTree.TranslatePointResult.translated
+        else:
+            result = PointQuadTree.TranslatePointResult.removed
+        self._root = new_root
+        return result
+
+
+def _collect_all_entries(node, entries):
+    entries.extend(node.entries)
+    if node.subtrees:
+        for subtree in node.subtrees:
+            _collect_all_entries(subtree, entries)
+
+
+def _collect_entries_in_region(node, region, entries):
+    if not node.boundary.intersects(region):
+        return
+
+    entries.extend(entry for entry in node.entries if region.contains(entry[0], entry[1]))
+
+    if node.subtrees:
+        for subtree in node.subtrees:
+            _collect_entries_in_region(subtree, region, entries)
+
+
+def _replace_item(items, index, new_item):
+    """
+    >>> _replace_item((1, 2, 3), 1, 'x')
+    (1, 'x', 3)
+    """
+    return items[:index] + (new_item,) + items[index + 1:]
+
+
+def _create_subdivisions(boundary):
+    """
+    @return tuple(_Node) the four empty subtrees of boundary
+    """
+    half_size_x = boundary.half_size_x / 2
+    half_size_y = boundary.half_size_y / 2
+    return tuple(
+        _Node(AxisAlignedBoundingBox(
+            boundary.center_x + (factor_x * half_size_x),
+            boundary.center_y + (factor_y * half_size_y),
+            half_size_x,
+            half_size_y))
+        for (factor_x, factor_y) in _QUADRANT_FACTORS)
+
+
+def _collapse_if_empty(subtrees):
+    """
+    @return subtrees, or None if none of them hold any points
+    """
+    if any(subtree.entries for subtree in subtrees):
+        return subtrees
+    return None
+
+
+def _insert(node, entry, node_capacity):
+    """
+    The caller must ensure that node's boundary contains the entry.
+    @return the new node
+    """
+    if len(node.entries) < node_capacity:
+        return _Node(node.boundary, node.entries + (entry,), node.subtrees)
+
+    subtrees = node.subtrees or _create_subdivisions(node.boundary)
+    for subtree_index, subtree in enumerate(subtrees):
+        if subtree.boundary.contains(entry[0], entry[1]):
+            new_subtree = _insert(subtree, entry, node_capacity)
+            return _Node(node.boundary, node.entries, _replace_item(subtrees, subtree_index, new_subtree))
+
+    # Could not insert into any subtree.  This should never happen.
+    assert False
+
+
+def _remove(node, point):
+    """
+    @return the new node, or None if the point is not in node's tree
+    """
+    if not node.boundary.contains_point(point):
+        return None
+
+    for entry_index, entry in enumerate(node.entries):
+        if entry[2] == point:
+            entries = node.entries[:entry_index] + node.entries[entry_index + 1:]
+
+            # Bubble up a point from a leaf in order to keep the nodes at the top of the tree full.
+            subtrees, bubbled_entry = _pop_from_subtree_leaves(node.subtrees)
+            if bubbled_entry is not None:
+                entries += (bubbled_entry,)
+            return _Node(node.boundary, entries, subtrees)
+
+    if node.subtrees:
+        for subtree_index, subtree in enumerate(node.subtrees):
+            new_subtree = _remove(subtree, point)
+            if new_subtree is not None:
+                subtrees = _collapse_if_empty(_replace_item(node.subtrees, subtree_index, new_subtree))
+                return _Node(node.boundary, node.entries, subtrees)
+
+    return None
+
+
+def _pop_from_subtree_leaves(subtrees):
+    """
+    Remove an entry from the first non-empty leaf under subtrees.
+    @return (new_subtrees, removed_entry), where removed_entry is None if there was nothing to remove
+    """
+    if not subtrees:
+        return subtrees, None
+
+    for subtree_index, subtree in enumerate(subtrees):
+        new_subtree, removed_entry = _pop_from_leaf(subtree)
+        if removed_entry is not None:
+            return _collapse_if_empty(_replace_item(subtrees, subtree_index, new_subtree)), removed_entry
+
+    return subtrees, None
+
+
+def _pop_from_leaf(node):
+    """
+    @return (new_node, removed_entry), where removed_entry is None if there was nothing to remove
+    """
+    if node.subtrees:
+        subtrees, removed_entry = _pop_from_subtree_leaves(node.subtrees)
+        if removed_entry is None:
+            return node, None
+        return _Node(node.boundary, node.entries, subtrees), removed_entry
+
+    if node.entries:
+        return _Node(node.boundary, node.entries[1:], None), node.entries[0]
+
+    return node, None
+
+
+def _replace_entry(node, point, new_entry):
+    """
+    Replace point's entry, but only if the node that holds it also contains the new entry.
+    @return the new node, or None if the point was not found or would leave its node
+    """
+    if not node.boundary.contains_point(point):
+        return None
+
+    for entry_index, entry in enumerate(node.entries):
+        if entry[2] == point:
+            if not node.boundary.contains(new_entry[0], new_entry[1]):
+                return None
+            return _Node(node.boundary, _replace_item(node.entries, entry_index, new_entry), node.subtrees)
+
+    if node.subtrees:
+        for subtree_index, subtree in enumerate(node.subtrees):
+            new_subtree = _replace_entry(subtree, point, new_entry)
+            if new_subtree is not None:
+                return _Node(node.boundary, node.entries, _replace_item(node.subtrees, subtree_index, new_subtree))
+
+    return None
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree
+    module_dependencies = [point_quad_tree]
+
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    run_tests()
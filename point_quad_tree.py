@@ -15,6 +15,16 @@
 
 from point import Point
 from axis_aligned_bounding_box import AxisAlignedBoundingBox
+from point_quad_tree_hooks import PointQuadTreeHook
+from point_quad_tree_stats import PointQuadTreeStats
+from polygon import Polygon, BoxClassification
+from corridor import Corridor
+from point_quad_tree_watchers import RegionWatcher
+import bisect
+import contextlib
+import heapq
+import itertools
+import random
 
 class PointQuadTree:
     """
@@ -87,6 +97,17 @@ class PointQuadTree:
     False
     """
 
+    # The hooks that observe the operations called on this tree.  See add_operation_hook.
+    _operation_hooks = ()
+
+    # The RegionWatcher's registered on this node, whose regions this node's boundary, but none of its subtrees' boundaries, contains.
+    _watchers = ()
+    # The number of RegionWatcher's registered on this node and every node below it.
+    _watcher_count = 0
+
+    # The changes since the last checkpoint, shared by every node of the tree, or None if they are not tracked.  See enable_change_tracking.
+    _change_tracker = None
+
     def __init__(self, boundary, node_capacity):
         """
         @param boundary AxisAlignedBoundingBox
@@ -102,46 +123,2101 @@ class PointQuadTree:
         self.boundary = boundary
         self._node_capacity = node_capacity
         self._points = []
+        self._stats = None
+
+        # Shared by every node of the tree.  See structure_version.
+        self._structure_counter = _StructureCounter()
+
+        # Every RegionWatcher of the tree, shared by every node of the tree.  See add_region_watcher.
+        self._region_watchers = []
+
+        # The weight function of the aggregates, or None if they are disabled.  See enable_aggregates.
+        self._aggregate_weight = None
+        # (count, total_weight, weighted_x_sum, weighted_y_sum) of this node and every node below it.
+        self._aggregate = None
+
         self._clear_subtrees()
 
+    def is_empty(self):
+        """
+        @return True if the tree has no points.  This is O(1): the nodes above the leaves are kept full, so the tree
+            is empty exactly when its root is.
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(4, 4), node_capacity=1)
+        >>> p1, p2 = Point(1, 1), Point(3, 3)
+        >>> tree.is_empty(), tree.insert_points([p1, p2]), tree.remove(p1), tree.is_empty(), tree.remove(p2), tree.is_empty()
+        (True, [True, True], True, False, True, True)
+        """
+        return not self._points
+
     def get_all_points(self):
         """
         @return an array of all Point's contained in this tree
 
-        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=3, half_size_y=3), node_capacity=1)
-        >>> tree.get_all_points()
-        []
-        >>> tree.insert(Point(1, 1))
-        True
-        >>> tree.get_all_points()
-        [(1,1)]
-        >>> tree.insert(Point(2, 2))
-        True
-        >>> tree.get_all_points()
-        [(1,1), (2,2)]
-        >>> tree.get_all_points()
-        [(1,1), (2,2)]
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=3, half_size_y=3), node_capacity=1)
+        >>> tree.get_all_points()
+        []
+        >>> tree.insert(Point(1, 1))
+        True
+        >>> tree.get_all_points()
+        [(1,1)]
+        >>> tree.insert(Point(2, 2))
+        True
+        >>> tree.get_all_points()
+        [(1,1), (2,2)]
+        >>> tree.get_all_points()
+        [(1,1), (2,2)]
+        """
+        if self._operation_hooks:
+            return self._run_operation('get_all_points', self._get_all_points, [])
+        return self._get_all_points([])
+
+    def query_points_in_region(self, region):
+        """
+        @param region AxisAlignedBoundingBox
+        @return an array of Point's in the region
+        """
+        if self._operation_hooks:
+            return self._run_operation('query_points_in_region', self._query_points_in_region, region, [])
+        return self._query_points_in_region(region, [])
+
+    def query_points_in_region_page(self, region, limit, cursor=None):
+        """
+        Queries the points in a region a page at a time: the scan stops once it has found limit points,
+        and returns a cursor from which the next call resumes it, without rescanning the nodes before it.
+        The pages are in the same order as query_points_in_region: each node's points, then its subtrees',
+        in the order of the subtree quadrants.
+
+        The cursor is a position in that order, not a snapshot: the path of subtree indices from the root to a node,
+        and an offset in the node's points.  If the tree mutates between pages, the scan resumes at the same position,
+        and never fails.  The points that stay in the region, and in the nodes at or after the position, are still
+        returned once.  The points that are inserted, removed, or moved between pages, including the points that the
+        tree itself moves up to refill the nodes that removals empty, may be missed or returned twice.  If the cursor's
+        node has collapsed, the scan resumes after the node.
+
+        @param region AxisAlignedBoundingBox
+        @param limit Integer The maximum number of points to return, at least 1
+        @param cursor The cursor of the previous page, or None for the first page
+        @return (an array of up to limit Point's in the region, the cursor of the next page or None if there are no more points)
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> tree.insert_points([Point(1, 1), Point(7, 7), Point(2, 3), Point(6, 1), Point(3, 2)])
+        [True, True, True, True, True]
+        >>> tree.query_points_in_region(tree.boundary)
+        [(1,1), (7,7), (2,3), (3,2), (6,1)]
+        >>> points, cursor = tree.query_points_in_region_page(tree.boundary, 2)
+        >>> points, cursor
+        ([(1,1), (7,7)], ((2,), 0))
+        >>> points, cursor = tree.query_points_in_region_page(tree.boundary, 2, cursor)
+        >>> points, cursor
+        ([(2,3), (3,2)], ((3,), 0))
+        >>> tree.query_points_in_region_page(tree.boundary, 2, cursor)
+        ([(6,1)], None)
+
+        The pages are the query's points, and each page stops the scan early:
+        >>> import random
+        >>> rng = random.Random(0)
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(64, 64), node_capacity=4)
+        >>> _ = tree.insert_points([Point(rng.uniform(0, 64), rng.uniform(0, 64)) for i in range(5000)])
+        >>> region = AxisAlignedBoundingBox(center_x=30, center_y=30, half_size_x=20, half_size_y=25)
+        >>> stats = tree.enable_stats()
+        >>> pages = []
+        >>> cursor = None
+        >>> while cursor is not None or not pages:
+        ...     points, cursor = tree.query_points_in_region_page(region, 100, cursor)
+        ...     pages.append(points)
+        >>> [point for page in pages for point in page] == tree.query_points_in_region(region), [len(page) for page in pages[-2:]]
+        (True, [100, 20])
+        >>> stats.get_operation_stats('query_points_in_region_page').nodes_visited < 1.1 * stats.get_operation_stats('query_points_in_region').nodes_visited
+        True
+        >>> stats.get_operation_stats('query_points_in_region_page').calls == len(pages)
+        True
+
+        Mutating the tree between pages, the points that it does not touch are still returned once:
+        >>> points = tree.query_points_in_region(region)
+        >>> removed_points = points[100:2000:10]
+        >>> page, cursor = tree.query_points_in_region_page(region, 500)
+        >>> tree.remove_points(removed_points) == [True] * len(removed_points)
+        True
+        >>> _ = tree.insert_points([Point(rng.uniform(0, 64), rng.uniform(0, 64)) for i in range(500)])
+        >>> while cursor is not None:
+        ...     next_page, cursor = tree.query_points_in_region_page(region, 500, cursor)
+        ...     page.extend(next_page)
+        >>> untouched_ids = set(map(id, points)) - set(map(id, removed_points))
+        >>> page_ids = [id(point) for point in page]
+        >>> all(page_ids.count(point_id) == 1 for point_id in untouched_ids)
+        True
+        """
+        assert limit >= 1
+
+        if self._operation_hooks:
+            return self._run_operation('query_points_in_region_page', self._query_points_in_region_page, region, limit, cursor)
+        return self._query_points_in_region_page(region, limit, cursor)
+
+    def _query_points_in_region_page(self, region, limit, cursor):
+        points = []
+        resume_path, resume_offset = cursor if cursor is not None else ((), 0)
+        return points, self._query_points_in_region_from(region, limit, resume_path, resume_offset, (), points)
+
+    def _query_points_in_region_from(self, region, limit, resume_path, resume_offset, path, points):
+        """
+        @param resume_path tuple of the subtree indices from this node to the node to resume the scan at,
+            or None to scan all of this node
+        @param resume_offset Integer The offset in the points of the node to resume the scan at
+        @param path tuple of the subtree indices from the root to this node
+        @param points array to append the Point's in the region to, until it has limit points
+        @return the cursor of the next point in the region, or None if the scan finished this node
+        """
+        stats = self._stats
+        if stats is not None:
+            stats.current.nodes_visited += 1
+            stats.current.intersects_tests += 1
+
+        if not self.boundary.intersects(region):
+            return None
+
+        first_subtree_index = 0
+        subtree_resume_path = None
+        if resume_path:
+            # The cursor is below this node, whose points were already scanned.
+            first_subtree_index = resume_path[0]
+            subtree_resume_path = resume_path[1:]
+        else:
+            offset = resume_offset if resume_path is not None else 0
+            if stats is not None:
+                stats.current.contains_tests += max(len(self._points) - offset, 0)
+                stats.current.points_tested += max(len(self._points) - offset, 0)
+            for point_index in range(offset, len(self._points)):
+                point = self._points[point_index]
+                if region.contains_point(point):
+                    if len(points) == limit:
+                        return path, point_index
+                    points.append(point)
+
+        if self._has_subdivided():
+            for subtree_index, subtree in enumerate(self._subtree_iterator()):
+                if subtree_index >= first_subtree_index:
+                    cursor = subtree._query_points_in_region_from(
+                        region,
+                        limit,
+                        subtree_resume_path if subtree_index == first_subtree_index else None,
+                        resume_offset,
+                        path + (subtree_index,),
+                        points)
+                    if cursor is not None:
+                        return cursor
+
+        return None
+
+    def query_points_in_region_lod(self, region, min_cell_size):
+        """
+        Queries a region at a level of detail, such as for drawing it zoomed out: nodes smaller than min_cell_size
+        are not descended into, and are instead represented by their first point and their count of points.
+        The cost is proportional to the number of cells of min_cell_size in the region, rather than to its points,
+        if aggregates are enabled.  Without them, each representative counts the points below its node.
+
+        @param region AxisAlignedBoundingBox
+        @param min_cell_size Number The size below which a node is represented by one point
+        @return an array of (Point, count): each point in the region of a node at least min_cell_size wide and high,
+            with a count of 1, and, for each non-empty node smaller than min_cell_size that intersects the region,
+            its first point and the number of points in and below it.  A node on the region's edge may count,
+            and be represented by, points just outside of the region.
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> tree.insert_points([Point(1, 1), Point(7, 7), Point(0.5, 0.5), Point(1.5, 0.5), Point(0.5, 1.5)])
+        [True, True, True, True, True]
+        >>> tree.query_points_in_region_lod(tree.boundary, min_cell_size=3)
+        [((1,1), 1), ((7,7), 1), ((0.5,0.5), 1), ((1.5,0.5), 2)]
+        >>> tree.query_points_in_region_lod(tree.boundary, min_cell_size=0) == [(point, 1) for point in tree.query_points_in_region(tree.boundary)]
+        True
+
+        Every point is counted once, and the nodes visited are bounded by the cells of the region:
+        >>> import random
+        >>> rng = random.Random(0)
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(64, 64), node_capacity=4)
+        >>> _ = tree.insert_points([Point(rng.uniform(0, 64), rng.uniform(0, 64)) for i in range(5000)])
+        >>> tree.enable_aggregates()
+        >>> stats = tree.enable_stats()
+        >>> representatives = tree.query_points_in_region_lod(tree.boundary, min_cell_size=8)
+        >>> sum(count for (point, count) in representatives), len(representatives)
+        (5000, 596)
+        >>> _ = tree.query_points_in_region(tree.boundary)
+        >>> stats.get_operation_stats('query_points_in_region_lod').nodes_visited < stats.get_operation_stats('query_points_in_region').nodes_visited / 4
+        True
+        """
+        if self._operation_hooks:
+            return self._run_operation('query_points_in_region_lod', self._query_points_in_region_lod, region, min_cell_size, [])
+        return self._query_points_in_region_lod(region, min_cell_size, [])
+
+    def _query_points_in_region_lod(self, region, min_cell_size, representatives):
+        """
+        @param representatives array to append the (Point, count)'s to
+        @return representatives
+        """
+        stats = self._stats
+        if stats is not None:
+            stats.current.nodes_visited += 1
+            stats.current.intersects_tests += 1
+
+        if not self.boundary.intersects(region):
+            return representatives
+
+        if 2 * self.boundary.half_size_x < min_cell_size or 2 * self.boundary.half_size_y < min_cell_size:
+            # Internal nodes are full, so a node without points has no points below it.
+            if self._points:
+                count = self._aggregate[0] if self._aggregate is not None else self._count_points()
+                representatives.append((self._points[0], count))
+            return representatives
+
+        if stats is not None:
+            stats.current.contains_tests += len(self._points)
+            stats.current.points_tested += len(self._points)
+
+        for point in self._points:
+            if region.contains_point(point):
+                representatives.append((point, 1))
+
+        if self._has_subdivided():
+            for subtree in self._subtree_iterator():
+                subtree._query_points_in_region_lod(region, min_cell_size, representatives)
+
+        return representatives
+
+    def query_points_in_polygon(self, vertices):
+        """
+        Nodes entirely inside or outside of the polygon are taken or skipped whole, so only the points of
+        nodes that its edges cross are tested against it, and mostly against only the edges that cross the node.
+
+        @param vertices iterable((x, y)) The vertices of a simple polygon, in order
+        @return an array of the Point's in the polygon, including those on its edges
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> for point in (Point(1, 1), Point(7, 7), Point(2, 5), Point(6, 1), Point(3, 3)):
+        ...     tree.insert(point)
+        True
+        True
+        True
+        True
+        True
+        >>> tree.query_points_in_polygon([(0, 0), (8, 0), (0, 8)])
+        [(1,1), (2,5), (3,3), (6,1)]
+
+        (7,7) is in the notch, and (2,5) is on an edge:
+        >>> tree.query_points_in_polygon([(0, 0), (8, 0), (8, 8), (4, 2), (0, 8)])
+        [(1,1), (2,5), (3,3), (6,1)]
+        """
+        polygon = Polygon(vertices)
+        if self._operation_hooks:
+            return self._run_operation('query_points_in_polygon', self._query_points_matching, polygon.classify_box, polygon.get_box_contains_point, None, [])
+        return self._query_points_matching(polygon.classify_box, polygon.get_box_contains_point, None, [])
+
+    def query_points_near_segment(self, x0, y0, x1, y1, width):
+        """
+        Only descends into nodes whose boundary is within width of the segment, unlike a query of the
+        segment's bounding box, which for a diagonal segment covers an area mostly far from it.
+
+        @param x0, y0, x1, y1 Number The segment's ends
+        @param width Number The maximum distance from the segment
+        @return an array of the Point's within width of the segment
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> for point in (Point(1, 1), Point(7, 1), Point(4, 5), Point(6, 6), Point(1, 7)):
+        ...     tree.insert(point)
+        True
+        True
+        True
+        True
+        True
+        >>> tree.query_points_near_segment(0, 0, 8, 8, width=1)
+        [(1,1), (4,5), (6,6)]
+        """
+        return self.query_points_near_polyline([(x0, y0), (x1, y1)], width)
+
+    def query_points_near_polyline(self, vertices, width):
+        """
+        @param vertices iterable((x, y)) The polyline's vertices, in order
+        @param width Number The maximum distance from the polyline
+        @return an array of the Point's within width of any of the polyline's segments
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> for point in (Point(1, 1), Point(7, 1), Point(4, 5), Point(6, 6), Point(1, 7)):
+        ...     tree.insert(point)
+        True
+        True
+        True
+        True
+        True
+        >>> tree.query_points_near_polyline([(0, 8), (4, 4), (8, 0)], width=1)
+        [(4,5), (1,7), (7,1)]
+        """
+        corridor = Corridor(vertices, width)
+        if self._operation_hooks:
+            return self._run_operation('query_points_near_polyline', self._query_points_matching, corridor.classify_box, corridor.get_box_contains_point, None, [])
+        return self._query_points_matching(corridor.classify_box, corridor.get_box_contains_point, None, [])
+
+    def query_points_matching(self, classify_boundary, contains_point):
+        """
+        Queries the points in an arbitrary shape.
+
+        @param classify_boundary function(AxisAlignedBoundingBox) -> BoxClassification
+            Whether a node's boundary is entirely inside, entirely outside, or crossing the shape.
+            Returning crossing is always correct, but only inside and outside skip per-point tests.
+        @param contains_point function(Point) -> Boolean
+            Whether the shape contains the point.  Only called for the points of nodes that cross the shape.
+        @return an array of the Point's in the shape
+
+        Query the points in a circle of radius 2 around (4, 4):
+        >>> def classify_boundary(boundary):
+        ...     corner_distances_squared = [(x - 4)**2 + (y - 4)**2 for x in (boundary.x_min(), boundary.x_max()) for y in (boundary.y_min(), boundary.y_max())]
+        ...     if max(corner_distances_squared) <= 4:
+        ...         return BoxClassification.inside
+        ...     if boundary.distance_squared(4, 4) > 4:
+        ...         return BoxClassification.outside
+        ...     return BoxClassification.crossing
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> for point in (Point(1, 1), Point(5, 5), Point(4, 6), Point(6, 6), Point(3, 4)):
+        ...     tree.insert(point)
+        True
+        True
+        True
+        True
+        True
+        >>> tree.query_points_matching(classify_boundary, lambda point: (point.x - 4)**2 + (point.y - 4)**2 <= 4)
+        [(4,6), (3,4), (5,5)]
+        """
+        def classify(boundary, context):
+            return classify_boundary(boundary), None
+
+        def get_contains_point(boundary, context):
+            return contains_point
+
+        if self._operation_hooks:
+            return self._run_operation('query_points_matching', self._query_points_matching, classify, get_contains_point, None, [])
+        return self._query_points_matching(classify, get_contains_point, None, [])
+
+    def query_nearest_point(self, x, y):
+        """
+        @param x, y Number
+        @return the Point closest to (x, y), or None if the tree is empty
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> tree.query_nearest_point(1, 1) is None
+        True
+        >>> for point in (Point(1, 1), Point(6, 6), Point(7, 1), Point(5, 5)):
+        ...     tree.insert(point)
+        True
+        True
+        True
+        True
+        >>> tree.query_nearest_point(6, 2)
+        (7,1)
+        >>> tree.query_nearest_point(4, 4)
+        (5,5)
+
+        The position does not have to be in the tree's boundary:
+        >>> tree.query_nearest_point(-10, 0)
+        (1,1)
+        """
+        if self._operation_hooks:
+            return self._run_operation('query_nearest_point', self._query_nearest_point, x, y)
+        return self._query_nearest_point(x, y)
+
+    def _query_nearest_point(self, x, y):
+        """
+        @return the Point closest to (x, y), or None if the tree is empty
+        """
+        stats = self._stats
+        nearest_point = None
+        nearest_distance_squared = None
+
+        # Visit the nodes closest to (x, y) first, stopping once no remaining node can be closer.
+        node_order = itertools.count()
+        nodes = [(self.boundary.distance_squared(x, y), next(node_order), self)]
+        while nodes:
+            boundary_distance_squared, _, tree = heapq.heappop(nodes)
+            if nearest_distance_squared is not None and boundary_distance_squared > nearest_distance_squared:
+                break
+
+            if stats is not None:
+                stats.current.nodes_visited += 1
+                stats.current.points_tested += len(tree._points)
+
+            for point in tree._points:
+                distance_squared = (point.x - x)**2 + (point.y - y)**2
+                if nearest_distance_squared is None or distance_squared < nearest_distance_squared:
+                    nearest_point = point
+                    nearest_distance_squared = distance_squared
+
+            if tree._has_subdivided():
+                for subtree in tree._subtree_iterator():
+                    heapq.heappush(nodes, (subtree.boundary.distance_squared(x, y), next(node_order), subtree))
+
+        return nearest_point
+
+    def query_point_pairs_in_range(self, distance):
+        """
+        Finds every pair of points that are in each other's region of half-size distance, with one traversal of the
+        tree, rather than one query per point.  Pairs of nodes that are farther apart than distance are skipped.
+
+        @param distance Number
+        @return an array of (Point, Point) pairs whose x's and y's each differ by at most distance.  Each pair is
+            returned once, in either order.
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> p1, p2, p3, p4 = Point(1, 1), Point(2, 2), Point(3, 1), Point(7, 7)
+        >>> tree.insert_points([p1, p2, p3, p4])
+        [True, True, True, True]
+        >>> sorted(tuple(sorted((point.x, other_point.x))) for (point, other_point) in tree.query_point_pairs_in_range(1))
+        [(1, 2), (2, 3)]
+        >>> len(tree.query_point_pairs_in_range(2)), len(tree.query_point_pairs_in_range(6)), tree.query_point_pairs_in_range(0.5)
+        (3, 6, [])
+
+        The same pairs as querying each point's region:
+        >>> import random
+        >>> rng = random.Random(0)
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(100, 100), node_capacity=3)
+        >>> points = [Point(rng.randint(0, 100), rng.randint(0, 100)) for i in range(300)]
+        >>> tree.insert_points(points) == [True] * 300
+        True
+        >>> region_pairs = set()
+        >>> for point in points:
+        ...     region = AxisAlignedBoundingBox(center_x=point.x, center_y=point.y, half_size_x=4, half_size_y=4)
+        ...     region_pairs.update(frozenset((id(point), id(other_point))) for other_point in tree.query_points_in_region(region) if other_point is not point)
+        >>> pairs = [frozenset((id(point), id(other_point))) for (point, other_point) in tree.query_point_pairs_in_range(4)]
+        >>> len(pairs) == len(set(pairs)), set(pairs) == region_pairs
+        (True, True)
+        """
+        if self._operation_hooks:
+            return self._run_operation('query_point_pairs_in_range', self._query_point_pairs_in_range, distance)
+        return self._query_point_pairs_in_range(distance)
+
+    def _query_point_pairs_in_range(self, distance):
+        pairs = []
+        self._query_point_pairs_within(distance, pairs)
+        return pairs
+
+    # The pair queries pass points as (x, y, Point) tuples, to compare coordinates without attribute lookups.
+
+    def _query_point_pairs_within(self, distance, pairs):
+        """
+        Adds the pairs of points in this subtree: among this node's points, between them and the subtrees'
+        points, within each subtree, and between each pair of subtrees.
+        """
+        if self._stats is not None:
+            self._stats.current.nodes_visited += 1
+            self._stats.current.points_tested += len(self._points)
+
+        points = [(point.x, point.y, point) for point in self._points]
+        for index, (x, y, point) in enumerate(points):
+            for other_x, other_y, other_point in points[index + 1:]:
+                if -distance <= other_x - x <= distance and -distance <= other_y - y <= distance:
+                    pairs.append((point, other_point))
+
+        if not self._has_subdivided():
+            return
+
+        subtrees = list(self._subtree_iterator())
+        for subtree_index, subtree in enumerate(subtrees):
+            if points:
+                subtree._query_point_pairs_with_points(points, distance, pairs)
+            subtree._query_point_pairs_within(distance, pairs)
+            for other_subtree in subtrees[subtree_index + 1:]:
+                subtree._query_point_pairs_between(other_subtree, distance, pairs)
+
+    def _query_point_pairs_between(self, other, distance, pairs):
+        """
+        Adds the pairs of a point in this subtree and a point in the other subtree, which does not overlap this one.
+        """
+        if self._stats is not None:
+            self._stats.current.intersects_tests += 1
+        if (self.boundary.x_min() - other.boundary.x_max() > distance or other.boundary.x_min() - self.boundary.x_max() > distance or
+                self.boundary.y_min() - other.boundary.y_max() > distance or other.boundary.y_min() - self.boundary.y_max() > distance):
+            return
+
+        if self._points:
+            other._query_point_pairs_with_points([(point.x, point.y, point) for point in self._points], distance, pairs)
+        if other._points and self._has_subdivided():
+            other_points = [(point.x, point.y, point) for point in other._points]
+            for subtree in self._subtree_iterator():
+                subtree._query_point_pairs_with_points(other_points, distance, pairs)
+        if self._has_subdivided() and other._has_subdivided():
+            for subtree in self._subtree_iterator():
+                for other_subtree in other._subtree_iterator():
+                    subtree._query_point_pairs_between(other_subtree, distance, pairs)
+
+    def _query_point_pairs_with_points(self, points, distance, pairs):
+        """
+        Adds the pairs of one of the points, which are not in this subtree, and a point in this subtree.
+        @param points array((x, y, Point))
+        """
+        stats = self._stats
+        if stats is not None:
+            stats.current.nodes_visited += 1
+            stats.current.points_tested += len(points) * len(self._points)
+
+        x_min = self.boundary.x_min() - distance
+        x_max = self.boundary.x_max() + distance
+        y_min = self.boundary.y_min() - distance
+        y_max = self.boundary.y_max() + distance
+        points = [(x, y, point) for (x, y, point) in points if x_min <= x <= x_max and y_min <= y <= y_max]
+        if not points:
+            return
+
+        if self._points:
+            # Only this node's points near the points can pair with them.
+            x_min = min(x for (x, y, point) in points) - distance
+            x_max = max(x for (x, y, point) in points) + distance
+            y_min = min(y for (x, y, point) in points) - distance
+            y_max = max(y for (x, y, point) in points) + distance
+            for other_point in self._points:
+                other_x = other_point.x
+                other_y = other_point.y
+                if x_min <= other_x <= x_max and y_min <= other_y <= y_max:
+                    for x, y, point in points:
+                        if -distance <= x - other_x <= distance and -distance <= y - other_y <= distance:
+                            pairs.append((point, other_point))
+
+        if self._has_subdivided():
+            for subtree in self._subtree_iterator():
+                subtree._query_point_pairs_with_points(points, distance, pairs)
+
+    def sample_points(self, k, region=None, rng=None, replace=False):
+        """
+        Samples points uniformly at random, without querying every point in the region.
+        With aggregates enabled, each sample descends from a node inside the region to its point by the nodes'
+        counts, in time proportional to the tree's depth, and only the points of the nodes that the region's
+        edges cross are tested.  Without aggregates, it queries the points and samples them.
+
+        @param k Integer The number of points to sample
+        @param region AxisAlignedBoundingBox, or None to sample from the whole tree
+        @param rng random.Random, or None to use the random module
+        @param replace Boolean Whether to sample with replacement, which may return a point more than once
+        @return an array of k Point's in random order, or, without replacement, of every point in the region
+            if it has fewer than k
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> tree.insert_points([Point(1, 1), Point(7, 7), Point(2, 3), Point(6, 1), Point(3, 2)])
+        [True, True, True, True, True]
+        >>> tree.enable_aggregates()
+        >>> rng = random.Random(0)
+        >>> sorted(tree.sample_points(5, rng=rng))
+        [(1,1), (2,3), (3,2), (6,1), (7,7)]
+        >>> region = AxisAlignedBoundingBox(center_x=2, center_y=2, half_size_x=1, half_size_y=1)
+        >>> sorted(tree.sample_points(10, region, rng))
+        [(1,1), (2,3), (3,2)]
+        >>> len(tree.sample_points(10, region, rng, replace=True)), tree.sample_points(1, AxisAlignedBoundingBox(5, 5, 0.5, 0.5), rng, replace=True)
+        (10, [])
+
+        Every point is equally likely, however deep its node, in and out of a region.
+        The chi-squared statistics of the sample counts are below their 99.9th percentiles:
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=2)
+        >>> points = [Point(rng.random(), rng.random()) for i in range(100)] + [Point(rng.uniform(0, 0.1), rng.uniform(0, 0.1)) for i in range(100)]
+        >>> _ = tree.insert_points(points)
+        >>> tree.enable_aggregates()
+        >>> def get_chi_squared(samples, candidates):
+        ...     counts = dict.fromkeys(map(id, candidates), 0)
+        ...     for point in samples:
+        ...         counts[id(point)] += 1
+        ...     expected_count = len(samples) / len(candidates)
+        ...     return sum((count - expected_count)**2 / expected_count for count in counts.values())
+        >>> get_chi_squared(tree.sample_points(20000, rng=rng, replace=True), points) < 266
+        True
+        >>> region = AxisAlignedBoundingBox(center_x=0.3, center_y=0.3, half_size_x=0.3, half_size_y=0.3)
+        >>> points_in_region = tree.query_points_in_region(region)
+        >>> samples = [point for i in range(500) for point in tree.sample_points(20, region, rng)]
+        >>> all(region.contains_point(point) for point in samples), all(len(set(map(id, samples[i:i + 20]))) == 20 for i in range(0, 10000, 20))
+        (True, True)
+        >>> len(points_in_region), get_chi_squared(samples, points_in_region) < 188
+        (133, True)
+
+        Without aggregates, the samples are the same:
+        >>> tree.disable_aggregates()
+        >>> get_chi_squared(tree.sample_points(20000, region, rng, replace=True), points_in_region) < 188
+        True
+        """
+        if self._operation_hooks:
+            return self._run_operation('sample_points', self._sample_points, k, region, rng or random, replace)
+        return self._sample_points(k, region, rng or random, replace)
+
+    def _sample_points(self, k, region, rng, replace):
+        # The candidates are split into blocks: an array of points, or a node whose points and points below it are all candidates.
+        if self._aggregate is None:
+            blocks = [self._get_all_points([]) if region is None else self._query_points_in_region(region, [])]
+        elif region is None:
+            blocks = [self]
+        else:
+            blocks = self._get_sample_blocks(region, [])
+
+        block_ends = list(itertools.accumulate(len(block) if isinstance(block, list) else block._aggregate[0] for block in blocks))
+        count = block_ends[-1] if block_ends else 0
+        if replace:
+            ranks = [rng.randrange(count) for i in range(k)] if count else []
+        else:
+            ranks = rng.sample(range(count), min(k, count))
+
+        points = []
+        for rank in ranks:
+            block_index = bisect.bisect_right(block_ends, rank)
+            block = blocks[block_index]
+            if block_index > 0:
+                rank -= block_ends[block_index - 1]
+            points.append(block[rank] if isinstance(block, list) else block._get_point_at_rank(rank))
+        return points
+
+    def _get_sample_blocks(self, region, blocks):
+        """
+        @param blocks array to append the blocks of the points in the region to: the array of a crossing node's
+            own points in the region, and each node inside the region
+        @return blocks
+        """
+        stats = self._stats
+        if stats is not None:
+            stats.current.nodes_visited += 1
+            stats.current.intersects_tests += 1
+
+        if not self.boundary.intersects(region):
+            return blocks
+        if region.contains_box(self.boundary):
+            if self._aggregate[0]:
+                blocks.append(self)
+            return blocks
+
+        if stats is not None:
+            stats.current.contains_tests += len(self._points)
+            stats.current.points_tested += len(self._points)
+
+        points_in_region = [point for point in self._points if region.contains_point(point)]
+        if points_in_region:
+            blocks.append(points_in_region)
+
+        if self._has_subdivided():
+            for subtree in self._subtree_iterator():
+                subtree._get_sample_blocks(region, blocks)
+        return blocks
+
+    def _get_point_at_rank(self, rank):
+        """
+        @param rank Integer less than the number of points in and below this node
+        @return the point at the rank in the order of _get_all_points, found by the aggregates' counts
+        """
+        node = self
+        while rank >= len(node._points):
+            rank -= len(node._points)
+            for subtree in node._subtree_iterator():
+                if rank < subtree._aggregate[0]:
+                    node = subtree
+                    break
+                rank -= subtree._aggregate[0]
+        return node._points[rank]
+
+    def density_grid(self, region, cols, rows):
+        """
+        Counts the points in each cell of a grid over the region, with one traversal of the tree.
+        A node that falls within a single cell adds its whole count to that cell, without visiting its
+        points or its subtrees.  Counts come from the aggregates when they are enabled, and are summed otherwise.
+
+        Each cell includes its lower edges, and the last column and row also include the region's upper edges.
+
+        @param region AxisAlignedBoundingBox
+        @param cols, rows Integer The number of cells across and down the region
+        @return an array of rows arrays of cols counts, where grid[row][col] is the count of the cell at
+            (region.x_min() + col * cell width, region.y_min() + row * cell height).  Use numpy.array(grid) for a NumPy array.
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> tree.insert_points([Point(1, 1), Point(1, 2), Point(3, 1), Point(7, 7), Point(8, 8), Point(5, 3)])
+        [True, True, True, True, True, True]
+        >>> tree.density_grid(tree.boundary, cols=2, rows=2)
+        [[3, 1], [0, 2]]
+        >>> tree.density_grid(AxisAlignedBoundingBox.positive_quadrant_box(4, 4), cols=4, rows=1)
+        [[0, 2, 0, 1]]
+
+        With aggregates enabled, whole nodes are counted from them:
+        >>> tree.enable_aggregates()
+        >>> tree.density_grid(tree.boundary, cols=2, rows=2)
+        [[3, 1], [0, 2]]
+        """
+        assert cols >= 1 and rows >= 1
+
+        if self._operation_hooks:
+            return self._run_operation('density_grid', self._density_grid, region, cols, rows)
+        return self._density_grid(region, cols, rows)
+
+    def _density_grid(self, region, cols, rows):
+        """
+        @return grid[row][col] counts
+        """
+        stats = self._stats
+        grid = [[0] * cols for row in range(rows)]
+        x_min = region.x_min()
+        x_max = region.x_max()
+        y_min = region.y_min()
+        y_max = region.y_max()
+        cell_width = (x_max - x_min) / cols
+        cell_height = (y_max - y_min) / rows
+
+        def get_col(x):
+            return min(int((x - x_min) / cell_width), cols - 1) if cell_width else 0
+
+        def get_row(y):
+            return min(int((y - y_min) / cell_height), rows - 1) if cell_height else 0
+
+        nodes = [self]
+        while nodes:
+            node = nodes.pop()
+            if stats is not None:
+                stats.current.nodes_visited += 1
+                stats.current.intersects_tests += 1
+
+            boundary = node.boundary
+            if not boundary.intersects(region):
+                continue
+
+            node_x_min = boundary.x_min()
+            node_x_max = boundary.x_max()
+            node_y_min = boundary.y_min()
+            node_y_max = boundary.y_max()
+            if x_min <= node_x_min and node_x_max <= x_max and y_min <= node_y_min and node_y_max <= y_max:
+                col = get_col(node_x_min)
+                row = get_row(node_y_min)
+                if col == get_col(node_x_max) and row == get_row(node_y_max):
+                    # Every point in and below the node is in this cell.
+                    grid[row][col] += node._aggregate[0] if node._aggregate is not None else node._count_points()
+                    continue
+
+            if stats is not None:
+                stats.current.points_tested += len(node._points)
+
+            for point in node._points:
+                if x_min <= point.x <= x_max and y_min <= point.y <= y_max:
+                    grid[get_row(point.y)][get_col(point.x)] += 1
+
+            if node._has_subdivided():
+                nodes.extend(node._subtree_iterator())
+
+        return grid
+
+    def _count_points(self):
+        """
+        @return the number of points in this node and every node below it
+        """
+        count = len(self._points)
+        if self._has_subdivided():
+            for subtree in self._subtree_iterator():
+                count += subtree._count_points()
+        return count
+
+    def approximate_field(self, x, y, theta, kernel, cutoff=None):
+        """
+        Sums a field, such as a force, that every point exerts at (x, y), with the Barnes-Hut approximation:
+        a node that is far from (x, y) relative to its size acts as a single point at its weighted centroid,
+        carrying the total weight of the points in and below it.  Requires enable_aggregates().
+
+        A node is approximated if its size is less than theta times its centroid's distance from (x, y),
+        and (x, y) is outside of its boundary.  theta=0 sums every point exactly; larger values visit
+        fewer nodes and are less accurate.  Barnes-Hut simulations commonly use about 0.5.
+
+        @param kernel function(dx, dy, weight) -> (field_x, field_y)
+            The field at (x, y) of a point of the weight at (x + dx, y + dy).
+            It is called with dx = dy = 0 for a point at (x, y), which it should usually ignore.
+        @param cutoff Number The distance beyond which the kernel is 0, or None if it has none.
+            Nodes farther than it are skipped, and only nodes entirely within it are approximated.
+        @return (field_x, field_y)
+
+        >>> def attraction(dx, dy, weight):
+        ...     distance_squared = dx**2 + dy**2
+        ...     if distance_squared == 0:
+        ...         return 0, 0
+        ...     return weight * dx / distance_squared, weight * dy / distance_squared
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(64, 64), node_capacity=1)
+        >>> tree.insert_points([Point(1, 1), Point(60, 60), Point(62, 61), Point(61, 62), Point(63, 63)])
+        [True, True, True, True, True]
+        >>> tree.enable_aggregates()
+        >>> tree.approximate_field(0, 0, theta=0, kernel=attraction)
+        (0.5325289291746661, 0.5325289291746661)
+
+        Viewed from (0, 0), the 4 points near (61.5, 61.5) act as one point at their centroid:
+        >>> tree.approximate_field(0, 0, theta=0.5, kernel=attraction)
+        (0.532520325203252, 0.532520325203252)
+
+        A kernel that only reaches nearby points:
+        >>> def short_attraction(dx, dy, weight):
+        ...     return attraction(dx, dy, weight) if dx**2 + dy**2 <= 10**2 else (0, 0)
+        >>> tree.approximate_field(0, 0, theta=0.5, kernel=short_attraction, cutoff=10)
+        (0.5, 0.5)
+        """
+        assert self._aggregate is not None
+
+        if self._operation_hooks:
+            return self._run_operation('approximate_field', self._approximate_field, x, y, theta, kernel, cutoff)
+        return self._approximate_field(x, y, theta, kernel, cutoff)
+
+    def _approximate_field(self, x, y, theta, kernel, cutoff):
+        """
+        @return (field_x, field_y)
+        """
+        stats = self._stats
+        theta_squared = theta**2
+        cutoff_squared = None if cutoff is None else cutoff**2
+        field_x = 0
+        field_y = 0
+        nodes = [self]
+        while nodes:
+            node = nodes.pop()
+            count, total_weight, weighted_x_sum, weighted_y_sum = node._aggregate
+            if count == 0:
+                continue
+
+            if stats is not None:
+                stats.current.nodes_visited += 1
+
+            boundary = node.boundary
+            if cutoff is not None and boundary.distance_squared(x, y) > cutoff_squared:
+                continue
+
+            if total_weight != 0 and not boundary.contains(x, y) and (cutoff is None or PointQuadTree._get_farthest_distance_squared(boundary, x, y) <= cutoff_squared):
+                dx = weighted_x_sum / total_weight - x
+                dy = weighted_y_sum / total_weight - y
+                size = 2 * max(boundary.half_size_x, boundary.half_size_y)
+                if size**2 < theta_squared * (dx**2 + dy**2):
+                    node_field_x, node_field_y = kernel(dx, dy, total_weight)
+                    field_x += node_field_x
+                    field_y += node_field_y
+                    continue
+
+            if stats is not None:
+                stats.current.points_tested += len(node._points)
+
+            weight = node._aggregate_weight
+            for point in node._points:
+                point_field_x, point_field_y = kernel(point.x - x, point.y - y, weight(point))
+                field_x += point_field_x
+                field_y += point_field_y
+
+            if node._has_subdivided():
+                nodes.extend(node._subtree_iterator())
+
+        return field_x, field_y
+
+    @staticmethod
+    def _get_farthest_distance_squared(boundary, x, y):
+        """
+        @return the squared distance from (x, y) to the farthest point of the boundary
+
+        >>> PointQuadTree._get_farthest_distance_squared(AxisAlignedBoundingBox(center_x=1, center_y=1, half_size_x=1, half_size_y=1), 0, 0)
+        8
+        """
+        return max(abs(x - boundary.x_min()), abs(x - boundary.x_max()))**2 + max(abs(y - boundary.y_min()), abs(y - boundary.y_max()))**2
+
+    def insert(self, point):
+        """
+        @param point Point
+        @return True if the point was inserted, false otherwise (if the point is not in the tree's region)
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=2, half_size_y=2), node_capacity=1)
+
+        A tree with a node_capacity of will subdivide after 2 insertions.
+        >>> p1 = Point(1, 1)
+        >>> p2 = Point(2, 2)
+        >>> tree.insert(p1)
+        True
+        >>> tree._points == [p1]
+        True
+        >>> tree._has_subdivided()
+        False
+        >>> tree.insert(p2)
+        True
+        >>> tree._points == [p1]
+        True
+        >>> tree._has_subdivided()
+        True
+
+        ...and the subtrees will have a total of 1 point, which is the ssecond point added.
+        >>> subtree_points = []
+        >>> for subtree in tree._subtree_iterator(): subtree_points.extend(subtree._points)
+        >>> subtree_points == [p2]
+        True
+
+        ...and none of the subtrees will have divided.
+        >>> any((subtree._has_subdivided() for subtree in tree._subtree_iterator()))
+        False
+        """
+        function = self._insert_watched if self._region_watchers else self._insert
+        if self._operation_hooks:
+            return self._run_operation('insert', function, point)
+        return function(point)
+
+    def insert_points(self, points):
+        """
+        Inserts many points with one descent of the tree, rather than one descent per point.
+        The points are partitioned among the subtrees at each node, so each node is visited once per call.
+
+        @param points iterable(Point)
+        @return an array of, for each point, True if the point was inserted, false otherwise (if the point is not in the tree's region)
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=2, half_size_y=2), node_capacity=1)
+        >>> tree.insert_points([Point(0, 0), Point(1, 1), Point(-1, -1), Point(3, 3), Point(2, 2)])
+        [True, True, True, False, True]
+        >>> tree.get_all_points()
+        [(0,0), (1,1), (2,2), (-1,-1)]
+
+        The tree is the same as inserting the points one at a time:
+        >>> other_tree = PointQuadTree(boundary=tree.boundary, node_capacity=1)
+        >>> for point in tree.get_all_points():
+        ...     _ = other_tree.insert(point)
+        >>> other_tree.get_all_points()
+        [(0,0), (1,1), (2,2), (-1,-1)]
+        """
+        function = self._insert_points_watched if self._region_watchers else self._insert_points_in_boundary
+        if self._operation_hooks:
+            return self._run_operation('insert_points', function, points)
+        return function(points)
+
+    def _insert_points_in_boundary(self, points):
+        """
+        @return an array of, for each point, True if the point is in the tree's region and was inserted
+        """
+        points = list(points)
+        if self._stats is not None:
+            self._stats.current.contains_tests += len(points)
+
+        points_were_inserted = [self.boundary.contains_point(point) for point in points]
+        self._insert_points([point for point, point_was_inserted in zip(points, points_were_inserted) if point_was_inserted])
+        return points_were_inserted
+
+    def clear(self):
+        """
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=2, half_size_y=2), node_capacity=1)
+        >>> p1 = Point(1, 1)
+        >>> p2 = Point(2, 2)
+        >>> tree.insert(p1)
+        True
+        >>> tree.insert(p2)
+        True
+        >>> tree.clear()
+        >>> tree.get_all_points()
+        []
+        """
+        for watcher in self._region_watchers:
+            watcher._update_points([])
+        self._clear()
+
+    def _clear(self):
+        if self._has_subdivided():
+            self._structure_counter.version += 1
+            if self._region_watchers:
+                self._pull_up_region_watchers()
+        self._points = []
+        self._clear_subtrees()
+        if self._change_tracker is not None:
+            self._change_tracker.mark_changed(self)
+        if self._aggregate_weight is not None:
+            self._update_aggregate()
+
+    def rebuild(self, node_capacity):
+        """
+        Re-packs the tree in place with a new node-capacity, keeping its points, stats, and hooks.
+        Points are re-inserted in breadth-first order, so the points that were nearest the root stay near the root.
+
+        @param node_capacity Integer the new maximum number of points that each node in the tree can hold
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(4, 4), node_capacity=1)
+        >>> for i in range(4):
+        ...     tree.insert(Point(i, i))
+        True
+        True
+        True
+        True
+        >>> tree._has_subdivided()
+        True
+        >>> tree.rebuild(node_capacity=4)
+        >>> tree.node_capacity, tree._has_subdivided()
+        (4, False)
+        >>> tree.get_all_points()
+        [(0,0), (2,2), (3,3), (1,1)]
+        """
+        assert node_capacity >= 1
+
+        points = [point for (node, depth) in self._node_depth_iterator() for point in node._points]
+        self._node_capacity = node_capacity
+        self._clear()
+        for point in points:
+            self._insert(point)
+
+    @property
+    def node_capacity(self):
+        return self._node_capacity
+
+    @property
+    def structure_version(self):
+        """
+        A number that changes whenever a node of the tree subdivides or collapses, so that anything
+        derived from the tree's partitions, such as a drawing of them, can tell when it is stale.
+        Inserting, removing, and translating points that do not subdivide or collapse a node do not change it.
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(4, 4), node_capacity=1)
+        >>> p1, p2 = Point(1, 1), Point(3, 3)
+        >>> tree.insert(p1)
+        True
+        >>> version = tree.structure_version
+        >>> tree.insert(p2), tree.structure_version == version
+        (True, False)
+        >>> version = tree.structure_version
+        >>> tree.translate_point(p2, -0.5, 0) == PointQuadTree.TranslatePointResult.translated
+        True
+        >>> tree.structure_version == version
+        True
+        >>> tree.remove(p2), tree.structure_version == version
+        (True, False)
+        """
+        return self._structure_counter.version
+
+    def remove(self, point):
+        """
+        @param point Point
+        @return True if the point was removed, false otherwise (if the point is not in the tree)
+
+        First add two points and remove the first...
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=2, half_size_y=2), node_capacity=1)
+        >>> p1 = Point(1, 1)
+        >>> p2 = Point(2, 2)
+        >>> tree.insert(p1)
+        True
+        >>> tree.insert(p2)
+        True
+        >>> tree.remove(p1)
+        True
+        >>> tree._points == [p2]
+        True
+        >>> tree._has_subdivided()
+        False
+
+        ...then add two points and remove the second.
+        >>> tree.clear()
+        >>> tree.insert(p1)
+        True
+        >>> tree.insert(p2)
+        True
+        >>> tree.remove(p2)
+        True
+        >>> tree._points == [p1]
+        True
+        >>> tree._has_subdivided()
+        False
+
+        Add some points, then remove them:
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> points = []
+        >>> for i in range(8):
+        ...     point = Point(i, i)
+        ...     points.append(point)
+        ...     tree.insert(point)
+        True
+        True
+        True
+        True
+        True
+        True
+        True
+        True
+        >>> sorted(tree.get_all_points())
+        [(0,0), (1,1), (2,2), (3,3), (4,4), (5,5), (6,6), (7,7)]
+        >>> for point in points:
+        ...     tree.remove(point)
+        ...     sorted(tree.get_all_points())
+        True
+        [(1,1), (2,2), (3,3), (4,4), (5,5), (6,6), (7,7)]
+        True
+        [(2,2), (3,3), (4,4), (5,5), (6,6), (7,7)]
+        True
+        [(3,3), (4,4), (5,5), (6,6), (7,7)]
+        True
+        [(4,4), (5,5), (6,6), (7,7)]
+        True
+        [(5,5), (6,6), (7,7)]
+        True
+        [(6,6), (7,7)]
+        True
+        [(7,7)]
+        True
+        []
+        """
+        assert point
+
+        function = self._remove_watched if self._region_watchers else self._remove
+        if self._operation_hooks:
+            return self._run_operation('remove', function, point)
+        return function(point)
+
+    class TranslatePointResult:
+        translated = 1
+        out_of_bounds = 2
+        not_in_tree = 3
+        removed = 4
+
+    def remove_points(self, points):
+        """
+        Removes many points with one descent of the tree, rather than one descent per point.
+        Each node is visited once per call, and refills itself from its subtrees once, after all of its removals.
+
+        @param points iterable(Point)
+        @return an array of, for each point, True if the point was removed, false otherwise (if the point is not in the tree)
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=2, half_size_y=2), node_capacity=1)
+        >>> p1, p2, p3, p4 = Point(0, 0), Point(1, 1), Point(-1, -1), Point(2, 2)
+        >>> tree.insert_points([p1, p2, p3, p4])
+        [True, True, True, True]
+        >>> tree.remove_points([p1, p4, Point(1, 1), p1])
+        [True, True, False, False]
+        >>> tree.get_all_points()
+        [(1,1), (-1,-1)]
+        >>> tree.remove_points([p2, p3])
+        [True, True]
+        >>> tree.get_all_points(), tree._has_subdivided()
+        ([], False)
+        """
+        function = self._remove_points_watched if self._region_watchers else self._remove_points_in_boundary
+        if self._operation_hooks:
+            return self._run_operation('remove_points', function, points)
+        return function(points)
+
+    def _remove_points_in_boundary(self, points):
+        """
+        @return an array of, for each point, True if the point was removed
+        """
+        points = list(points)
+        if self._stats is not None:
+            self._stats.current.contains_tests += len(points)
+
+        points_in_boundary = []
+        points_not_removed = []
+        for point in points:
+            if self.boundary.contains_point(point):
+                points_in_boundary.append(point)
+            else:
+                points_not_removed.append(point)
+        points_not_removed.extend(self._remove_points(points_in_boundary))
+
+        # Count the points that were not removed, because the same point may be requested more than once.
+        not_removed_counts = {}
+        for point in points_not_removed:
+            not_removed_counts[id(point)] = not_removed_counts.get(id(point), 0) + 1
+
+        points_were_removed = []
+        for point in reversed(points):
+            # The later requests of a point are the ones that fail.
+            if not_removed_counts.get(id(point)):
+                not_removed_counts[id(point)] -= 1
+                points_were_removed.append(False)
+            else:
+                points_were_removed.append(True)
+        points_were_removed.reverse()
+        return points_were_removed
+
+    def remove_points_in_region(self, region):
+        """
+        Removes every point in the region, which is the same as, but much faster than, querying the region
+        and then removing each point: nodes entirely inside the region are cleared whole, the points of the nodes
+        it crosses are filtered in place, and each node refills itself from its subtrees once, after its removals.
+
+        @param region AxisAlignedBoundingBox
+        @return an array of the Point's that were removed
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> tree.insert_points([Point(1, 1), Point(7, 7), Point(2, 3), Point(6, 1), Point(3, 2)])
+        [True, True, True, True, True]
+        >>> tree.remove_points_in_region(AxisAlignedBoundingBox(center_x=2, center_y=2, half_size_x=1, half_size_y=1))
+        [(1,1), (2,3), (3,2)]
+        >>> tree.get_all_points()
+        [(7,7), (6,1)]
+
+        Removing the whole tree collapses it:
+        >>> tree.remove_points_in_region(tree.boundary), tree.get_all_points(), tree._has_subdivided()
+        ([(7,7), (6,1)], [], False)
+
+        Removes the same points as querying the region and then removing each point,
+        leaves the internal nodes full, and keeps the aggregates up to date:
+        >>> import random
+        >>> rng = random.Random(0)
+        >>> points = [Point(rng.randrange(64), rng.randrange(64)) for i in range(500)]
+        >>> trees = [PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(64, 64), node_capacity=3) for i in range(2)]
+        >>> for tree in trees:
+        ...     _ = tree.insert_points(points)
+        ...     tree.enable_aggregates()
+        >>> checks = set()
+        >>> for i in range(10):
+        ...     region = AxisAlignedBoundingBox(rng.uniform(0, 64), rng.uniform(0, 64), rng.uniform(1, 16), rng.uniform(1, 16))
+        ...     queried_points = trees[1].query_points_in_region(region)
+        ...     for point in queried_points:
+        ...         checks.add(trees[1].remove(point))
+        ...     checks.add(sorted(map(id, trees[0].remove_points_in_region(region))) == sorted(map(id, queried_points)))
+        ...     checks.add(sorted(map(id, trees[0].get_all_points())) == sorted(map(id, trees[1].get_all_points())))
+        ...     checks.add(all(len(node._points) == node._node_capacity for node in trees[0]._node_iterator() if node._has_subdivided()))
+        ...     checks.add(trees[0].aggregate() == trees[1].aggregate())
+        >>> checks, 0 < len(trees[0].get_all_points()) < len(points)
+        ({True}, True)
+        """
+        def classify(boundary, context):
+            if not boundary.intersects(region):
+                return BoxClassification.outside, None
+            if region.contains_box(boundary):
+                return BoxClassification.inside, None
+            return BoxClassification.crossing, None
+
+        def get_contains_point(boundary, context):
+            return region.contains_point
+
+        function = self._remove_points_matching_watched if self._region_watchers else self._remove_points_matching
+        if self._operation_hooks:
+            return self._run_operation('remove_points_in_region', function, classify, get_contains_point, None, [])
+        return function(classify, get_contains_point, None, [])
+
+    def remove_points_matching(self, classify_boundary, contains_point):
+        """
+        Removes the points in an arbitrary shape, as remove_points_in_region does for a rectangle.
+
+        @param classify_boundary function(AxisAlignedBoundingBox) -> BoxClassification
+            Whether a node's boundary is entirely inside, entirely outside, or crossing the shape, as for query_points_matching.
+        @param contains_point function(Point) -> Boolean
+            Whether the shape contains the point.  Only called for the points of nodes that cross the shape.
+        @return an array of the Point's that were removed
+
+        Remove the points on the diagonal:
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> tree.insert_points([Point(1, 1), Point(7, 1), Point(4, 4), Point(6, 6), Point(1, 7)])
+        [True, True, True, True, True]
+        >>> tree.remove_points_matching(lambda boundary: BoxClassification.crossing, lambda point: point.x == point.y)
+        [(1,1), (4,4), (6,6)]
+        >>> tree.get_all_points()
+        [(1,7), (7,1)]
+        """
+        def classify(boundary, context):
+            return classify_boundary(boundary), None
+
+        def get_contains_point(boundary, context):
+            return contains_point
+
+        function = self._remove_points_matching_watched if self._region_watchers else self._remove_points_matching
+        if self._operation_hooks:
+            return self._run_operation('remove_points_matching', function, classify, get_contains_point, None, [])
+        return function(classify, get_contains_point, None, [])
+
+    def translate_point(self, point, x, y):
+        """
+        This has the same behavior as, but is more efficient than, removing the point and then
+        re-adding it at the new location.
+
+        If the translated position is outside the tree's boundary, the point will be removed.
+
+        @param point Point
+        @param x, y Number The amount to translate the point by.
+        @return TranslatePointResult
+
+        Attempt to translate a point not in the tree:
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=1, half_size_y=1), node_capacity=1)
+        >>> tree.translate_point(Point(0, 0), x=1, y=1) == PointQuadTree.TranslatePointResult.not_in_tree
+        True
+
+        Attempt to translate an out of bounds point:
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=1, half_size_y=1), node_capacity=1)
+        >>> tree.translate_point(Point(2, 2), x=1, y=1) == PointQuadTree.TranslatePointResult.out_of_bounds
+        True
+
+        Translate a point to a new position in the same node:
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=2, half_size_y=2), node_capacity=1)
+        >>> p1 = Point(1, 1)
+        >>> tree.insert(p1)
+        True
+        >>> tree.translate_point(p1, 1, 1) == PointQuadTree.TranslatePointResult.translated
+        True
+        >>> tree.get_all_points()
+        [(2,2)]
+        >>> tree._has_subdivided()
+        False
+
+        Translate a point such that its new position is out of the tree:
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=1, half_size_y=1), node_capacity=1)
+        >>> p1 = Point(1, 1)
+        >>> tree.insert(p1)
+        True
+        >>> tree.translate_point(p1, 1, 1) == PointQuadTree.TranslatePointResult.removed
+        True
+        >>> tree.get_all_points()
+        []
+
+        Translate a deep point:
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=3, half_size_y=3), node_capacity=1)
+        >>> p1 = Point(1, 1)
+        >>> p2 = Point(2, 2)
+        >>> p3 = Point(3, 3)
+        >>> tree.insert(p1)
+        True
+        >>> tree.insert(p2)
+        True
+        >>> tree.insert(p3)
+        True
+        >>> tree.translate_point(p3, -6, -6) == PointQuadTree.TranslatePointResult.translated
+        True
+        >>> tree.get_all_points()
+        [(1,1), (2,2), (-3,-3)]
+
+        ...and the subtrees that the point left are collapsed:
+        >>> tree._subtree_ur._has_subdivided()
+        False
+
+        Translate a deep point such that its new position is out of the tree:
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=3, half_size_y=3), node_capacity=1)
+        >>> p1 = Point(1, 1)
+        >>> p2 = Point(2, 2)
+        >>> p3 = Point(3, 3)
+        >>> tree.insert(p1)
+        True
+        >>> tree.insert(p2)
+        True
+        >>> tree.insert(p3)
+        True
+        >>> tree.translate_point(p3, 1, 1) == PointQuadTree.TranslatePointResult.removed
+        True
+        >>> tree.get_all_points()
+        [(1,1), (2,2)]
+        """
+        assert point
+
+        function = self._translate_point_watched if self._region_watchers else self._translate_point
+        if self._operation_hooks:
+            return self._run_operation('translate_point', function, point, x, y)
+        return function(point, x, y)
+
+    def translate_points(self, translations):
+        """
+        Translates many points with one traversal of the tree, rather than one descent per point.
+        Points that stay in their node's boundary move in place.  The others are re-inserted, in bulk, into the
+        lowest node that contains them, or removed if they leave the tree's boundary, as translate_point does.
+        The traversal visits every node, so use it to move a large share of the points, such as every point
+        in a step of a simulation.
+
+        @param translations iterable((Point, x, y)) Each point may be translated once.
+        @return an array of, for each translation, its TranslatePointResult
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(4, 4), node_capacity=1)
+        >>> p1, p2, p3, p4 = Point(1, 1), Point(3, 3), Point(1, 3), Point(2, 2)
+        >>> tree.insert_points([p1, p2, p3])
+        [True, True, True]
+        >>> results = tree.translate_points([(p1, 0.5, 0), (p2, -2, -2), (p3, 4, 0), (p4, 1, 1)])
+        >>> results == [PointQuadTree.TranslatePointResult.translated, PointQuadTree.TranslatePointResult.translated,
+        ...             PointQuadTree.TranslatePointResult.removed, PointQuadTree.TranslatePointResult.not_in_tree]
+        True
+        >>> tree.get_all_points(), p3
+        ([(1.5,1), (1,1)], (5,3))
+
+        The tree is the same as translating the points one at a time:
+        >>> import random
+        >>> rng = random.Random(0)
+        >>> points = [Point(rng.uniform(0, 100), rng.uniform(0, 100)) for i in range(500)]
+        >>> other_points = [Point(point.x, point.y) for point in points]
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(100, 100), node_capacity=4)
+        >>> other_tree = PointQuadTree(boundary=tree.boundary, node_capacity=4)
+        >>> tree.enable_aggregates()
+        >>> _ = tree.insert_points(points), other_tree.insert_points(other_points)
+        >>> translations = [(rng.uniform(-10, 10), rng.uniform(-10, 10)) for point in points]
+        >>> results = tree.translate_points((point, x, y) for (point, (x, y)) in zip(points, translations))
+        >>> other_results = [other_tree.translate_point(point, x, y) for (point, (x, y)) in zip(other_points, translations)]
+        >>> results == other_results
+        True
+        >>> sorted((point.x, point.y) for point in tree.get_all_points()) == sorted((point.x, point.y) for point in other_tree.get_all_points())
+        True
+        >>> all(len(node._points) == node.node_capacity for node in tree._node_iterator() if node._has_subdivided())
+        True
+        >>> count, total_weight, centroid_x, centroid_y = tree.aggregate()
+        >>> count == len(tree.get_all_points()), round(centroid_x, 9) == round(sum(point.x for point in tree.get_all_points()) / count, 9)
+        (True, True)
+        """
+        function = self._translate_points_watched if self._region_watchers else self._translate_points_in_boundary
+        if self._operation_hooks:
+            return self._run_operation('translate_points', function, translations)
+        return function(translations)
+
+    def _translate_points_in_boundary(self, translations):
+        """
+        @return an array of, for each translation, its TranslatePointResult
+        """
+        translations = list(translations)
+        translations_by_id = {id(point): (x, y) for (point, x, y) in translations}
+        assert len(translations_by_id) == len(translations)
+
+        translated_ids = set()
+        removed_ids = set(id(point) for point in self._translate_points(translations_by_id, translated_ids))
+        return [
+            PointQuadTree.TranslatePointResult.removed if id(point) in removed_ids else
+            PointQuadTree.TranslatePointResult.translated if id(point) in translated_ids else
+            PointQuadTree.TranslatePointResult.not_in_tree
+            for (point, x, y) in translations]
+
+    def _translate_points(self, translations_by_id, translated_ids):
+        """
+        @param translations_by_id {id(Point): (x, y)}
+        @param translated_ids set(id(Point)) To add the ids of the translated points to
+        @return an array of the translated points that left this node's boundary, which are no longer in this subtree
+        """
+        stats = self._stats
+        if stats is not None:
+            stats.current.nodes_visited += 1
+            stats.current.points_tested += len(self._points)
+
+        boundary = self.boundary
+        departed_points = []
+        remaining_points = []
+        for point in self._points:
+            translation = translations_by_id.get(id(point))
+            if translation is None:
+                remaining_points.append(point)
+                continue
+
+            translated_ids.add(id(point))
+            point.translate(*translation)
+            if self._change_tracker is not None:
+                self._change_tracker.mark_changed(self)
+            if stats is not None:
+                stats.current.contains_tests += 1
+            if boundary.contains_point(point):
+                remaining_points.append(point)
+            else:
+                departed_points.append(point)
+        self._points = remaining_points
+
+        if not self._has_subdivided():
+            if self._aggregate_weight is not None:
+                self._update_aggregate()
+            return departed_points
+
+        # Points that left a subtree, but not this node, are re-inserted here.
+        arrived_points = []
+        for subtree in self._subtree_iterator():
+            for point in subtree._translate_points(translations_by_id, translated_ids):
+                if stats is not None:
+                    stats.current.contains_tests += 1
+                if boundary.contains_point(point):
+                    arrived_points.append(point)
+                else:
+                    departed_points.append(point)
+        if arrived_points:
+            self._insert_points(arrived_points)
+
+        # Keep this node full by bubbling up points from the leaves.
+        while len(self._points) < self._node_capacity and self._has_subtree_points():
+            if not self._bubble_up_point():
+                break
+        self._remove_empty_subtrees()
+        if self._aggregate_weight is not None:
+            self._update_aggregate()
+        return departed_points
+
+    def add_operation_hook(self, hook):
+        """
+        Starts calling hook's events around each operation called on this tree.
+        While there are no hooks, checking for them costs only a truth test per operation.
+
+        @param hook PointQuadTreeHook
+
+        >>> class PrintingHook(PointQuadTreeHook):
+        ...     def on_operation_start(self, operation):
+        ...         print('start', operation)
+        ...     def on_operation_end(self, operation, result_count):
+        ...         print('end', operation, result_count)
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(4, 4), node_capacity=1)
+        >>> hook = PrintingHook()
+        >>> tree.add_operation_hook(hook)
+        >>> tree.insert(Point(1, 1))
+        start insert
+        end insert 1
+        True
+        >>> tree.insert(Point(5, 5))
+        start insert
+        end insert 0
+        False
+        >>> tree.query_points_in_region(tree.boundary)
+        start query_points_in_region
+        end query_points_in_region 1
+        [(1,1)]
+        >>> tree.translate_point(tree.query_nearest_point(0, 0), 1, 1) == PointQuadTree.TranslatePointResult.translated
+        start query_nearest_point
+        end query_nearest_point 1
+        start translate_point
+        end translate_point 1
+        True
+        >>> tree.remove_operation_hook(hook)
+        >>> tree.get_all_points()
+        [(2,2)]
+        """
+        self._operation_hooks = self._operation_hooks + (hook,)
+
+    def remove_operation_hook(self, hook):
+        """
+        @param hook PointQuadTreeHook A hook that was added with add_operation_hook
+        """
+        self._operation_hooks = tuple(existing_hook for existing_hook in self._operation_hooks if existing_hook is not hook)
+
+    def _run_operation(self, operation, function, *args):
+        """
+        Calls function(*args) between the hooks' start and end events.
+        @return the function's result
+        """
+        for hook in self._operation_hooks:
+            hook.on_operation_start(operation)
+
+        result = function(*args)
+
+        result_count = PointQuadTree._count_operation_result(operation, result)
+        for hook in reversed(self._operation_hooks):
+            hook.on_operation_end(operation, result_count)
+        return result
+
+    @staticmethod
+    def _count_operation_result(operation, result):
+        """
+        @return the number of points that the operation returned, inserted, removed, or translated
+        """
+        if operation == 'query_points_in_region_page':
+            return len(result[0])
+        elif operation in ('get_all_points', 'query_points_in_region', 'query_points_in_region_lod', 'query_points_in_polygon', 'query_points_near_polyline', 'query_points_matching', 'query_point_pairs_in_range',
+                'sample_points', 'remove_points_in_region', 'remove_points_matching'):
+            return len(result)
+        elif operation in ('insert_points', 'remove_points'):
+            return sum(result)
+        elif operation == 'query_nearest_point':
+            return 0 if result is None else 1
+        elif operation == 'translate_point':
+            return 1 if result == PointQuadTree.TranslatePointResult.translated else 0
+        elif operation == 'translate_points':
+            return result.count(PointQuadTree.TranslatePointResult.translated)
+        else:
+            return 1 if result else 0
+
+    def add_region_watcher(self, region, on_enter=None, on_leave=None):
+        """
+        Starts a standing query of the points in a region, which every insert, remove, and translate keeps up to date,
+        rather than querying the region again after each of them.  A mutation only checks the watchers registered on
+        the nodes that contain the points that it moves.
+
+        @param region AxisAlignedBoundingBox
+        @param on_enter function(Point) Called when a point enters the region, but not for the points already in it
+        @param on_leave function(Point) Called when a point leaves the region, including by being removed from the tree
+        @return RegionWatcher, whose points() are the points in the region
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> p1, p2, p3 = Point(1, 1), Point(7, 7), Point(3, 3)
+        >>> tree.insert_points([p1, p2])
+        [True, True]
+        >>> watcher = tree.add_region_watcher(AxisAlignedBoundingBox(center_x=2, center_y=2, half_size_x=2, half_size_y=2),
+        ...     on_enter=lambda point: print('entered', point), on_leave=lambda point: print('left', point))
+        >>> watcher.points()
+        [(1,1)]
+        >>> tree.insert(p3)
+        entered (3,3)
+        True
+        >>> tree.translate_point(p2, -4, -4) == PointQuadTree.TranslatePointResult.translated
+        entered (3,3)
+        True
+        >>> tree.translate_point(p1, 4, 0) == PointQuadTree.TranslatePointResult.translated
+        left (5,1)
+        True
+        >>> tree.remove(p3)
+        left (3,3)
+        True
+        >>> watcher.points()
+        [(3,3)]
+        >>> tree.move_region_watcher(watcher, AxisAlignedBoundingBox(center_x=5, center_y=1, half_size_x=1, half_size_y=1))
+        left (3,3)
+        entered (5,1)
+        >>> tree.clear()
+        left (5,1)
+        >>> tree.remove_region_watcher(watcher)
+
+        The watchers' points stay the same as a query of their regions, through every kind of mutation:
+        >>> import random
+        >>> rng = random.Random(0)
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(64, 64), node_capacity=2)
+        >>> def random_region():
+        ...     return AxisAlignedBoundingBox(rng.uniform(0, 64), rng.uniform(0, 64), rng.uniform(0.5, 16), rng.uniform(0.5, 16))
+        >>> watchers = [tree.add_region_watcher(random_region()) for i in range(20)]
+        >>> points = [Point(rng.randrange(64), rng.randrange(64)) for i in range(300)]
+        >>> _ = tree.insert_points(points[:100])
+        >>> checks = set()
+        >>> def check():
+        ...     checks.add(all(sorted(map(id, watcher.points())) == sorted(map(id, tree.query_points_in_region(watcher.region))) for watcher in watchers))
+        ...     checks.add(all(tree._get_region_watcher_path(watcher.region)[-1]._watchers.count(watcher) == 1 for watcher in watchers))
+        ...     checks.add(all(node._watcher_count == sum(len(subnode._watchers) for subnode in node._node_iterator()) for node in tree._node_iterator()))
+        ...     checks.add(tree._watcher_count == len(watchers))
+        >>> for point in points[100:200]:
+        ...     _ = tree.insert(point)
+        >>> check()
+        >>> for point in points[:200]:
+        ...     _ = tree.translate_point(point, rng.uniform(-4, 4), rng.uniform(-4, 4))
+        >>> check()
+        >>> _ = tree.translate_points([(point, rng.uniform(-4, 4), rng.uniform(-4, 4)) for point in points[:200]])
+        >>> check()
+        >>> for point in points[:30]:
+        ...     _ = tree.remove(point)
+        >>> _ = tree.remove_points(points[30:60])
+        >>> _ = tree.remove_points_in_region(random_region())
+        >>> check()
+        >>> tree.move_region_watcher(watchers[0], random_region())
+        >>> tree.remove_region_watcher(watchers.pop())
+        >>> _ = tree.insert_points(points[200:])
+        >>> tree.rebuild(node_capacity=3)
+        >>> check()
+        >>> tree.clear()
+        >>> check()
+        >>> checks
+        {True}
+        """
+        watcher = RegionWatcher(region, on_leave=on_leave)
+        watcher._update_points(self.query_points_in_region(region))
+        # The points already in the region did not enter it.
+        watcher._on_enter = on_enter
+        self._region_watchers.append(watcher)
+        self._add_region_watcher_to_node(watcher)
+        return watcher
+
+    def remove_region_watcher(self, watcher):
+        """
+        @param watcher RegionWatcher that add_region_watcher returned
+        """
+        self._remove_region_watcher_from_node(watcher)
+        self._region_watchers.remove(watcher)
+
+    def move_region_watcher(self, watcher, region):
+        """
+        Changes the region of a watcher, calling its on_enter and on_leave for the points that the move adds and drops.
+
+        @param watcher RegionWatcher that add_region_watcher returned
+        @param region AxisAlignedBoundingBox
+        """
+        self._remove_region_watcher_from_node(watcher)
+        watcher.region = region
+        self._add_region_watcher_to_node(watcher)
+        watcher._update_points(self.query_points_in_region(region))
+
+    def enable_stats(self):
+        """
+        Starts counting the work that each operation does, replacing any stats that are already enabled.
+        While stats are disabled, the counting costs only a check per visited node.
+
+        @return PointQuadTreeStats
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(4, 4), node_capacity=1)
+        >>> stats = tree.enable_stats()
+        >>> for point in (Point(1, 1), Point(3, 3), Point(1, 3)):
+        ...     tree.insert(point)
+        True
+        True
+        True
+        >>> stats.get_operation_stats('insert')
+        OperationStats<calls=3, nodes_visited=6, contains_tests=6, intersects_tests=0, points_tested=0, points_returned=0, subdivisions=1, collapses=0, bubble_ups=0>
+        >>> tree.query_points_in_region(AxisAlignedBoundingBox(center_x=3, center_y=3, half_size_x=0.5, half_size_y=0.5))
+        [(3,3)]
+        >>> stats.get_last_operation_stats('query_points_in_region')
+        OperationStats<calls=1, nodes_visited=5, contains_tests=2, intersects_tests=5, points_tested=2, points_returned=1, subdivisions=0, collapses=0, bubble_ups=0>
+
+        Removing the root's point bubbles up a point from a leaf, and collapses the empty subtrees:
+        >>> tree.remove(tree._points[0])
+        True
+        >>> tree.remove(tree._points[0])
+        True
+        >>> stats.get_operation_stats('remove').bubble_ups, stats.get_operation_stats('remove').collapses
+        (2, 1)
+
+        >>> tree.disable_stats()
+        >>> tree.stats() is None
+        True
+        """
+        self.disable_stats()
+        stats = PointQuadTreeStats()
+        self._set_stats(stats)
+        self.add_operation_hook(stats)
+        return stats
+
+    def disable_stats(self):
+        if self._stats is not None:
+            self.remove_operation_hook(self._stats)
+        self._set_stats(None)
+
+    def stats(self):
+        """
+        @return {operation: {counter: value}} since the stats were enabled, or None if the stats are disabled
+        """
+        if self._stats is None:
+            return None
+        return self._stats.snapshot()
+
+    @contextlib.contextmanager
+    def collect_stats(self):
+        """
+        Enables stats for the duration of a with-statement.
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(4, 4), node_capacity=1)
+        >>> with tree.collect_stats() as stats:
+        ...     tree.insert(Point(1, 1))
+        True
+        >>> stats.snapshot()['insert']['nodes_visited']
+        1
+        >>> tree.stats() is None
+        True
+        """
+        stats = self.enable_stats()
+        try:
+            yield stats
+        finally:
+            self.disable_stats()
+
+    def _set_stats(self, stats):
+        for node in self._node_iterator():
+            node._stats = stats
+
+    def enable_aggregates(self, weight=None):
+        """
+        Starts keeping, in every node, the count, total weight, and weighted centroid of the points in and below it.
+
+        Each insert, remove, and translate adds or subtracts the point in the aggregates of the nodes on its
+        path as it returns up the tree, so it costs O(depth) more.  Bulk inserts and removes, and translations
+        that move a point between nodes, re-sum the nodes that they change from their points and subtrees.
+        While aggregates are disabled, this costs only a check per changed node.
+
+        @param weight function(Point) -> Number, or None to weigh every point 1.
+            A point's weight must not change while it is in the tree.
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> tree.insert_points([Point(1, 1), Point(3, 5)])
+        [True, True]
+        >>> tree.enable_aggregates()
+        >>> tree.aggregate()
+        (2, 2, 2.0, 3.0)
+
+        The aggregates follow every change to the tree:
+        >>> p = Point(6, 6)
+        >>> tree.insert(p)
+        True
+        >>> tree.aggregate()
+        (3, 3, 3.3333333333333335, 4.0)
+        >>> tree.translate_point(p, -2, 1) == PointQuadTree.TranslatePointResult.translated
+        True
+        >>> tree.aggregate()
+        (3, 3, 2.6666666666666665, 4.333333333333333)
+        >>> tree.remove(tree._points[0])
+        True
+        >>> tree.aggregate()
+        (2, 2, 3.5, 6.0)
+
+        Weigh points by a value of their own:
+        >>> tree.enable_aggregates(weight=lambda point: point.x)
+        >>> tree.aggregate()
+        (2, 7, 3.5714285714285716, 6.142857142857143)
+        >>> tree.disable_aggregates()
+        >>> tree.aggregate() is None
+        True
+        """
+        self._set_aggregate_weight(weight or PointQuadTree._get_unit_weight)
+
+        # Sum the nodes bottom-up, so each node's subtrees are summed before it.
+        for node, depth in reversed(list(self._node_depth_iterator())):
+            node._update_aggregate()
+
+    def disable_aggregates(self):
+        self._set_aggregate_weight(None)
+        for node in self._node_iterator():
+            node._aggregate = None
+
+    def aggregate(self):
+        """
+        @return (count, total_weight, centroid_x, centroid_y) of the points in the tree, or None if aggregates are disabled.
+            The centroid is None if the total weight is 0.
+        """
+        if self._aggregate is None:
+            return None
+        count, total_weight, weighted_x_sum, weighted_y_sum = self._aggregate
+        if total_weight == 0:
+            return count, total_weight, None, None
+        return count, total_weight, weighted_x_sum / total_weight, weighted_y_sum / total_weight
+
+    def enable_change_tracking(self):
+        """
+        Starts tracking which nodes change, so that point_quad_tree_checkpoints can write only those nodes.
+
+        Every insert, remove, translate, subdivision, and collapse marks the nodes whose points or subtrees it
+        changes, including the nodes that it moves points out of or into to keep the nodes full, and a translate
+        marks the node of the point that it moves.  Marking a node costs a dictionary update, and while tracking
+        is disabled, this costs only a check per changed node.
+
+        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+        >>> p = Point(1, 1)
+        >>> tree.insert_points([Point(6, 6), p, Point(7, 1)])
+        [True, True, True]
+        >>> tree.enable_change_tracking()
+        >>> def get_changed_nodes():
+        ...     changed_nodes = sorted(str(node.boundary) for node in tree._change_tracker.nodes.values())
+        ...     tree._change_tracker.nodes.clear()
+        ...     return changed_nodes
+        >>> tree.translate_point(p, 1, 1) == PointQuadTree.TranslatePointResult.translated
+        True
+        >>> get_changed_nodes()
+        ['AABB<center=(2.0,2.0), half_size=(2.0,2.0)>']
+
+        Removing the root's point bubbles up a point from a subtree:
+        >>> tree.remove(tree._points[0]), tree._points, get_changed_nodes()
+        (True, [(2,2)], ['AABB<center=(2.0,2.0), half_size=(2.0,2.0)>', 'AABB<center=(4.0,4.0), half_size=(4.0,4.0)>'])
+
+        Subdividing marks the node and its new subtrees, and collapsing marks the node:
+        >>> tree.insert_points([Point(5, 5), Point(6, 7)]), len(get_changed_nodes())
+        ([True, True], 5)
+        >>> tree.remove_points_in_region(AxisAlignedBoundingBox(center_x=6, center_y=4, half_size_x=2, half_size_y=4)), get_changed_nodes()
+        ([(5,5), (6,7), (7,1)], ['AABB<center=(4.0,4.0), half_size=(4.0,4.0)>', 'AABB<center=(6.0,2.0), half_size=(2.0,2.0)>', 'AABB<center=(6.0,6.0), half_size=(2.0,2.0)>'])
+        >>> tree.disable_change_tracking()
+        >>> tree.insert(Point(3, 3)), tree._change_tracker
+        (True, None)
+        """
+        if self._change_tracker is None:
+            self._set_change_tracker(_ChangeTracker())
+
+    def disable_change_tracking(self):
+        self._set_change_tracker(None)
+
+    def _set_change_tracker(self, change_tracker):
+        for node in self._node_iterator():
+            node._change_tracker = change_tracker
+
+    def _set_aggregate_weight(self, weight):
+        for node in self._node_iterator():
+            node._aggregate_weight = weight
+
+    @staticmethod
+    def _get_unit_weight(point):
+        return 1
+
+    def _add_to_aggregate(self, point, sign):
+        """
+        Adds (sign=1) or subtracts (sign=-1) the point to or from this node's aggregate.
+        """
+        count, total_weight, weighted_x_sum, weighted_y_sum = self._aggregate
+        point_weight = sign * self._aggregate_weight(point)
+        self._aggregate = (count + sign, total_weight + point_weight, weighted_x_sum + point_weight * point.x, weighted_y_sum + point_weight * point.y)
+
+    def _translate_aggregate(self, point, x, y):
+        """
+        Moves the point's contribution to this node's aggregate by (x, y).
+        """
+        count, total_weight, weighted_x_sum, weighted_y_sum = self._aggregate
+        point_weight = self._aggregate_weight(point)
+        self._aggregate = (count, total_weight, weighted_x_sum + point_weight * x, weighted_y_sum + point_weight * y)
+
+    def _update_aggregate(self):
+        """
+        Re-sums this node's aggregate from its points and its subtrees' aggregates.
+        """
+        weight = self._aggregate_weight
+        count = len(self._points)
+        total_weight = 0
+        weighted_x_sum = 0
+        weighted_y_sum = 0
+        for point in self._points:
+            point_weight = weight(point)
+            total_weight += point_weight
+            weighted_x_sum += point_weight * point.x
+            weighted_y_sum += point_weight * point.y
+
+        if self._has_subdivided():
+            for subtree in self._subtree_iterator():
+                subtree_count, subtree_total_weight, subtree_weighted_x_sum, subtree_weighted_y_sum = subtree._aggregate
+                count += subtree_count
+                total_weight += subtree_total_weight
+                weighted_x_sum += subtree_weighted_x_sum
+                weighted_y_sum += subtree_weighted_y_sum
+
+        self._aggregate = (count, total_weight, weighted_x_sum, weighted_y_sum)
+
+    def _insert_watched(self, point):
+        point_was_inserted = self._insert(point)
+        if point_was_inserted:
+            self._update_region_watchers(point, True)
+        return point_was_inserted
+
+    def _insert_points_watched(self, points):
+        points = list(points)
+        points_were_inserted = self._insert_points_in_boundary(points)
+        for point, point_was_inserted in zip(points, points_were_inserted):
+            if point_was_inserted:
+                self._update_region_watchers(point, True)
+        return points_were_inserted
+
+    def _remove_watched(self, point):
+        point_was_removed = self._remove(point)
+        if point_was_removed:
+            self._update_region_watchers(point, False)
+        return point_was_removed
+
+    def _remove_points_watched(self, points):
+        points = list(points)
+        points_were_removed = self._remove_points_in_boundary(points)
+        for point, point_was_removed in zip(points, points_were_removed):
+            if point_was_removed:
+                self._update_region_watchers(point, False)
+        return points_were_removed
+
+    def _remove_points_matching_watched(self, classify, get_contains_point, context, removed_points):
+        self._remove_points_matching(classify, get_contains_point, context, removed_points)
+        for point in removed_points:
+            self._update_region_watchers(point, False)
+        return removed_points
+
+    def _translate_point_watched(self, point, x, y):
+        previous_x, previous_y = point.x, point.y
+        result = self._translate_point(point, x, y)
+        if result in (PointQuadTree.TranslatePointResult.translated, PointQuadTree.TranslatePointResult.removed):
+            self._update_region_watchers(point, result == PointQuadTree.TranslatePointResult.translated, previous_x, previous_y)
+        return result
+
+    def _translate_points_watched(self, translations):
+        translations = list(translations)
+        previous_positions = [(point.x, point.y) for (point, x, y) in translations]
+        results = self._translate_points_in_boundary(translations)
+        for (point, x, y), (previous_x, previous_y), result in zip(translations, previous_positions, results):
+            if result != PointQuadTree.TranslatePointResult.not_in_tree:
+                self._update_region_watchers(point, result == PointQuadTree.TranslatePointResult.translated, previous_x, previous_y)
+        return results
+
+    def _update_region_watchers(self, point, is_in_tree, previous_x=None, previous_y=None):
+        """
+        Updates the watchers whose regions the point may have entered or left.
+
+        @param is_in_tree Boolean Whether the point is in the tree after the mutation
+        @param previous_x, previous_y Number The point's position before the mutation, if it moved
+        """
+        positions = ((point.x, point.y),) if previous_x is None else ((point.x, point.y), (previous_x, previous_y))
+        for watcher in self._get_region_watchers_at(positions, []):
+            watcher._update_point(point, is_in_tree and watcher.region.contains_point(point))
+
+    def _get_region_watchers_at(self, positions, watchers):
+        """
+        @param positions tuple((x, y))
+        @param watchers array to append the watchers registered on the nodes that contain any of the positions to,
+            which include every watcher whose region contains one of them
+        @return watchers
+        """
+        watchers.extend(self._watchers)
+        for subtree in self._subtree_iterator():
+            if subtree is not None and subtree._watcher_count:
+                for (x, y) in positions:
+                    if subtree.boundary.contains(x, y):
+                        subtree._get_region_watchers_at(positions, watchers)
+                        break
+        return watchers
+
+    def _get_region_watcher_path(self, region):
+        """
+        @return an array of the nodes from this node down to the lowest node whose boundary contains the region,
+            or of only this node if none does
+        """
+        path = [self]
+        while path[-1]._has_subdivided():
+            for subtree in path[-1]._subtree_iterator():
+                if subtree.boundary.contains_box(region):
+                    path.append(subtree)
+                    break
+            else:
+                break
+        return path
+
+    def _add_region_watcher_to_node(self, watcher):
+        path = self._get_region_watcher_path(watcher.region)
+        for node in path:
+            node._watcher_count += 1
+        path[-1]._watchers = list(path[-1]._watchers)
+        path[-1]._watchers.append(watcher)
+
+    def _remove_region_watcher_from_node(self, watcher):
+        path = self._get_region_watcher_path(watcher.region)
+        for node in path:
+            node._watcher_count -= 1
+        path[-1]._watchers.remove(watcher)
+
+    def _push_down_region_watchers(self):
+        """
+        Moves this node's watchers into the new subtrees that contain their regions.
+        """
+        watchers = self._watchers
+        self._watchers = ()
+        self._watcher_count -= len(watchers)
+        for watcher in watchers:
+            self._add_region_watcher_to_node(watcher)
+
+    def _pull_up_region_watchers(self):
+        """
+        Moves the watchers of every node below this one into this node, before its subtrees are cleared.
+        """
+        watchers = list(self._watchers)
+        for subtree in self._subtree_iterator():
+            for node in subtree._node_iterator():
+                watchers.extend(node._watchers)
+        self._watchers = watchers
+
+    def _node_iterator(self):
+        """
+        @return this node and every node below it
+        """
+        yield self
+        if self._has_subdivided():
+            for subtree in self._subtree_iterator():
+                yield from subtree._node_iterator()
+
+    def _node_depth_iterator(self):
+        """
+        @return (node, depth) for this node and every node below it, in breadth-first order, where this node's depth is 0
+        """
+        level = [self]
+        depth = 0
+        while level:
+            next_level = []
+            for node in level:
+                yield node, depth
+                if node._has_subdivided():
+                    next_level.extend(node._subtree_iterator())
+            level = next_level
+            depth += 1
+
+    def _get_all_points(self, points):
         """
-        points = self._points.copy()
+        @param points array to append this tree's points to
+        @return points
+        """
+        if self._stats is not None:
+            self._stats.current.nodes_visited += 1
+
+        points.extend(self._points)
 
         # Add the points from the subtrees.
         if self._has_subdivided():
             for subtree in self._subtree_iterator():
-                points.extend(subtree.get_all_points())
+                subtree._get_all_points(points)
 
         return points
 
-    def query_points_in_region(self, region):
+    def _query_points_in_region(self, region, points_in_region):
         """
         @param region AxisAlignedBoundingBox
-        @return an array of Point's in the region
+        @param points_in_region array to append the Point's in the region to
+        @return points_in_region
         """
-        points_in_region = []
+        stats = self._stats
+        if stats is not None:
+            stats.current.nodes_visited += 1
+            stats.current.intersects_tests += 1
 
         # If the query region is outside of the boundary, no points are inside it.
         if not self.boundary.intersects(region):
             return points_in_region
 
+        if stats is not None:
+            stats.current.contains_tests += len(self._points)
+            stats.current.points_tested += len(self._points)
+
         # Query the points in this immediate tree.
         for point in self._points:
             if region.contains_point(point):
@@ -150,248 +2226,288 @@ class PointQuadTree:
         # Query the subtrees.
         if self._has_subdivided():
             for subtree in self._subtree_iterator():
-                points_in_region.extend(subtree.query_points_in_region(region))
+                subtree._query_points_in_region(region, points_in_region)
 
         return points_in_region
 
-    def insert(self, point):
+    def _query_points_matching(self, classify, get_contains_point, context, matching_points):
         """
-        @param point Point
-        @return True if the point was inserted, false otherwise (if the point is not in the tree's region)
+        @param classify function(AxisAlignedBoundingBox, context) -> (BoxClassification, subtree_context)
+            The subtree_context is passed when classifying the subtrees of a crossing node,
+            such as the polygon edges that cross the node.
+        @param get_contains_point function(AxisAlignedBoundingBox, subtree_context) -> function(Point) -> Boolean
+            The test of the points of a crossing node.
+        @param matching_points array to append the matching Point's to
+        @return matching_points
+        """
+        stats = self._stats
+        if stats is not None:
+            stats.current.nodes_visited += 1
+            stats.current.intersects_tests += 1
 
-        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=2, half_size_y=2), node_capacity=1)
+        classification, subtree_context = classify(self.boundary, context)
+        if classification == BoxClassification.outside:
+            return matching_points
 
-        A tree with a node_capacity of will subdivide after 2 insertions.
-        >>> p1 = Point(1, 1)
-        >>> p2 = Point(2, 2)
-        >>> tree.insert(p1)
-        True
-        >>> tree._points == [p1]
-        True
-        >>> tree._has_subdivided()
-        False
-        >>> tree.insert(p2)
-        True
-        >>> tree._points == [p1]
-        True
-        >>> tree._has_subdivided()
-        True
+        if classification == BoxClassification.inside:
+            # Every point in this tree matches, so none need testing.
+            if stats is not None:
+                stats.current.nodes_visited -= 1
+            return self._get_all_points(matching_points)
 
-        ...and the subtrees will have a total of 1 point, which is the ssecond point added.
-        >>> subtree_points = []
-        >>> for subtree in tree._subtree_iterator(): subtree_points.extend(subtree._points)
-        >>> subtree_points == [p2]
-        True
+        if stats is not None:
+            stats.current.contains_tests += len(self._points)
+            stats.current.points_tested += len(self._points)
 
-        ...and none of the subtrees will have divided.
-        >>> any((subtree._has_subdivided() for subtree in tree._subtree_iterator()))
-        False
+        if self._points:
+            contains_point = get_contains_point(self.boundary, subtree_context)
+            for point in self._points:
+                if contains_point(point):
+                    matching_points.append(point)
+
+        if self._has_subdivided():
+            for subtree in self._subtree_iterator():
+                subtree._query_points_matching(classify, get_contains_point, subtree_context, matching_points)
+
+        return matching_points
+
+    def _insert(self, point):
+        """
+        @param point Point
+        @return True if the point was inserted, false otherwise (if the point is not in the tree's region)
         """
+        if self._stats is not None:
+            self._stats.current.nodes_visited += 1
+            self._stats.current.contains_tests += 1
+
         if not self.boundary.contains_point(point):
             return False
 
         if len(self._points) < self._node_capacity:
             self._points.append(point)
+            if self._change_tracker is not None:
+                self._change_tracker.mark_changed(self)
+            if self._aggregate_weight is not None:
+                self._add_to_aggregate(point, 1)
             return True
         else:
             if not self._has_subdivided():
                 self._subdivide()
 
             for subtree in self._subtree_iterator():
-                if subtree.insert(point):
+                if subtree._insert(point):
+                    if self._aggregate_weight is not None:
+                        self._add_to_aggregate(point, 1)
                     return True
 
             # Could not insert into any subtree.  This should never happen.
             assert False
 
-    def clear(self):
-        """
-        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=2, half_size_y=2), node_capacity=1)
-        >>> p1 = Point(1, 1)
-        >>> p2 = Point(2, 2)
-        >>> tree.insert(p1)
-        True
-        >>> tree.insert(p2)
-        True
-        >>> tree.clear()
-        >>> tree.get_all_points()
-        []
-        """
-        self._points = []
-        self._clear_subtrees()
-
-    def remove(self, point):
+    def _remove(self, point):
         """
         @param point Point
         @return True if the point was removed, false otherwise (if the point is not in the tree)
-
-        First add two points and remove the first...
-        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=2, half_size_y=2), node_capacity=1)
-        >>> p1 = Point(1, 1)
-        >>> p2 = Point(2, 2)
-        >>> tree.insert(p1)
-        True
-        >>> tree.insert(p2)
-        True
-        >>> tree.remove(p1)
-        True
-        >>> tree._points == [p2]
-        True
-        >>> tree._has_subdivided()
-        False
-
-        ...then add two points and remove the second.
-        >>> tree.clear()
-        >>> tree.insert(p1)
-        True
-        >>> tree.insert(p2)
-        True
-        >>> tree.remove(p2)
-        True
-        >>> tree._points == [p1]
-        True
-        >>> tree._has_subdivided()
-        False
-
-        Add some points, then remove them:
-        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
-        >>> points = []
-        >>> for i in range(8):
-        ...     point = Point(i, i)
-        ...     points.append(point)
-        ...     tree.insert(point)
-        True
-        True
-        True
-        True
-        True
-        True
-        True
-        True
-        >>> sorted(tree.get_all_points())
-        [(0,0), (1,1), (2,2), (3,3), (4,4), (5,5), (6,6), (7,7)]
-        >>> for point in points:
-        ...     tree.remove(point)
-        ...     sorted(tree.get_all_points())
-        True
-        [(1,1), (2,2), (3,3), (4,4), (5,5), (6,6), (7,7)]
-        True
-        [(2,2), (3,3), (4,4), (5,5), (6,6), (7,7)]
-        True
-        [(3,3), (4,4), (5,5), (6,6), (7,7)]
-        True
-        [(4,4), (5,5), (6,6), (7,7)]
-        True
-        [(5,5), (6,6), (7,7)]
-        True
-        [(6,6), (7,7)]
-        True
-        [(7,7)]
-        True
-        []
         """
-        assert point
+        stats = self._stats
+        if stats is not None:
+            stats.current.nodes_visited += 1
+            stats.current.contains_tests += 1
 
         if not self.boundary.contains_point(point):
             return False
 
+        if stats is not None:
+            stats.current.points_tested += len(self._points)
+
         if point in self._points:
             self._remove_from_self(point)
+            if self._aggregate_weight is not None:
+                self._add_to_aggregate(point, -1)
             return True
         elif self._has_subdivided():
             point_was_removed = self._remove_from_subtree(point)
             if point_was_removed:
                 self._remove_empty_subtrees()
+                if self._aggregate_weight is not None:
+                    self._add_to_aggregate(point, -1)
             return point_was_removed
         else:
             return False
 
-    class TranslatePointResult:
-        translated = 1
-        out_of_bounds = 2
-        not_in_tree = 3
-        removed = 4
-
-    def translate_point(self, point, x, y):
+    def _insert_points(self, points):
         """
-        This has the same behavior as, but is more efficient than, removing the point and then
-        re-adding it at the new location.
-
-        If the translated position is outside the tree's boundary, the point will be removed.
-
-        @param point Point
-        @param x, y Number The amount to translate the point by.
-        @return TranslatePointResult
+        @param points array of Point's, each in this node's boundary
+        """
+        if self._stats is not None:
+            self._stats.current.nodes_visited += 1
+
+        # Fill this node first, as inserting the points one at a time would.
+        vacancy_count = self._node_capacity - len(self._points)
+        if vacancy_count > 0 and points:
+            self._points.extend(points[:vacancy_count])
+            points = points[vacancy_count:]
+            if self._change_tracker is not None:
+                self._change_tracker.mark_changed(self)
+        if not points:
+            if self._aggregate_weight is not None:
+                self._update_aggregate()
+            return
+
+        if not self._has_subdivided():
+            self._subdivide()
+
+        # Give each point to the first subtree that contains it, as _insert does.
+        subtrees = list(self._subtree_iterator())
+        subtree_points = [[] for subtree in subtrees]
+        for point in points:
+            for subtree, points_in_subtree in zip(subtrees, subtree_points):
+                if self._stats is not None:
+                    self._stats.current.contains_tests += 1
+                if subtree.boundary.contains_point(point):
+                    points_in_subtree.append(point)
+                    break
+            else:
+                # Could not insert into any subtree.  This should never happen.
+                assert False
 
-        Attempt to translate a point not in the tree:
-        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=1, half_size_y=1), node_capacity=1)
-        >>> tree.translate_point(Point(0, 0), x=1, y=1) == PointQuadTree.TranslatePointResult.not_in_tree
-        True
+        for subtree, points_in_subtree in zip(subtrees, subtree_points):
+            if points_in_subtree:
+                subtree._insert_points(points_in_subtree)
 
-        Attempt to translate an out of bounds point:
-        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=1, half_size_y=1), node_capacity=1)
-        >>> tree.translate_point(Point(2, 2), x=1, y=1) == PointQuadTree.TranslatePointResult.out_of_bounds
-        True
+        if self._aggregate_weight is not None:
+            self._update_aggregate()
 
-        Translate a point to a new position in the same node:
-        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=2, half_size_y=2), node_capacity=1)
-        >>> p1 = Point(1, 1)
-        >>> tree.insert(p1)
-        True
-        >>> tree.translate_point(p1, 1, 1) == PointQuadTree.TranslatePointResult.translated
-        True
-        >>> tree.get_all_points()
-        [(2,2)]
-        >>> tree._has_subdivided()
-        False
+    def _remove_points(self, points):
+        """
+        @param points array of Point's, each in this node's boundary
+        @return an array of the points that were not removed
+        """
+        stats = self._stats
+        if stats is not None:
+            stats.current.nodes_visited += 1
+            stats.current.points_tested += len(self._points)
+
+        points_not_removed = []
+        for point in points:
+            if point in self._points:
+                self._points.remove(point)
+            else:
+                points_not_removed.append(point)
+        if len(points_not_removed) < len(points):
+            if self._change_tracker is not None:
+                self._change_tracker.mark_changed(self)
+
+        if not self._has_subdivided():
+            if self._aggregate_weight is not None:
+                self._update_aggregate()
+            return points_not_removed
+
+        # Look for each point in every subtree that contains it, in order, as _remove does.
+        # Only points on the subtrees' shared edges, or not in the tree, are looked for in more than one subtree.
+        subtrees = list(self._subtree_iterator())
+        points_to_find = [(point, 0) for point in points_not_removed]
+        points_not_removed = []
+        while points_to_find:
+            subtree_points = [[] for subtree in subtrees]
+            for point, first_subtree_index in points_to_find:
+                for subtree_index in range(first_subtree_index, len(subtrees)):
+                    if stats is not None:
+                        stats.current.contains_tests += 1
+                    if subtrees[subtree_index].boundary.contains_point(point):
+                        subtree_points[subtree_index].append(point)
+                        break
+                else:
+                    points_not_removed.append(point)
+
+            points_to_find = []
+            for subtree_index, points_in_subtree in enumerate(subtree_points):
+                if points_in_subtree:
+                    points_to_find.extend((point, subtree_index + 1) for point in subtrees[subtree_index]._remove_points(points_in_subtree))
+
+        # Keep this node full by bubbling up points from the leaves.
+        while len(self._points) < self._node_capacity and self._has_subtree_points():
+            if not self._bubble_up_point():
+                break
+        self._remove_empty_subtrees()
+        if self._aggregate_weight is not None:
+            self._update_aggregate()
+        return points_not_removed
+
+    def _remove_points_matching(self, classify, get_contains_point, context, removed_points):
+        """
+        @param classify, get_contains_point As for _query_points_matching
+        @param removed_points array to append the removed Point's to
+        @return removed_points
+        """
+        stats = self._stats
+        if stats is not None:
+            stats.current.nodes_visited += 1
+            stats.current.intersects_tests += 1
+
+        classification, subtree_context = classify(self.boundary, context)
+        if classification == BoxClassification.outside:
+            return removed_points
+
+        if classification == BoxClassification.inside:
+            # Every point in this tree is removed, so detach its subtrees whole.
+            if stats is not None:
+                stats.current.nodes_visited -= 1
+                if self._has_subdivided():
+                    stats.current.collapses += 1
+            self._get_all_points(removed_points)
+            self._clear()
+            return removed_points
+
+        if stats is not None:
+            stats.current.contains_tests += len(self._points)
+            stats.current.points_tested += len(self._points)
 
-        Translate a point such that its new position is out of the tree:
-        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=1, half_size_y=1), node_capacity=1)
-        >>> p1 = Point(1, 1)
-        >>> tree.insert(p1)
-        True
-        >>> tree.translate_point(p1, 1, 1) == PointQuadTree.TranslatePointResult.removed
-        True
-        >>> tree.get_all_points()
-        []
+        if self._points:
+            contains_point = get_contains_point(self.boundary, subtree_context)
+            points_kept = []
+            for point in self._points:
+                if contains_point(point):
+                    removed_points.append(point)
+                else:
+                    points_kept.append(point)
+            if len(points_kept) < len(self._points):
+                if self._change_tracker is not None:
+                    self._change_tracker.mark_changed(self)
+            self._points = points_kept
 
-        Translate a deep point:
-        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=3, half_size_y=3), node_capacity=1)
-        >>> p1 = Point(1, 1)
-        >>> p2 = Point(2, 2)
-        >>> p3 = Point(3, 3)
-        >>> tree.insert(p1)
-        True
-        >>> tree.insert(p2)
-        True
-        >>> tree.insert(p3)
-        True
-        >>> tree.translate_point(p3, -6, -6) == PointQuadTree.TranslatePointResult.translated
-        True
-        >>> tree.get_all_points()
-        [(1,1), (2,2), (-3,-3)]
+        if not self._has_subdivided():
+            if self._aggregate_weight is not None:
+                self._update_aggregate()
+            return removed_points
 
-        Translate a deep point such that its new position is out of the tree:
-        >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=3, half_size_y=3), node_capacity=1)
-        >>> p1 = Point(1, 1)
-        >>> p2 = Point(2, 2)
-        >>> p3 = Point(3, 3)
-        >>> tree.insert(p1)
-        True
-        >>> tree.insert(p2)
-        True
-        >>> tree.insert(p3)
-        True
-        >>> tree.translate_point(p3, 1, 1) == PointQuadTree.TranslatePointResult.removed
-        True
-        >>> tree.get_all_points()
-        [(1,1), (2,2)]
+        for subtree in self._subtree_iterator():
+            subtree._remove_points_matching(classify, get_contains_point, subtree_context, removed_points)
+
+        # Keep this node full by bubbling up points from the leaves, once its subtrees have refilled themselves.
+        while len(self._points) < self._node_capacity and self._has_subtree_points():
+            if not self._bubble_up_point():
+                break
+        self._remove_empty_subtrees()
+        if self._aggregate_weight is not None:
+            self._update_aggregate()
+        return removed_points
+
+    def _translate_point(self, point, x, y):
         """
-        assert point
+        @return TranslatePointResult
+        """
+        stats = self._stats
+        if stats is not None:
+            stats.current.nodes_visited += 1
+            stats.current.contains_tests += 1
 
         if not self.boundary.contains_point(point):
             return PointQuadTree.TranslatePointResult.out_of_bounds
-        elif point in self._points:
+
+        if stats is not None:
+            stats.current.points_tested += len(self._points)
+
+        if point in self._points:
             return self._translate_point_in_self(point, x, y)
         elif self._has_subdivided():
             return self._translate_point_in_subtree(point, x, y)
@@ -406,6 +2522,8 @@ class PointQuadTree:
         @param point Point
         """
         self._points.remove(point)
+        if self._change_tracker is not None:
+            self._change_tracker.mark_changed(self)
         self._bubble_up_point()
 
     def _remove_from_subtree(self, point):
@@ -414,17 +2532,27 @@ class PointQuadTree:
         @return True if the point was removed, false otherwise (if the point is not in the tree)
         """
         for subtree in self._subtree_iterator():
-            if subtree.remove(point):
+            if subtree._remove(point):
                 return True
         return False
 
     def _bubble_up_point(self):
         """
         Removes a point from a leaf node and adds it to the current node.
+        @return True if a point was bubbled up, false otherwise (if there are no points below this node)
         """
         removed_point = self._remove_from_leaf()
         if removed_point:
             self._points.append(removed_point)
+            if self._change_tracker is not None:
+                self._change_tracker.mark_changed(self)
+            if self._aggregate_weight is not None:
+                # _remove_from_leaf took the point out of the aggregates of the nodes it passed through, including this one.
+                self._add_to_aggregate(removed_point, 1)
+            if self._stats is not None:
+                self._stats.current.bubble_ups += 1
+            return True
+        return False
 
     def _remove_from_leaf(self):
         """
@@ -443,15 +2571,23 @@ class PointQuadTree:
         If all subtrees are then empty, remove them.
         @return the removed point
         """
+        if self._stats is not None:
+            self._stats.current.nodes_visited += 1
+
         if self._has_subdivided():
             for subtree in self._subtree_iterator():
                 removed_point = subtree._remove_from_subtree_leaf()
                 if removed_point:
                     self._remove_empty_subtrees()
+                    if self._aggregate_weight is not None:
+                        self._add_to_aggregate(removed_point, -1)
                     return removed_point
             return None
         else:
-            return self._pop_point()
+            removed_point = self._pop_point()
+            if removed_point and self._aggregate_weight is not None:
+                self._add_to_aggregate(removed_point, -1)
+            return removed_point
 
     def _pop_point(self):
         """
@@ -459,60 +2595,106 @@ class PointQuadTree:
         @return the removed point, or None if there are no points.
         """
         if self._points:
+            if self._change_tracker is not None:
+                self._change_tracker.mark_changed(self)
             return self._points.pop(0)
         else:
             return None
 
     def _translate_point_in_self(self, point, x, y):
+        if self._stats is not None:
+            self._stats.current.contains_tests += 1
+
         if self.boundary.contains(point.x + x, point.y + y):
             point.translate(x, y)
+            if self._change_tracker is not None:
+                self._change_tracker.mark_changed(self)
+            if self._aggregate_weight is not None:
+                self._translate_aggregate(point, x, y)
             return PointQuadTree.TranslatePointResult.translated
         else:
-            self.remove(point)
+            self._remove(point)
             self._remove_empty_subtrees()
             point.translate(x, y)
             return PointQuadTree.TranslatePointResult.removed
 
     def _translate_point_in_subtree(self, point, x, y):
         for subtree in self._subtree_iterator():
-            translate_result = subtree.translate_point(point, x, y)
+            translate_result = subtree._translate_point(point, x, y)
             if translate_result == PointQuadTree.TranslatePointResult.out_of_bounds:
                 # Continue on to the next subtree.
                 continue
-            elif (translate_result == PointQuadTree.TranslatePointResult.translated or
-                translate_result == PointQuadTree.TranslatePointResult.not_in_tree):
+            elif translate_result == PointQuadTree.TranslatePointResult.translated:
+                if self._aggregate_weight is not None:
+                    self._translate_aggregate(point, x, y)
+                return translate_result
+            elif translate_result == PointQuadTree.TranslatePointResult.not_in_tree:
                 return translate_result
             elif translate_result == PointQuadTree.TranslatePointResult.removed:
                 # The point is already translated.
                 if self.boundary.contains_point(point):
-                    self.insert(point)
-                    return PointQuadTree.TranslatePointResult.translated
+                    self._insert(point)
+                    translate_result = PointQuadTree.TranslatePointResult.translated
                 else:
-                    return PointQuadTree.TranslatePointResult.removed
+                    self._remove_empty_subtrees()
+
+                # The point left a subtree, so re-sum this node rather than tracking where it was.
+                if self._aggregate_weight is not None:
+                    self._update_aggregate()
+                return translate_result
             else:
                 # All the TranslatePointResult values should have been handled.
-                assert false
+                assert False
 
         # The point was not found in any of the subtrees.
         return PointQuadTree.TranslatePointResult.not_in_tree
 
     def _remove_empty_subtrees(self):
         if not self._has_subtree_points():
+            if self._has_subdivided():
+                self._structure_counter.version += 1
+                if self._stats is not None:
+                    self._stats.current.collapses += 1
+                if self._region_watchers:
+                    self._pull_up_region_watchers()
+                if self._change_tracker is not None:
+                    self._change_tracker.mark_changed(self)
             self._clear_subtrees()
 
     def _subdivide(self):
+        self._structure_counter.version += 1
+        if self._stats is not None:
+            self._stats.current.subdivisions += 1
+
         for (subtree_index, factor_x, factor_y) in self._subtree_quadrant_iterator():
             self._set_subtree(subtree_index, self._create_subdivision(factor_x, factor_y))
         assert self._has_subdivided()
 
+        if self._change_tracker is not None:
+            # The subtrees are new, so every one of them has changed.
+            self._change_tracker.mark_changed(self)
+            for subtree in self._subtree_iterator():
+                self._change_tracker.mark_changed(subtree)
+
+        if self._watchers:
+            self._push_down_region_watchers()
+
     def _create_subdivision(self, factor_x, factor_y):
         """
         @param factor_x Number {-1, 1}
         @param factor_y Number {-1, 1}
         """
-        return PointQuadTree(
+        subtree = PointQuadTree(
             boundary=self._calculate_subdivision_boundary(factor_x, factor_y),
             node_capacity=self._node_capacity)
+        subtree._stats = self._stats
+        subtree._structure_counter = self._structure_counter
+        subtree._region_watchers = self._region_watchers
+        subtree._change_tracker = self._change_tracker
+        if self._aggregate_weight is not None:
+            subtree._aggregate_weight = self._aggregate_weight
+            subtree._aggregate = (0, 0, 0, 0)
+        return subtree
 
     def _calculate_subdivision_boundary(self, factor_x, factor_y):
         """
@@ -570,12 +2752,43 @@ class PointQuadTree:
         yield 2, -1, -1
         yield 3, +1, -1
 
+class _ChangeTracker:
+    """
+    The nodes of a tree that changed since its last checkpoint, which every node of the tree shares.
+    """
+    __slots__ = ('nodes', 'checkpoint_number')
+
+    def __init__(self):
+        # {id(node): node} of the nodes whose points, or whose subtrees, changed.  Nodes that were removed
+        # from the tree since they changed are still here.
+        self.nodes = {}
+        self.checkpoint_number = 0
+
+    def mark_changed(self, node):
+        self.nodes[id(node)] = node
+
+
+class _StructureCounter:
+    """
+    The structure version that every node of a tree shares.
+    """
+    __slots__ = ('version',)
+
+    def __init__(self):
+        self.version = 0
+
+
 def run_tests():
     """
     @return (failure_count, test_count)
     """
     import axis_aligned_bounding_box
-    module_dependencies = [axis_aligned_bounding_box]
+    import point_quad_tree_hooks
+    import point_quad_tree_stats
+    import polygon
+    import corridor
+    import point_quad_tree_watchers
+    module_dependencies = [axis_aligned_bounding_box, point_quad_tree_hooks, point_quad_tree_stats, polygon, corridor, point_quad_tree_watchers]
 
     import sys
     import test
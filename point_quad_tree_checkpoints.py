@@ -0,0 +1,246 @@
+"""
+Incremental checkpoints of a PointQuadTree, and the recovery of a tree from them.
+
+write_base_image writes every node of a tree, and starts tracking its changes (see
+PointQuadTree.enable_change_tracking).  Each write_checkpoint then writes only the nodes that changed since
+the previous image or checkpoint, as delta records, so its cost grows with the number of changed nodes
+rather than with the size of the tree.  recover rebuilds the tree from a base image and its checkpoints.
+
+Each image and checkpoint is one pickled frame, so they can be appended to one file, or written to
+separate files.  A node record is (path, points, is_subdivided), where path is the indices of the subtrees
+from the root to the node, in the order upper-left, upper-right, lower-left, lower-right.  Points are
+pickled, so subclasses of Point keep their other attributes.
+"""
+
+from point_quad_tree import PointQuadTree
+from axis_aligned_bounding_box import AxisAlignedBoundingBox
+import pickle
+
+
+def write_base_image(tree, file):
+    """
+    Writes every node of the tree, and starts tracking its changes for write_checkpoint.
+
+    @param tree PointQuadTree
+    @param file A binary file to write the image to
+    @return the number of node records that were written
+    """
+    tree.enable_change_tracking()
+    change_tracker = tree._change_tracker
+    change_tracker.nodes.clear()
+    change_tracker.checkpoint_number = 0
+
+    records = []
+    _get_node_records(tree, (), records)
+    boundary = tree.boundary
+    _write_frame(file, (
+        'base', change_tracker.checkpoint_number, tree.node_capacity,
+        (boundary.center_x, boundary.center_y, boundary.half_size_x, boundary.half_size_y),
+        records))
+    return len(records)
+
+
+def write_checkpoint(tree, file):
+    """
+    Writes the nodes that changed since the tree's previous base image or checkpoint.
+
+    @param tree PointQuadTree A tree whose base image was written with write_base_image
+    @param file A binary file to write the checkpoint to
+    @return the number of node records that were written
+    """
+    change_tracker = tree._change_tracker
+    assert change_tracker is not None, 'Write a base image first.'
+
+    records = []
+    for node in change_tracker.nodes.values():
+        path = _get_node_path(tree, node)
+        # Nodes that were removed from the tree since they changed are dropped by their parents' records.
+        if path is not None:
+            records.append((path, list(node._points), node._has_subdivided()))
+    # Parents first, so that recovery creates the subtrees of newly subdivided nodes before it fills them.
+    records.sort(key=lambda record: len(record[0]))
+
+    change_tracker.nodes.clear()
+    change_tracker.checkpoint_number += 1
+    _write_frame(file, ('delta', change_tracker.checkpoint_number, tree.node_capacity, records))
+    return len(records)
+
+
+def recover(*files):
+    """
+    Rebuilds a tree from a base image and the checkpoints written after it, in order.
+
+    @param files Binary files of frames, read one after another.  The first frame must be a base image.
+        A later base image replaces the tree.
+    @return PointQuadTree
+
+    >>> import io, random
+    >>> from point import Point
+    >>> def get_nodes(tree):
+    ...     return [(str(node.boundary), [(point.x, point.y) for point in node._points]) for node in tree._node_iterator()]
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+    >>> p = Point(1, 1)
+    >>> tree.insert_points([Point(6, 6), p, Point(7, 1)])
+    [True, True, True]
+    >>> log = io.BytesIO()
+    >>> write_base_image(tree, log)
+    5
+    >>> tree.translate_point(p, 1, 1) == PointQuadTree.TranslatePointResult.translated
+    True
+    >>> write_checkpoint(tree, log)
+    1
+    >>> tree.remove(p), tree.insert(Point(3, 7))
+    (True, True)
+    >>> write_checkpoint(tree, log), write_checkpoint(tree, log)
+    (2, 0)
+    >>> log.seek(0)
+    0
+    >>> get_nodes(recover(log)) == get_nodes(tree)
+    True
+
+    Checkpoints follow random mutations of every kind:
+    >>> rng = random.Random(0)
+    >>> def random_point():
+    ...     return Point(rng.uniform(0, 64), rng.uniform(0, 64))
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(64, 64), node_capacity=4)
+    >>> points = [random_point() for i in range(2000)]
+    >>> _ = tree.insert_points(points)
+    >>> base_image, checkpoints = io.BytesIO(), io.BytesIO()
+    >>> base_record_count = write_base_image(tree, base_image)
+    >>> record_counts = []
+    >>> for i in range(20):
+    ...     for point in rng.sample(points, 20):
+    ...         if tree.translate_point(point, rng.uniform(-2, 2), rng.uniform(-2, 2)) == PointQuadTree.TranslatePointResult.removed:
+    ...             points.remove(point)
+    ...     for point, translate_result in zip(points[:10], tree.translate_points([(point, rng.uniform(-1, 1), rng.uniform(-1, 1)) for point in points[:10]])):
+    ...         if translate_result == PointQuadTree.TranslatePointResult.removed:
+    ...             points.remove(point)
+    ...     for point in rng.sample(points, 5):
+    ...         points.remove(point)
+    ...         _ = tree.remove(point)
+    ...     new_points = [random_point() for j in range(10)]
+    ...     points.extend(new_points)
+    ...     _ = tree.insert_points(new_points[:5]), [tree.insert(point) for point in new_points[5:]]
+    ...     if i % 5 == 4:
+    ...         region = AxisAlignedBoundingBox(rng.uniform(0, 64), rng.uniform(0, 64), 8, 8)
+    ...         for point in tree.remove_points_in_region(region):
+    ...             points.remove(point)
+    ...     record_counts.append(write_checkpoint(tree, checkpoints))
+    >>> _ = base_image.seek(0), checkpoints.seek(0)
+    >>> recovered_tree = recover(base_image, checkpoints)
+    >>> get_nodes(recovered_tree) == get_nodes(tree), len(recovered_tree.get_all_points()) == len(points)
+    (True, True)
+    >>> max(record_counts) < base_record_count / 3
+    True
+
+    Recovering a tree without all of its checkpoints fails:
+    >>> _ = base_image.seek(0), checkpoints.seek(0)
+    >>> _ = pickle.load(checkpoints)
+    >>> recover(base_image, checkpoints)
+    Traceback (most recent call last):
+    AssertionError: Checkpoint 2 follows checkpoint 0.
+    """
+    tree = None
+    checkpoint_number = None
+    for file in files:
+        while True:
+            try:
+                frame = pickle.load(file)
+            except EOFError:
+                break
+
+            kind, frame_checkpoint_number, node_capacity = frame[:3]
+            if kind == 'base':
+                boundary, records = frame[3:]
+                tree = PointQuadTree(boundary=AxisAlignedBoundingBox(*boundary), node_capacity=node_capacity)
+            else:
+                assert tree is not None, 'The first frame must be a base image.'
+                assert frame_checkpoint_number == checkpoint_number + 1, 'Checkpoint {} follows checkpoint {}.'.format(frame_checkpoint_number, checkpoint_number)
+                records, = frame[3:]
+                if node_capacity != tree.node_capacity:
+                    # The tree was rebuilt, which changed every node.
+                    for node in tree._node_iterator():
+                        node._node_capacity = node_capacity
+            checkpoint_number = frame_checkpoint_number
+
+            for record in records:
+                _apply_node_record(tree, record)
+
+    assert tree is not None, 'The first frame must be a base image.'
+    return tree
+
+
+def _write_frame(file, frame):
+    pickle.dump(frame, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _get_node_records(node, path, records):
+    """
+    Appends the records of the node and every node below it, parents first.
+    """
+    records.append((path, list(node._points), node._has_subdivided()))
+    if node._has_subdivided():
+        for subtree_index, subtree in enumerate(node._subtree_iterator()):
+            _get_node_records(subtree, path + (subtree_index,), records)
+
+
+def _get_node_path(tree, node):
+    """
+    @return the indices of the subtrees from the tree's root to the node, or None if the node is no longer in the tree
+
+    A node's center is inside the boundary of exactly one subtree of each of its ancestors, and never on their
+    edges, so it leads to the node:
+    >>> from point import Point
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+    >>> tree.insert_points([Point(1, 1), Point(2, 2), Point(3, 3)])
+    [True, True, True]
+    >>> nodes = list(tree._node_iterator())
+    >>> [_get_node_path(tree, node) for node in nodes]
+    [(), (0,), (1,), (2,), (2, 0), (2, 1), (2, 2), (2, 3), (3,)]
+    >>> tree.clear()
+    >>> _get_node_path(tree, nodes[5]), _get_node_path(tree, tree)
+    (None, ())
+    """
+    x = node.boundary.center_x
+    y = node.boundary.center_y
+    path = []
+    current = tree
+    while current is not node:
+        if not current._has_subdivided() or current.boundary.half_size_x <= node.boundary.half_size_x:
+            return None
+        subtree_index = (0 if x < current.boundary.center_x else 1) + (0 if y > current.boundary.center_y else 2)
+        path.append(subtree_index)
+        current = _get_subtree(current, subtree_index)
+    return tuple(path)
+
+
+def _apply_node_record(tree, record):
+    path, points, is_subdivided = record
+    node = tree
+    for subtree_index in path:
+        node = _get_subtree(node, subtree_index)
+
+    node._points = points
+    if not is_subdivided:
+        node._clear_subtrees()
+    elif not node._has_subdivided():
+        node._subdivide()
+
+
+def _get_subtree(node, subtree_index):
+    return (node._subtree_ul, node._subtree_ur, node._subtree_ll, node._subtree_lr)[subtree_index]
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree
+    module_dependencies = [point_quad_tree]
+
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    run_tests()
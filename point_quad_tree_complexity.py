@@ -0,0 +1,230 @@
+"""
+Machine-independent complexity tests of PointQuadTree.
+
+These drive seeded workloads through trees of doubling sizes and bound the work that each
+operation does, as counted by the tree's stats, rather than its wall-clock time.  They catch
+algorithmic regressions, such as a query that visits every node, that noisy timings hide.
+
+Small queries are sized to hold about SMALL_QUERY_EXPECTED_POINTS points at every size, so the
+work they do should grow only with the depth of the tree: logarithmically in the number of points.
+
+>>> counts_by_size = {num_points: measure_operation_counts(num_points) for num_points in SIZES}
+
+Small queries visit O(log N) nodes and test O(log N) points, and the growth between the smallest
+and largest sizes is far less than the 16x growth of the number of points:
+>>> is_logarithmic(counts_by_size, 'query_small', 'nodes_visited', coefficient=4)
+True
+>>> is_logarithmic(counts_by_size, 'query_small', 'points_tested', coefficient=NODE_CAPACITY)
+True
+>>> get_growth(counts_by_size, 'query_small', 'nodes_visited') < 2
+True
+
+Queries of a single position and nearest-point queries descend to the leaves near one position:
+>>> is_logarithmic(counts_by_size, 'query_empty', 'nodes_visited', coefficient=2)
+True
+>>> is_logarithmic(counts_by_size, 'query_nearest_point', 'nodes_visited', coefficient=2)
+True
+
+Inserting descends one path, and tries at most the 4 subtrees of each node along it:
+>>> all(counts['insert']['nodes_visited'] <= 4 * counts['depth'] + 1 for counts in counts_by_size.values())
+True
+
+Removing and translating a point also descend one path, plus the path that a point bubbles up from:
+>>> is_logarithmic(counts_by_size, 'remove', 'nodes_visited', coefficient=2)
+True
+>>> is_logarithmic(counts_by_size, 'translate_point', 'nodes_visited', coefficient=2)
+True
+
+get_all_points visits every node once, and never tests a point:
+>>> all(counts['get_all_points']['nodes_visited'] == counts['node_count'] for counts in counts_by_size.values())
+True
+>>> all(counts['get_all_points']['points_tested'] == 0 for counts in counts_by_size.values())
+True
+
+Clustered points make a deeper tree, and small queries within a cluster return many more points.
+Their work is output-sensitive, growing with the depth plus the number of nodes that hold the results:
+>>> clustered_counts_by_size = {num_points: measure_operation_counts(num_points, distribution='clustered') for num_points in SIZES}
+>>> is_output_sensitive(clustered_counts_by_size, 'query_small', 'nodes_visited', coefficient=4)
+True
+>>> is_logarithmic(clustered_counts_by_size, 'insert', 'nodes_visited', coefficient=2)
+True
+"""
+
+from point import Point
+from axis_aligned_bounding_box import AxisAlignedBoundingBox
+from point_quad_tree import PointQuadTree
+import math
+import random
+
+SIZES = (1000, 2000, 4000, 8000, 16000)
+NODE_CAPACITY = 8
+NUM_OPERATIONS = 200
+SMALL_QUERY_EXPECTED_POINTS = 10
+TRANSLATE_DISTANCE = 0.001
+
+NUM_CLUSTERS = 10
+CLUSTER_STANDARD_DEVIATION = 0.02
+
+OPERATIONS = (
+    'query_small',
+    'query_empty',
+    'query_nearest_point',
+    'insert',
+    'remove',
+    'translate_point',
+    'get_all_points',
+)
+
+
+def _generate_uniform_position(rng, centers):
+    return rng.random(), rng.random()
+
+
+def _generate_clustered_position(rng, centers):
+    center_x, center_y = rng.choice(centers)
+    return (
+        min(max(rng.gauss(center_x, CLUSTER_STANDARD_DEVIATION), 0.0), 1.0),
+        min(max(rng.gauss(center_y, CLUSTER_STANDARD_DEVIATION), 0.0), 1.0))
+
+
+DISTRIBUTIONS = {
+    'uniform': _generate_uniform_position,
+    'clustered': _generate_clustered_position,
+}
+
+
+def measure_operation_counts(num_points, node_capacity=NODE_CAPACITY, distribution='uniform', seed=0):
+    """
+    Builds a tree of num_points points, and then counts the work of NUM_OPERATIONS calls of each operation.
+
+    Small queries and nearest-point queries are centered on positions drawn from the distribution, so that they land where the points are.
+
+    @return {operation: {counter: mean per call}}, plus the 'node_capacity', 'depth', and 'node_count' of the tree
+
+    >>> counts = measure_operation_counts(100, node_capacity=4)
+    >>> sorted(counts['query_small'])
+    ['bubble_ups', 'calls', 'collapses', 'contains_tests', 'intersects_tests', 'nodes_visited', 'points_returned', 'points_tested', 'subdivisions']
+    >>> counts['insert']['calls'], counts['get_all_points']['points_returned']
+    (1.0, 100.0)
+    """
+    rng = random.Random(seed)
+    generate_position = DISTRIBUTIONS[distribution]
+    centers = [(rng.random(), rng.random()) for i in range(NUM_CLUSTERS)]
+
+    tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=node_capacity)
+    points = [Point(*generate_position(rng, centers)) for i in range(num_points)]
+    for point in points:
+        tree.insert(point)
+
+    # Translate and then remove distinct points.
+    num_operations = min(NUM_OPERATIONS, num_points // 2)
+    small_query_half_size = 0.5 * math.sqrt(SMALL_QUERY_EXPECTED_POINTS / num_points)
+    query_positions = [generate_position(rng, centers) for i in range(num_operations)]
+    new_points = [Point(*generate_position(rng, centers)) for i in range(num_operations)]
+    rng.shuffle(points)
+
+    translations = [
+        # Keep the points in the tree, so that every operation is a translation.
+        (point, TRANSLATE_DISTANCE if point.x + TRANSLATE_DISTANCE <= 1 else -TRANSLATE_DISTANCE, 0)
+        for point in points[:num_operations]]
+
+    counts = {
+        'node_capacity': node_capacity,
+        'depth': max(depth for (node, depth) in tree._node_depth_iterator()),
+        'node_count': sum(1 for node in tree._node_iterator()),
+        'query_small': _count_calls(tree, 'query_points_in_region', [(AxisAlignedBoundingBox(x, y, small_query_half_size, small_query_half_size),) for (x, y) in query_positions]),
+        'query_empty': _count_calls(tree, 'query_points_in_region', [(AxisAlignedBoundingBox(x, y, 0, 0),) for (x, y) in query_positions]),
+        'query_nearest_point': _count_calls(tree, 'query_nearest_point', query_positions),
+        'get_all_points': _count_calls(tree, 'get_all_points', [()]),
+        'translate_point': _count_calls(tree, 'translate_point', translations),
+        'insert': _count_calls(tree, 'insert', [(point,) for point in new_points]),
+        'remove': _count_calls(tree, 'remove', [(point,) for point in points[num_operations:2 * num_operations]]),
+    }
+    return counts
+
+
+def _count_calls(tree, operation, calls):
+    """
+    @param operation String The name of the tree's method to call
+    @param calls array of the arguments of each call
+    @return {counter: mean per call}
+    """
+    function = getattr(tree, operation)
+    with tree.collect_stats() as stats:
+        for arguments in calls:
+            function(*arguments)
+    operation_stats = stats.get_operation_stats(operation)
+    return {counter: value / operation_stats.calls for counter, value in operation_stats.as_dict().items()}
+
+
+def is_logarithmic(counts_by_size, operation, counter, coefficient):
+    """
+    @param counts_by_size {num_points: measure_operation_counts(num_points)}
+    @return True if the mean of the operation's counter is at most coefficient * log2(num_points) at every size
+
+    >>> is_logarithmic({1024: {'insert': {'nodes_visited': 20}}}, 'insert', 'nodes_visited', coefficient=2)
+    True
+    >>> is_logarithmic({1024: {'insert': {'nodes_visited': 21}}}, 'insert', 'nodes_visited', coefficient=2)
+    False
+    """
+    return all(
+        counts[operation][counter] <= coefficient * math.log2(num_points)
+        for num_points, counts in counts_by_size.items())
+
+
+def is_output_sensitive(counts_by_size, operation, counter, coefficient):
+    """
+    @param counts_by_size {num_points: measure_operation_counts(num_points)}
+    @return True if the mean of the operation's counter is at most coefficient * (log2(num_points) + points_returned / node_capacity) at every size
+
+    >>> counts = {'node_capacity': 4, 'insert': {'nodes_visited': 40, 'points_returned': 40}}
+    >>> is_output_sensitive({1024: counts}, 'insert', 'nodes_visited', coefficient=2)
+    True
+    >>> is_output_sensitive({1024: counts}, 'insert', 'nodes_visited', coefficient=1)
+    False
+    """
+    return all(
+        counts[operation][counter] <= coefficient * (math.log2(num_points) + counts[operation]['points_returned'] / counts['node_capacity'])
+        for num_points, counts in counts_by_size.items())
+
+
+def get_growth(counts_by_size, operation, counter):
+    """
+    @return the ratio of the operation's counter at the largest size to that at the smallest size
+
+    >>> get_growth({10: {'insert': {'nodes_visited': 2}}, 20: {'insert': {'nodes_visited': 3}}}, 'insert', 'nodes_visited')
+    1.5
+    """
+    return counts_by_size[max(counts_by_size)][operation][counter] / counts_by_size[min(counts_by_size)][operation][counter]
+
+
+def print_counts(counts_by_size):
+    """
+    Prints the mean nodes visited and points tested per call of each operation, by size.
+    """
+    print('{:<20} {:>10} {:>6} {:>14} {:>14}'.format('operation', 'num_points', 'depth', 'nodes visited', 'points tested'))
+    for operation in OPERATIONS:
+        for num_points, counts in sorted(counts_by_size.items()):
+            print('{:<20} {:>10} {:>6} {:>14.1f} {:>14.1f}'.format(
+                operation,
+                num_points,
+                counts['depth'],
+                counts[operation]['nodes_visited'],
+                counts[operation]['points_tested']))
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree
+    module_dependencies = [point_quad_tree]
+
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        print_counts({num_points: measure_operation_counts(num_points) for num_points in SIZES})
@@ -0,0 +1,270 @@
+"""
+Hooks that observe the operations called on a PointQuadTree, and a latency-histogram recorder.
+
+Add a hook with PointQuadTree.add_operation_hook.  The tree calls on_operation_start before, and
+on_operation_end after, each of its public queries and mutations, such as query_points_in_region,
+insert_points, and translate_point, named by their methods.  See add_operation_hook for an example.
+
+Overhead, measured with `python benchmark.py --distributions uniform --sizes 10000 --instrumentation ...`
+on CPython 3.11:
+ - No hooks: one truth test of an empty tuple per operation, which is within the noise of the benchmark.
+ - LatencyHistogramRecorder: about 3us per operation, which is about 25% of an insert and about
+   10% of a small query.  Add it to diagnose latency outliers rather than leaving it enabled.
+"""
+
+import sys
+import time
+
+
+class PointQuadTreeHook:
+    """
+    The interface of operation hooks.  Override the events to observe.
+    """
+
+    def on_operation_start(self, operation):
+        """
+        @param operation String The name of the PointQuadTree method
+        """
+        pass
+
+    def on_operation_end(self, operation, result_count):
+        """
+        @param operation String The name of the PointQuadTree method
+        @param result_count Integer The number of points that the operation returned, inserted, removed, or translated
+        """
+        pass
+
+
+class LogLinearHistogram:
+    """
+    An HDR-style histogram of non-negative integers.
+
+    Buckets are exact below 2**significant_bits.  Above that, each power-of-two range is split into
+    2**(significant_bits - 1) equal buckets, so every recorded value is within a relative error of
+    2**-(significant_bits - 1) of its bucket's bounds, while the number of buckets grows only with
+    the logarithm of the largest value.
+
+    >>> histogram = LogLinearHistogram(significant_bits=3)
+    >>> for value in range(1, 101):
+    ...     histogram.record(value)
+    >>> histogram.count, histogram.min, histogram.max, histogram.mean()
+    (100, 1, 100, 50.5)
+    >>> histogram.percentile(50), histogram.percentile(99), histogram.percentile(100)
+    (55, 100, 100)
+    >>> LogLinearHistogram().percentile(50) is None
+    True
+
+    Bucket indexes are contiguous and ordered:
+    >>> [LogLinearHistogram._get_bucket_bounds(index, 3) for index in range(6, 14)]
+    [(6, 6), (7, 7), (8, 9), (10, 11), (12, 13), (14, 15), (16, 19), (20, 23)]
+    >>> all(LogLinearHistogram._get_bucket_index(value, 3) <= LogLinearHistogram._get_bucket_index(value + 1, 3) for value in range(1000))
+    True
+    """
+
+    def __init__(self, significant_bits=5):
+        """
+        @param significant_bits Integer Controls the precision: values are recorded with a relative error of at most 2**-(significant_bits - 1)
+        """
+        assert significant_bits >= 1
+
+        self._significant_bits = significant_bits
+        self._counts = []
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        """
+        @param value Integer >= 0
+        """
+        index = LogLinearHistogram._get_bucket_index(value, self._significant_bits)
+        if index >= len(self._counts):
+            self._counts.extend([0] * (index + 1 - len(self._counts)))
+        self._counts[index] += 1
+
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def mean(self):
+        """
+        @return the exact mean of the recorded values, or None if there are none
+        """
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def percentile(self, percentile):
+        """
+        @param percentile Number in [0, 100]
+        @return the upper bound of the bucket holding the percentile's value, capped at the maximum value, or None if there are no values
+        """
+        if not self.count:
+            return None
+
+        rank = max(1, -(-percentile * self.count // 100))
+        cumulative_count = 0
+        for index, bucket_count in enumerate(self._counts):
+            cumulative_count += bucket_count
+            if cumulative_count >= rank:
+                return min(LogLinearHistogram._get_bucket_bounds(index, self._significant_bits)[1], self.max)
+
+    def buckets(self):
+        """
+        @return an array of (lower_bound, upper_bound, count) for the non-empty buckets
+        """
+        return [
+            LogLinearHistogram._get_bucket_bounds(index, self._significant_bits) + (bucket_count,)
+            for index, bucket_count in enumerate(self._counts)
+            if bucket_count]
+
+    @staticmethod
+    def _get_bucket_index(value, significant_bits):
+        shift = max(0, value.bit_length() - significant_bits)
+        if shift == 0:
+            return value
+        return (shift << (significant_bits - 1)) + (value >> shift)
+
+    @staticmethod
+    def _get_bucket_bounds(index, significant_bits):
+        """
+        @return (lower_bound, upper_bound) of the values in the bucket
+        """
+        half_bucket_count = 1 << (significant_bits - 1)
+        if index < 2 * half_bucket_count:
+            return (index, index)
+        shift = index // half_bucket_count - 1
+        mantissa = index - (shift << (significant_bits - 1))
+        return (mantissa << shift, ((mantissa + 1) << shift) - 1)
+
+
+class LatencyHistogramRecorder(PointQuadTreeHook):
+    """
+    Records, per operation, a histogram of latencies in nanoseconds and a histogram of result counts.
+
+    >>> from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(4, 4), node_capacity=1)
+    >>> recorder = LatencyHistogramRecorder()
+    >>> tree.add_operation_hook(recorder)
+    >>> for i in range(4):
+    ...     tree.insert(Point(i, i))
+    True
+    True
+    True
+    True
+    >>> len(tree.query_points_in_region(tree.boundary))
+    4
+    >>> tree.remove_operation_hook(recorder)
+    >>> len(tree.get_all_points())
+    4
+
+    >>> sorted(recorder.operations())
+    ['insert', 'query_points_in_region']
+    >>> recorder.get_latency_histogram('insert').count
+    4
+    >>> recorder.get_result_count_histogram('query_points_in_region').max
+    4
+    >>> exported = recorder.export()
+    >>> sorted(exported['insert'])
+    ['latency_ns', 'result_count']
+    >>> sorted(exported['insert']['latency_ns'])
+    ['buckets', 'count', 'max', 'mean', 'min', 'p50', 'p99', 'p999']
+    """
+
+    def __init__(self, significant_bits=5):
+        """
+        @param significant_bits Integer The precision of the histograms.  See LogLinearHistogram.
+        """
+        self._significant_bits = significant_bits
+        self._latency_histograms = {}
+        self._result_count_histograms = {}
+        self._start_time = None
+
+    def on_operation_start(self, operation):
+        self._start_time = time.perf_counter_ns()
+
+    def on_operation_end(self, operation, result_count):
+        latency = time.perf_counter_ns() - self._start_time
+
+        latency_histogram = self._latency_histograms.get(operation)
+        if latency_histogram is None:
+            latency_histogram = self._latency_histograms[operation] = LogLinearHistogram(self._significant_bits)
+            self._result_count_histograms[operation] = LogLinearHistogram(self._significant_bits)
+        latency_histogram.record(latency)
+        self._result_count_histograms[operation].record(result_count)
+
+    def operations(self):
+        """
+        @return the names of the recorded operations
+        """
+        return self._latency_histograms.keys()
+
+    def get_latency_histogram(self, operation):
+        """
+        @return LogLinearHistogram of nanoseconds
+        """
+        return self._latency_histograms.get(operation) or LogLinearHistogram(self._significant_bits)
+
+    def get_result_count_histogram(self, operation):
+        """
+        @return LogLinearHistogram
+        """
+        return self._result_count_histograms.get(operation) or LogLinearHistogram(self._significant_bits)
+
+    def reset(self):
+        self._latency_histograms = {}
+        self._result_count_histograms = {}
+
+    def export(self):
+        """
+        @return {operation: {'latency_ns': summary, 'result_count': summary}}, which can be serialized as JSON
+        """
+        return {
+            operation: {
+                'latency_ns': LatencyHistogramRecorder._summarize(self._latency_histograms[operation]),
+                'result_count': LatencyHistogramRecorder._summarize(self._result_count_histograms[operation]),
+            }
+            for operation in self._latency_histograms}
+
+    def dump(self, file=sys.stdout):
+        """
+        Prints the latency percentiles of each operation.
+        """
+        print('{:<24} {:>10} {:>10} {:>10} {:>10} {:>10}'.format('operation', 'count', 'p50 (us)', 'p99 (us)', 'p999 (us)', 'max (us)'), file=file)
+        for operation, histogram in sorted(self._latency_histograms.items()):
+            print('{:<24} {:>10} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+                operation,
+                histogram.count,
+                histogram.percentile(50) / 1000,
+                histogram.percentile(99) / 1000,
+                histogram.percentile(99.9) / 1000,
+                histogram.max / 1000), file=file)
+
+    @staticmethod
+    def _summarize(histogram):
+        return {
+            'count': histogram.count,
+            'min': histogram.min,
+            'max': histogram.max,
+            'mean': histogram.mean(),
+            'p50': histogram.percentile(50),
+            'p99': histogram.percentile(99),
+            'p999': histogram.percentile(99.9),
+            'buckets': histogram.buckets(),
+        }
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__])
+
+if __name__ == '__main__':
+    run_tests()
@@ -0,0 +1,299 @@
+"""
+Reports the shape of a PointQuadTree, and tunes its node-capacity by replaying a sample workload.
+
+Usage: python point_quad_tree_introspection.py [num_points] [num_queries]
+"""
+
+from point import Point
+from axis_aligned_bounding_box import AxisAlignedBoundingBox
+from point_quad_tree import PointQuadTree
+import random
+import sys
+import time
+import tracemalloc
+
+DEFAULT_CANDIDATE_NODE_CAPACITIES = (1, 2, 4, 8, 16, 32, 64, 128)
+DEFAULT_REPETITIONS = 3
+
+# The number of nodes allocated to measure the memory of one node.
+_NUM_MEMORY_SAMPLE_NODES = 1000
+
+# The measured memory of an empty node, in bytes.  See _get_empty_node_memory.
+_empty_node_memory = None
+
+
+class TreeSummary:
+    """
+    The shape of a PointQuadTree.  Levels are numbered from the root, which is level 0.
+
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(4, 4), node_capacity=2)
+    >>> for (x, y) in ((1, 1), (1, 3), (3, 3), (3, 1), (0.5, 0.5)):
+    ...     tree.insert(Point(x, y))
+    True
+    True
+    True
+    True
+    True
+    >>> summary = summarize_tree(tree)
+    >>> summary.depth, summary.node_count, summary.leaf_count, summary.point_count
+    (1, 5, 4, 5)
+    >>> summary.nodes_per_level, summary.points_per_level
+    ([1, 4], [2, 3])
+
+    occupancy_per_level[level][n] is the number of nodes in the level that hold n points:
+    >>> summary.occupancy_per_level
+    [[0, 0, 1], [1, 3, 0]]
+
+    The leaves hold 3 points of the 8 that they could hold:
+    >>> summary.leaf_fill_ratio
+    0.375
+    >>> summary.estimated_memory_bytes > 0
+    True
+    """
+
+    def __init__(self, node_capacity):
+        """
+        @param node_capacity Integer The node-capacity of the summarized tree
+        """
+        self.node_capacity = node_capacity
+        self.nodes_per_level = []
+        self.points_per_level = []
+        self.occupancy_per_level = []
+        self.leaf_count = 0
+        self.leaf_point_count = 0
+        self.estimated_memory_bytes = 0
+
+    @property
+    def depth(self):
+        """
+        @return the level of the deepest node
+        """
+        return len(self.nodes_per_level) - 1
+
+    @property
+    def node_count(self):
+        return sum(self.nodes_per_level)
+
+    @property
+    def point_count(self):
+        return sum(self.points_per_level)
+
+    @property
+    def leaf_fill_ratio(self):
+        """
+        @return the fraction of the leaves' capacity that holds points
+        """
+        return self.leaf_point_count / (self.leaf_count * self.node_capacity)
+
+    def as_dict(self):
+        return {
+            'node_capacity': self.node_capacity,
+            'depth': self.depth,
+            'node_count': self.node_count,
+            'leaf_count': self.leaf_count,
+            'point_count': self.point_count,
+            'nodes_per_level': self.nodes_per_level,
+            'points_per_level': self.points_per_level,
+            'occupancy_per_level': self.occupancy_per_level,
+            'leaf_fill_ratio': self.leaf_fill_ratio,
+            'estimated_memory_bytes': self.estimated_memory_bytes,
+        }
+
+    def __repr__(self):
+        return 'TreeSummary<node_capacity={}, depth={}, nodes={}, leaves={}, points={}, leaf_fill_ratio={:.2f}, estimated_memory_bytes={}>'.format(
+            self.node_capacity, self.depth, self.node_count, self.leaf_count, self.point_count, self.leaf_fill_ratio, self.estimated_memory_bytes)
+
+
+def summarize_tree(tree):
+    """
+    @param tree PointQuadTree
+    @return TreeSummary
+
+    The memory estimate counts the tree's nodes, boundaries, and point arrays, but not the points themselves.
+    """
+    summary = TreeSummary(tree.node_capacity)
+    empty_points_memory = sys.getsizeof([])
+    for node, depth in tree._node_depth_iterator():
+        if depth == len(summary.nodes_per_level):
+            summary.nodes_per_level.append(0)
+            summary.points_per_level.append(0)
+            summary.occupancy_per_level.append([0] * (tree.node_capacity + 1))
+
+        point_count = len(node._points)
+        summary.nodes_per_level[depth] += 1
+        summary.points_per_level[depth] += point_count
+        summary.occupancy_per_level[depth][point_count] += 1
+        if not node._has_subdivided():
+            summary.leaf_count += 1
+            summary.leaf_point_count += point_count
+        summary.estimated_memory_bytes += _get_empty_node_memory() + sys.getsizeof(node._points) - empty_points_memory
+    return summary
+
+
+def _get_empty_node_memory():
+    """
+    @return the bytes allocated for a node without points, including its boundary, measured once with tracemalloc
+    """
+    global _empty_node_memory
+    if _empty_node_memory is None:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        try:
+            memory_before = tracemalloc.get_traced_memory()[0]
+            # Compute each coordinate, as subdivision does, rather than sharing constants.
+            nodes = [PointQuadTree(boundary=AxisAlignedBoundingBox(i + 0.5, i + 0.5, i + 0.25, i + 0.25), node_capacity=1) for i in range(_NUM_MEMORY_SAMPLE_NODES)]
+            memory_after = tracemalloc.get_traced_memory()[0]
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+        _empty_node_memory = (memory_after - memory_before - sys.getsizeof(nodes)) // _NUM_MEMORY_SAMPLE_NODES
+    return _empty_node_memory
+
+
+class NodeCapacityTrial:
+    """
+    The result of replaying a workload on a tree with one node-capacity.
+    """
+
+    def __init__(self, node_capacity, insert_seconds, query_seconds, summary):
+        """
+        @param insert_seconds Number The time to insert every sample point
+        @param query_seconds Number The time to run every sample query
+        @param summary TreeSummary The tree after inserting the sample points
+        """
+        self.node_capacity = node_capacity
+        self.insert_seconds = insert_seconds
+        self.query_seconds = query_seconds
+        self.summary = summary
+
+    @property
+    def seconds(self):
+        return self.insert_seconds + self.query_seconds
+
+    def __repr__(self):
+        return 'NodeCapacityTrial<node_capacity={}, insert_seconds={:.6f}, query_seconds={:.6f}>'.format(
+            self.node_capacity, self.insert_seconds, self.query_seconds)
+
+
+def tune_node_capacity(boundary, sample_points, sample_queries, candidate_node_capacities=DEFAULT_CANDIDATE_NODE_CAPACITIES, repetitions=DEFAULT_REPETITIONS):
+    """
+    Replays a sample workload, inserting the sample points and then running the sample queries,
+    on a new tree for each candidate node-capacity.
+
+    The sample should have the density of the real workload: the best node-capacity for a sparse
+    sample of a dense tree is usually smaller than the best for the tree itself.
+
+    @param boundary AxisAlignedBoundingBox The boundary of the tree to tune
+    @param sample_points iterable(Point)
+    @param sample_queries iterable(AxisAlignedBoundingBox) regions to query, in the proportions of the real workload
+    @param candidate_node_capacities iterable(Integer)
+    @param repetitions Integer The number of times to replay the workload at each node-capacity; the fastest replay is kept
+    @return an array of NodeCapacityTrial, fastest first
+
+    >>> rng = random.Random(0)
+    >>> points = [Point(rng.random(), rng.random()) for i in range(200)]
+    >>> queries = [AxisAlignedBoundingBox(rng.random(), rng.random(), 0.1, 0.1) for i in range(20)]
+    >>> trials = tune_node_capacity(AxisAlignedBoundingBox.positive_quadrant_box(1, 1), points, queries, candidate_node_capacities=(1, 8, 200), repetitions=1)
+    >>> sorted(trial.node_capacity for trial in trials)
+    [1, 8, 200]
+    >>> trials[0].seconds <= trials[-1].seconds
+    True
+    >>> [trial.summary.point_count for trial in trials]
+    [200, 200, 200]
+    """
+    sample_points = list(sample_points)
+    sample_queries = list(sample_queries)
+
+    trials = []
+    for node_capacity in candidate_node_capacities:
+        best_insert_seconds = None
+        best_query_seconds = None
+        for repetition in range(repetitions):
+            tree = PointQuadTree(boundary=boundary, node_capacity=node_capacity)
+
+            start_time = time.perf_counter()
+            for point in sample_points:
+                tree.insert(point)
+            insert_seconds = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            for region in sample_queries:
+                tree.query_points_in_region(region)
+            query_seconds = time.perf_counter() - start_time
+
+            if best_insert_seconds is None or insert_seconds + query_seconds < best_insert_seconds + best_query_seconds:
+                best_insert_seconds = insert_seconds
+                best_query_seconds = query_seconds
+        trials.append(NodeCapacityTrial(node_capacity, best_insert_seconds, best_query_seconds, summarize_tree(tree)))
+
+    trials.sort(key=lambda trial: trial.seconds)
+    return trials
+
+
+def tune_tree_node_capacity(tree, sample_queries, candidate_node_capacities=DEFAULT_CANDIDATE_NODE_CAPACITIES, repetitions=DEFAULT_REPETITIONS, apply=True):
+    """
+    Tunes the node-capacity of an existing tree by replaying its own points and the sample queries,
+    and rebuilds the tree with the fastest node-capacity if apply is True.
+
+    @param tree PointQuadTree
+    @return an array of NodeCapacityTrial, fastest first
+
+    >>> rng = random.Random(0)
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(1, 1), node_capacity=1)
+    >>> for i in range(100):
+    ...     _ = tree.insert(Point(rng.random(), rng.random()))
+    >>> trials = tune_tree_node_capacity(tree, [tree.boundary], candidate_node_capacities=(100,), repetitions=1)
+    >>> tree.node_capacity, len(tree.get_all_points())
+    (100, 100)
+    """
+    trials = tune_node_capacity(tree.boundary, tree.get_all_points(), sample_queries, candidate_node_capacities, repetitions)
+    if apply and trials[0].node_capacity != tree.node_capacity:
+        tree.rebuild(trials[0].node_capacity)
+    return trials
+
+
+def print_trials(trials):
+    """
+    @param trials array of NodeCapacityTrial
+    """
+    print('{:>13} {:>12} {:>12} {:>6} {:>8} {:>10} {:>12}'.format('node_capacity', 'insert (ms)', 'query (ms)', 'depth', 'nodes', 'leaf fill', 'memory (KB)'))
+    for trial in sorted(trials, key=lambda trial: trial.node_capacity):
+        print('{:>13} {:>12.3f} {:>12.3f} {:>6} {:>8} {:>10.2f} {:>12.1f}'.format(
+            trial.node_capacity,
+            1000 * trial.insert_seconds,
+            1000 * trial.query_seconds,
+            trial.summary.depth,
+            trial.summary.node_count,
+            trial.summary.leaf_fill_ratio,
+            trial.summary.estimated_memory_bytes / 1024))
+    print('Fastest node_capacity: {}'.format(trials[0].node_capacity))
+
+
+def main(num_points, num_queries):
+    """
+    Tunes the node-capacity for uniformly distributed points and small queries.
+    """
+    rng = random.Random(0)
+    points = [Point(rng.random(), rng.random()) for i in range(num_points)]
+    queries = [AxisAlignedBoundingBox(rng.random(), rng.random(), 0.01, 0.01) for i in range(num_queries)]
+    print('Tuning node_capacity: num_points={}, num_queries={}.'.format(num_points, num_queries))
+    print_trials(tune_node_capacity(AxisAlignedBoundingBox.positive_quadrant_box(1, 1), points, queries))
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree
+    module_dependencies = [point_quad_tree]
+
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        num_points = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+        num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+        main(num_points, num_queries)
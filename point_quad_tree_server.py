@@ -0,0 +1,517 @@
+"""
+An asyncio server that holds a PointQuadTree and serves it to other processes over a Unix or
+TCP socket, and the matching asyncio client.
+
+Clients identify points by integer ids.  Every message is a frame:
+    header: payload length (uint32), request id (uint32), opcode or status (uint8)
+    payload: the opcode's fields, packed with the structs below
+
+    opcode          request payload                 response status and payload
+    insert          id, x, y                        1 if inserted, else 0
+    remove          id                              1 if removed, else 0
+    translate       id, dx, dy                      PointQuadTree.TranslatePointResult
+    query_region    center x/y, half size x/y       1, count, count * (id, x, y)
+    query_nearest   x, y                            1, (id, x, y), or 0 if the tree is empty
+    query_region_page
+                    center x/y, half size x/y,      1, count, count * (id, x, y), cursor
+                    limit (uint32), cursor
+
+Malformed requests get the status 255 and an empty payload.
+
+A cursor is opaque to clients: it is empty for the first page of a query_region_page, and for
+the last page's next cursor.  Otherwise it is the offset (uint32) and then the subtree indices
+(one byte each) of PointQuadTree.query_points_in_region_page's cursor.
+
+Responses carry the request id of their request, so a client can pipeline requests without
+waiting for their responses.  The server applies all the requests that arrive together, from any
+number of connections, as one batch: consecutive inserts, and consecutive removes, are applied with
+one PointQuadTree.insert_points or remove_points, identical region queries in a batch are answered
+once, and each connection's responses are written with a single write.
+"""
+
+from point import Point
+from axis_aligned_bounding_box import AxisAlignedBoundingBox
+from point_quad_tree import PointQuadTree
+import asyncio
+import itertools
+import struct
+import sys
+
+_HEADER = struct.Struct('!IIB')
+_ID = struct.Struct('!q')
+_POSITION = struct.Struct('!dd')
+_ID_POSITION = struct.Struct('!qdd')
+_REGION = struct.Struct('!dddd')
+_COUNT = struct.Struct('!I')
+
+# Wait for the socket to drain once this many bytes are waiting to be sent.
+_WRITE_BUFFER_LIMIT = 1 << 20
+
+
+class Opcode:
+    insert = 1
+    remove = 2
+    translate = 3
+    query_region = 4
+    query_nearest = 5
+    query_region_page = 6
+
+
+class Status:
+    failure = 0
+    success = 1
+    bad_request = 255
+
+
+def _pack_cursor(cursor):
+    """
+    @param cursor A cursor of PointQuadTree.query_points_in_region_page, or None
+    @return bytes
+
+    >>> _pack_cursor(((2, 0, 3), 7)), _pack_cursor(None)
+    (b'\\x00\\x00\\x00\\x07\\x02\\x00\\x03', b'')
+    >>> _unpack_cursor(_pack_cursor(((2, 0, 3), 7))), _unpack_cursor(b'')
+    (((2, 0, 3), 7), None)
+    """
+    if cursor is None:
+        return b''
+    path, offset = cursor
+    return _COUNT.pack(offset) + bytes(path)
+
+
+def _unpack_cursor(cursor_bytes):
+    if not cursor_bytes:
+        return None
+    offset, = _COUNT.unpack_from(cursor_bytes)
+    return tuple(cursor_bytes[_COUNT.size:]), offset
+
+
+def _pack_points(points):
+    return _COUNT.pack(len(points)) + b''.join(_ID_POSITION.pack(point.point_id, point.x, point.y) for point in points)
+
+
+class _ServerPoint(Point):
+    def __init__(self, x, y, point_id):
+        super().__init__(x, y)
+        self.point_id = point_id
+
+
+class PointQuadTreeServer:
+    """
+    >>> async def example():
+    ...     tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1)
+    ...     server = PointQuadTreeServer(tree)
+    ...     await server.start(host='127.0.0.1', port=0)
+    ...     client = await PointQuadTreeClient.connect(host='127.0.0.1', port=server.port)
+    ...
+    ...     # Pipeline several requests; the server applies them as one batch.
+    ...     print(await asyncio.gather(client.insert(1, 1, 1), client.insert(2, 6, 6), client.insert(3, 9, 9), client.insert(1, 2, 2)))
+    ...     print(await client.query_points_in_region(AxisAlignedBoundingBox.positive_quadrant_box(4, 4)))
+    ...     print(await client.query_nearest_point(5, 5))
+    ...     print(await client.translate_point(2, -1, -1) == PointQuadTree.TranslatePointResult.translated)
+    ...     print(await client.remove(1), await client.remove(1))
+    ...     print(await client.query_points_in_region(tree.boundary))
+    ...     print(await asyncio.gather(client.insert(4, 7, 7), client.insert(5, 1, 7)))
+    ...     points, cursor = await client.query_points_in_region_page(tree.boundary, 2)
+    ...     print(points, await client.query_points_in_region_page(tree.boundary, 2, cursor))
+    ...     print(server.batch_count < server.request_count)
+    ...
+    ...     await client.close()
+    ...     await server.close()
+    >>> asyncio.run(example())
+    [True, True, False, False]
+    [(1, 1.0, 1.0)]
+    (2, 6.0, 6.0)
+    True
+    True False
+    [(2, 5.0, 5.0)]
+    [True, True]
+    [(2, 5.0, 5.0), (5, 1.0, 7.0)] ([(4, 7.0, 7.0)], None)
+    True
+    """
+
+    def __init__(self, tree):
+        """
+        @param tree PointQuadTree
+        """
+        self._tree = tree
+        self._points_by_id = {}
+        self._server = None
+        self._pending_requests = []
+        self._is_batch_scheduled = False
+
+        self.request_count = 0
+        self.batch_count = 0
+
+    async def start(self, path=None, host=None, port=None):
+        """
+        Listens on the Unix socket at path, or else on the TCP host and port.
+        """
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host=host, port=port)
+
+    @property
+    def port(self):
+        """
+        @return the TCP port being listened on, which is useful when the server was started with port 0
+        """
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                # readexactly() returns without yielding to the event loop while there are buffered
+                # frames, so every request that arrived together is queued before the batch runs.
+                payload_length, request_id, opcode = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                payload = await reader.readexactly(payload_length)
+                self._queue_request(writer, request_id, opcode, payload)
+
+                if writer.transport.get_write_buffer_size() > _WRITE_BUFFER_LIMIT:
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _queue_request(self, writer, request_id, opcode, payload):
+        self._pending_requests.append((writer, request_id, opcode, payload))
+        if not self._is_batch_scheduled:
+            self._is_batch_scheduled = True
+            asyncio.get_running_loop().call_soon(self._process_batch)
+
+    def _process_batch(self):
+        requests = self._pending_requests
+        self._pending_requests = []
+        self._is_batch_scheduled = False
+        self.request_count += len(requests)
+        self.batch_count += 1
+
+        # Responses to queries, by request, for the queries since the last mutation.
+        query_responses = {}
+
+        frames_by_writer = {}
+        request_index = 0
+        while request_index < len(requests):
+            writer, request_id, opcode, payload = requests[request_index]
+            if opcode in (Opcode.insert, Opcode.remove):
+                # Apply the consecutive inserts, or removes, with one bulk operation on the tree.
+                run_end = request_index + 1
+                while run_end < len(requests) and requests[run_end][2] == opcode:
+                    run_end += 1
+                run = requests[request_index:run_end]
+                apply_run = self._apply_inserts if opcode == Opcode.insert else self._apply_removes
+                responses = apply_run([payload for writer, request_id, opcode, payload in run])
+                query_responses.clear()
+                request_index = run_end
+            else:
+                run = [requests[request_index]]
+                if opcode in (Opcode.query_region, Opcode.query_nearest, Opcode.query_region_page):
+                    query = (opcode, payload)
+                    if query not in query_responses:
+                        query_responses[query] = self._apply(opcode, payload)
+                    responses = [query_responses[query]]
+                else:
+                    responses = [self._apply(opcode, payload)]
+                    query_responses.clear()
+                request_index += 1
+
+            for (writer, request_id, opcode, payload), (status, response_payload) in zip(run, responses):
+                frame = _HEADER.pack(len(response_payload), request_id, status) + response_payload
+                frames_by_writer.setdefault(writer, []).append(frame)
+
+        for writer, frames in frames_by_writer.items():
+            if not writer.is_closing():
+                writer.write(b''.join(frames))
+
+    def _apply_inserts(self, payloads):
+        """
+        Applies consecutive insert requests with one PointQuadTree.insert_points, as if they were applied in order.
+        @return an array of (status, response_payload), for each request
+
+        >>> server = PointQuadTreeServer(PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1))
+        >>> payloads = [_ID_POSITION.pack(1, 1, 1), _ID_POSITION.pack(2, 9, 9), _ID_POSITION.pack(2, 2, 2), _ID_POSITION.pack(1, 3, 3), b'']
+        >>> [status for status, payload in server._apply_inserts(payloads)]
+        [1, 0, 1, 0, 255]
+        >>> [status for status, payload in server._apply_removes([_ID.pack(1), _ID.pack(1), _ID.pack(3), b''])]
+        [1, 0, 0, 255]
+        >>> server._tree.get_all_points(), sorted(server._points_by_id)
+        ([(2.0,2.0)], [2])
+        """
+        responses = [(Status.failure, b'')] * len(payloads)
+        points = []
+        point_indexes = []
+        for index, payload in enumerate(payloads):
+            try:
+                point_id, x, y = _ID_POSITION.unpack(payload)
+            except struct.error:
+                responses[index] = Status.bad_request, b''
+                continue
+            point = _ServerPoint(x, y, point_id)
+            if point_id in self._points_by_id or not self._tree.boundary.contains_point(point):
+                continue
+            # Later inserts of the id, in this run, fail.
+            self._points_by_id[point_id] = point
+            points.append(point)
+            point_indexes.append(index)
+
+        for index, point, point_was_inserted in zip(point_indexes, points, self._tree.insert_points(points)):
+            if point_was_inserted:
+                responses[index] = Status.success, b''
+            else:
+                del self._points_by_id[point.point_id]
+        return responses
+
+    def _apply_removes(self, payloads):
+        """
+        Applies consecutive remove requests with one PointQuadTree.remove_points, as if they were applied in order.
+        @return an array of (status, response_payload), for each request
+        """
+        responses = [(Status.failure, b'')] * len(payloads)
+        points = []
+        for index, payload in enumerate(payloads):
+            try:
+                point_id, = _ID.unpack(payload)
+            except struct.error:
+                responses[index] = Status.bad_request, b''
+                continue
+            # Later removes of the id, in this run, fail.
+            point = self._points_by_id.pop(point_id, None)
+            if point is not None:
+                points.append(point)
+                responses[index] = Status.success, b''
+
+        self._tree.remove_points(points)
+        return responses
+
+    def _apply(self, opcode, payload):
+        """
+        @return (status, response_payload)
+        """
+        try:
+            return self._apply_request(opcode, payload)
+        except struct.error:
+            return Status.bad_request, b''
+
+    def _apply_request(self, opcode, payload):
+        """
+        @return (status, response_payload)
+        """
+        if opcode == Opcode.translate:
+            point_id, x, y = _ID_POSITION.unpack(payload)
+            point = self._points_by_id.get(point_id)
+            if point is None:
+                return PointQuadTree.TranslatePointResult.not_in_tree, b''
+            translate_result = self._tree.translate_point(point, x, y)
+            if translate_result == PointQuadTree.TranslatePointResult.removed:
+                del self._points_by_id[point_id]
+            return translate_result, b''
+        elif opcode == Opcode.query_region:
+            region = AxisAlignedBoundingBox(*_REGION.unpack(payload))
+            points = self._tree.query_points_in_region(region)
+            return Status.success, _pack_points(points)
+        elif opcode == Opcode.query_nearest:
+            point = self._tree.query_nearest_point(*_POSITION.unpack(payload))
+            if point is None:
+                return Status.failure, b''
+            return Status.success, _ID_POSITION.pack(point.point_id, point.x, point.y)
+        elif opcode == Opcode.query_region_page:
+            region = AxisAlignedBoundingBox(*_REGION.unpack_from(payload))
+            limit, = _COUNT.unpack_from(payload, _REGION.size)
+            if limit == 0:
+                return Status.bad_request, b''
+            cursor = _unpack_cursor(payload[_REGION.size + _COUNT.size:])
+            points, cursor = self._tree.query_points_in_region_page(region, limit, cursor)
+            return Status.success, _pack_points(points) + _pack_cursor(cursor)
+        else:
+            return Status.bad_request, b''
+
+
+class PointQuadTreeClient:
+    """
+    Requests may be issued concurrently from many coroutines.  They are pipelined over the one
+    connection and each returns when its own response arrives.
+    """
+
+    @staticmethod
+    async def connect(path=None, host=None, port=None):
+        """
+        Connects to the Unix socket at path, or else to the TCP host and port.
+        @return PointQuadTreeClient
+        """
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path=path)
+        else:
+            reader, writer = await asyncio.open_connection(host=host, port=port)
+        return PointQuadTreeClient(reader, writer)
+
+    def __init__(self, reader, writer):
+        """
+        @param reader, writer The asyncio streams of a connection to a PointQuadTreeServer
+        """
+        self._reader = reader
+        self._writer = writer
+        self._request_ids = itertools.count()
+        self._pending_responses = {}
+        self._response_reader = asyncio.ensure_future(self._read_responses())
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        await self._response_reader
+
+    async def insert(self, point_id, x, y):
+        """
+        @return True if the point was inserted, false otherwise (if the point is not in the tree's region, or the id is already in use)
+        """
+        status, payload = await self._request(Opcode.insert, _ID_POSITION.pack(point_id, x, y))
+        return status == Status.success
+
+    async def remove(self, point_id):
+        """
+        @return True if the point was removed, false otherwise (if the point is not in the tree)
+        """
+        status, payload = await self._request(Opcode.remove, _ID.pack(point_id))
+        return status == Status.success
+
+    async def translate_point(self, point_id, x, y):
+        """
+        @param x, y Number The amount to translate the point by.
+        @return PointQuadTree.TranslatePointResult
+        """
+        status, payload = await self._request(Opcode.translate, _ID_POSITION.pack(point_id, x, y))
+        return status
+
+    async def query_points_in_region(self, region):
+        """
+        @param region AxisAlignedBoundingBox
+        @return an array of (id, x, y) for the points in the region
+        """
+        status, payload = await self._request(
+            Opcode.query_region,
+            _REGION.pack(region.center_x, region.center_y, region.half_size_x, region.half_size_y))
+        return list(_ID_POSITION.iter_unpack(payload[_COUNT.size:]))
+
+    async def query_points_in_region_page(self, region, limit, cursor=None):
+        """
+        @param region AxisAlignedBoundingBox
+        @param limit Integer The maximum number of points to return, at least 1
+        @param cursor The cursor of the previous page, or None for the first page
+        @return (an array of (id, x, y) for up to limit points in the region, the cursor of the next page or None if there are no more points)
+        """
+        status, payload = await self._request(
+            Opcode.query_region_page,
+            _REGION.pack(region.center_x, region.center_y, region.half_size_x, region.half_size_y)
+                + _COUNT.pack(limit) + (cursor or b''))
+        count, = _COUNT.unpack_from(payload)
+        points_end = _COUNT.size + count * _ID_POSITION.size
+        return list(_ID_POSITION.iter_unpack(payload[_COUNT.size:points_end])), payload[points_end:] or None
+
+    async def query_nearest_point(self, x, y):
+        """
+        @return (id, x, y) of the point closest to (x, y), or None if the tree is empty
+        """
+        status, payload = await self._request(Opcode.query_nearest, _POSITION.pack(x, y))
+        if status != Status.success:
+            return None
+        return _ID_POSITION.unpack(payload)
+
+    async def _request(self, opcode, payload):
+        """
+        @return (status, response_payload)
+
+        Cancelling a request, for example with asyncio.wait_for, drops its response when it arrives, and
+        leaves the connection usable:
+        >>> async def example():
+        ...     server = PointQuadTreeServer(PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=1))
+        ...     await server.start(host='127.0.0.1', port=0)
+        ...     client = await PointQuadTreeClient.connect(host='127.0.0.1', port=server.port)
+        ...
+        ...     query = asyncio.ensure_future(client.query_points_in_region(server._tree.boundary))
+        ...     await asyncio.sleep(0)
+        ...     query.cancel()
+        ...     print(await asyncio.wait_for(client.insert(1, 1, 1), timeout=5), query.cancelled(), client._pending_responses)
+        ...
+        ...     await client.close()
+        ...     await server.close()
+        >>> asyncio.run(example())
+        True True {}
+        """
+        if self._response_reader.done():
+            raise ConnectionError('The connection to the server was closed.')
+
+        request_id = next(self._request_ids) & 0xFFFFFFFF
+        response = asyncio.get_running_loop().create_future()
+        self._pending_responses[request_id] = response
+        try:
+            self._writer.write(_HEADER.pack(len(payload), request_id, opcode) + payload)
+
+            if self._writer.transport.get_write_buffer_size() > _WRITE_BUFFER_LIMIT:
+                await self._writer.drain()
+
+            return await response
+        finally:
+            self._pending_responses.pop(request_id, None)
+
+    async def _read_responses(self):
+        try:
+            while True:
+                payload_length, request_id, status = _HEADER.unpack(await self._reader.readexactly(_HEADER.size))
+                payload = await self._reader.readexactly(payload_length)
+                # The request may have been cancelled while its response was on the way.
+                response = self._pending_responses.pop(request_id, None)
+                if response is not None and not response.done():
+                    response.set_result((status, payload))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            # Whatever stopped the reader, no more responses will arrive for the pending requests.
+            for response in self._pending_responses.values():
+                if not response.done():
+                    response.set_exception(ConnectionError('The connection to the server was closed.'))
+            self._pending_responses.clear()
+
+
+async def serve(path, boundary, node_capacity):
+    """
+    Serves a new, empty PointQuadTree on the Unix socket at path until cancelled.
+    """
+    server = PointQuadTreeServer(PointQuadTree(boundary=boundary, node_capacity=node_capacity))
+    await server.start(path=path)
+    await server.serve_forever()
+
+
+def main():
+    """
+    Usage: python point_quad_tree_server.py socket_path width height [node_capacity]
+    """
+    path = sys.argv[1]
+    boundary = AxisAlignedBoundingBox.positive_quadrant_box(float(sys.argv[2]), float(sys.argv[3]))
+    node_capacity = int(sys.argv[4]) if len(sys.argv) > 4 else 20
+    print('Serving PointQuadTree: path={}, boundary={}, node_capacity={}.'.format(path, boundary, node_capacity))
+    asyncio.run(serve(path, boundary, node_capacity))
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree
+    module_dependencies = [point_quad_tree]
+
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    failure_count, test_count = run_tests()
+    if failure_count == 0:
+        main()
@@ -0,0 +1,401 @@
+"""
+The moving-points simulation of point_quad_tree_viewer, without a display.
+
+Each tick inserts or removes random points at the insertion rate, then pushes each point toward or
+away from its neighbours (flocking) and moves it by its velocity.  Points that leave the tree's
+boundary are removed.
+
+PointQuadTreeSimulation moves one point at a time.  VectorizedPointQuadTreeSimulation keeps the
+positions and velocities in NumPy arrays and moves every point at once, which scales to many more points.
+"""
+
+from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+
+import math
+import random
+
+import numpy
+
+
+def sign(x):
+    """
+    @return 1 if x >=0, -1 otherwise
+    """
+    if x >= 0:
+        return 1
+    else:
+        return -1
+
+class MovingPoint(Point):
+    def __init__(self, x, y):
+        super().__init__(x, y)
+        self.velocity = Point(0, 0)
+
+class PointQuadTreeSimulation:
+    """
+    Moves the points of a PointQuadTree.
+
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(640, 480), node_capacity=20)
+    >>> simulation = PointQuadTreeSimulation(tree, collision_area_radius=8, rng=random.Random(0))
+    >>> simulation.random_point_insertion_rate = 10
+    >>> for i in range(5):
+    ...     simulation.tick()
+    >>> 0 < len(tree.get_all_points()) <= 50
+    True
+
+    Removing points stops once none are left:
+    >>> simulation.random_point_insertion_rate = -100
+    >>> simulation.tick()
+    >>> tree.get_all_points(), simulation.random_point_insertion_rate
+    ([], 0)
+    """
+    FLOCK_IDEAL_DISTANCE_SQUARED = 400
+    FLOCK_FORCE_SCALE = 0.0001
+    FLOCK_THETA = 0.5
+
+    def __init__(self, point_quad_tree, collision_area_radius, rng=random):
+        """
+        @param point_quad_tree PointQuadTree, whose aggregates are enabled by the first tick of approximate flocking
+        @param collision_area_radius Number The half-size of the square within which points flock
+        @param rng random.Random The source of the random points, which the random module is by default
+        """
+        self._tree = point_quad_tree
+        self._rng = rng
+
+        self.collision_area_radius = collision_area_radius
+        self.random_point_insertion_rate = 0
+        self._random_point_insertion_accumulator = 0
+        self.has_point_movement = True
+
+        # Distant groups of points push or pull as one point at their centroid (Barnes-Hut), rather than
+        # each point querying its collision area.
+        self.has_approximate_flocking = True
+
+    def get_points(self):
+        return self._tree.get_all_points()
+
+    def tick(self):
+        self.tick_point_insertion()
+        if self.has_point_movement:
+            self.tick_point_movement()
+
+    def tick_point_insertion(self):
+        self._random_point_insertion_accumulator += self.random_point_insertion_rate
+        count = int(self._random_point_insertion_accumulator)
+        self._random_point_insertion_accumulator -= count
+        if count > 0:
+            for i in range(count):
+                self.add_random_point()
+        elif count < 0:
+            self.remove_random_points(-count)
+
+    def tick_point_movement(self):
+        if self.has_approximate_flocking and self._tree.aggregate() is None:
+            self._tree.enable_aggregates()
+
+        for point in self.get_points():
+            if self.has_approximate_flocking:
+                cutoff = self.collision_area_radius * math.sqrt(2)
+                force_x, force_y = self._tree.approximate_field(point.x, point.y, self.FLOCK_THETA, self.get_flock_force, cutoff)
+                point.velocity.translate(force_x, force_y)
+            else:
+                for other_point in self.get_points_in_collision_area_for_point(point):
+                    self.apply_flock_forces(point, other_point)
+            self.move_point(point)
+
+    def get_flock_force(self, dx, dy, weight):
+        """
+        The approximate_field kernel of apply_flock_forces: the force of weight points at (dx, dy) from a point.
+        """
+        if abs(dx) > self.collision_area_radius or abs(dy) > self.collision_area_radius or (dx == 0 and dy == 0):
+            return 0, 0
+        distance_squared = dx**2 + dy**2
+        scale = weight * (self.FLOCK_IDEAL_DISTANCE_SQUARED - distance_squared) * self.FLOCK_FORCE_SCALE / math.sqrt(distance_squared)
+        return -dx * scale, -dy * scale
+
+    def apply_flock_forces(self, point, other_point):
+        desired_distance_squared_delta = self.FLOCK_IDEAL_DISTANCE_SQUARED - point.distance_squared(other_point)
+        desired_distance_force = point.direction_from(other_point).scale(desired_distance_squared_delta * self.FLOCK_FORCE_SCALE)
+
+        total_force = Point(0, 0)
+        total_force.translate_by_point(desired_distance_force)
+        point.velocity.translate(total_force.x, total_force.y)
+
+    def move_point(self, point):
+        translate_result = self._tree.translate_point(point, point.velocity.x, point.velocity.y)
+        if translate_result == PointQuadTree.TranslatePointResult.removed:
+            self._stop_removing_points_if_none_are_left()
+
+    def get_points_in_collision_area_for_point(self, point):
+        """
+        @return iteratable(Point) the points in point's collision area
+        """
+        points = self._tree.query_points_in_region(self.get_collision_boundary(point.x, point.y))
+        if point in points:
+            points.remove(point)
+        return points
+
+    def get_collision_boundary(self, x, y):
+        return AxisAlignedBoundingBox(
+            center_x=x,
+            center_y=y,
+            half_size_x=self.collision_area_radius,
+            half_size_y=self.collision_area_radius)
+
+    def add_random_point(self):
+        x = self._rng.randint(self._tree.boundary.x_min(), self._tree.boundary.x_max())
+        y = self._rng.randint(self._tree.boundary.y_min(), self._tree.boundary.y_max())
+        point = MovingPoint(x, y)
+
+        vx = self._get_random_nonzero_mirrored_number(1, 5)
+        vy = self._get_random_nonzero_mirrored_number(1, 5)
+        point.velocity.translate(vx, vy)
+
+        self.add_point(point)
+
+    def _get_random_nonzero_mirrored_number(self, absolute_min, absolute_max):
+        sign = (2 * self._rng.randint(0, 1)) - 1
+        return self._rng.uniform(absolute_min, absolute_max) * sign
+
+    def add_point(self, point):
+        self._tree.insert(point)
+
+    def remove_random_point(self):
+        self.remove_random_points(1)
+
+    def remove_random_points(self, count):
+        """
+        Removes count points, or every point if there are fewer, chosen at random.
+        """
+        points = self._tree.sample_points(count, rng=self._rng)
+        if points:
+            self._tree.remove_points(points)
+        self._stop_removing_points_if_none_are_left()
+
+    def remove_point(self, point):
+        self._tree.remove(point)
+        self._stop_removing_points_if_none_are_left()
+
+    def remove_points_in_region(self, region):
+        """
+        @return an array of the points that were removed
+        """
+        points = self._tree.remove_points_in_region(region)
+        self._stop_removing_points_if_none_are_left()
+        return points
+
+    def _stop_removing_points_if_none_are_left(self):
+        if self.random_point_insertion_rate < 0 and self._tree.is_empty():
+            self.random_point_insertion_rate = 0
+
+
+class VectorizedPointQuadTreeSimulation(PointQuadTreeSimulation):
+    """
+    Moves the points of a PointQuadTree, with their positions and velocities in NumPy arrays.
+
+    Each tick queries the tree once for the pairs of points in each other's collision areas, computes all
+    of the pairs' flocking forces at once, and moves the points with one translate_points call.  Unlike
+    PointQuadTreeSimulation, which moves each point before computing the next point's forces, every force
+    is computed from the positions at the start of the tick.  Flocking is always exact: has_approximate_flocking
+    is ignored.
+
+    A MovingPoint's velocity is read when the point is added.  Call store_velocities to write the velocities back.
+
+    The same forces as PointQuadTreeSimulation, for points that do not move:
+    >>> from point_quad_tree import AxisAlignedBoundingBox
+    >>> def simulate(simulation_class):
+    ...     tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(100, 100), node_capacity=2)
+    ...     simulation = simulation_class(tree, collision_area_radius=20, rng=random.Random(0))
+    ...     simulation.has_approximate_flocking = False
+    ...     for i in range(20):
+    ...         simulation.add_random_point()
+    ...     simulation.has_point_movement = False
+    ...     if simulation_class is VectorizedPointQuadTreeSimulation:
+    ...         simulation.tick_point_forces()
+    ...         simulation.store_velocities()
+    ...     else:
+    ...         for point in simulation.get_points():
+    ...             for other_point in simulation.get_points_in_collision_area_for_point(point):
+    ...                 simulation.apply_flock_forces(point, other_point)
+    ...     return sorted((point.x, point.y, round(point.velocity.x, 9), round(point.velocity.y, 9)) for point in simulation.get_points())
+    >>> simulate(VectorizedPointQuadTreeSimulation) == simulate(PointQuadTreeSimulation)
+    True
+
+    The arrays follow the tree as points are added, moved, and removed:
+    >>> tree = PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(640, 480), node_capacity=20)
+    >>> simulation = VectorizedPointQuadTreeSimulation(tree, collision_area_radius=8, rng=random.Random(0))
+    >>> for i in range(200):
+    ...     simulation.add_random_point()
+    >>> simulation.random_point_insertion_rate = -2
+    >>> for i in range(20):
+    ...     simulation.tick()
+    >>> points = simulation.get_points()
+    >>> len(points) < 200, sorted(map(id, points)) == sorted(map(id, tree.get_all_points()))
+    (True, True)
+    >>> simulation.positions().tolist() == [[point.x, point.y] for point in points]
+    True
+    >>> removed_points = simulation.remove_points_in_region(AxisAlignedBoundingBox(center_x=320, center_y=240, half_size_x=160, half_size_y=120))
+    >>> points = simulation.get_points()
+    >>> len(removed_points) > 0, sorted(map(id, points)) == sorted(map(id, tree.get_all_points()))
+    (True, True)
+    >>> simulation.positions().tolist() == [[point.x, point.y] for point in points]
+    True
+    """
+
+    def __init__(self, point_quad_tree, collision_area_radius, rng=random):
+        """
+        @param point_quad_tree PointQuadTree of MovingPoint's, whose points the simulation takes over
+        @param collision_area_radius Number The half-size of the square within which points flock
+        @param rng random.Random The source of the random points, which the random module is by default
+        """
+        super().__init__(point_quad_tree, collision_area_radius, rng)
+
+        # Row i of the arrays is the position and velocity of self._points[i].  The arrays have room for more rows.
+        self._points = []
+        self._rows = {}
+        self._positions = numpy.empty((16, 2))
+        self._velocities = numpy.empty((16, 2))
+        for point in self._tree.get_all_points():
+            self._add_row(point)
+
+    def get_points(self):
+        return self._points
+
+    def positions(self):
+        """
+        @return NumPy array of the points' (x, y), in the order of get_points
+        """
+        return self._positions[:len(self._points)]
+
+    def velocities(self):
+        """
+        @return NumPy array of the points' velocities, in the order of get_points
+        """
+        return self._velocities[:len(self._points)]
+
+    def store_velocities(self):
+        """
+        Writes the velocities to the points, for example to continue with a PointQuadTreeSimulation.
+        """
+        for point, (velocity_x, velocity_y) in zip(self._points, self.velocities().tolist()):
+            point.velocity.x = velocity_x
+            point.velocity.y = velocity_y
+
+    def tick_point_movement(self):
+        self.tick_point_forces()
+
+        velocities = self.velocities()
+        translate_results = self._tree.translate_points(zip(self._points, velocities[:, 0].tolist(), velocities[:, 1].tolist()))
+        self.positions()[:] += velocities
+
+        removed_rows = [row for row, translate_result in enumerate(translate_results) if translate_result == PointQuadTree.TranslatePointResult.removed]
+        if removed_rows:
+            self._remove_rows(removed_rows)
+            self._stop_removing_points_if_none_are_left()
+
+    def tick_point_forces(self):
+        """
+        Adds the flocking forces of apply_flock_forces, for every pair of points in each other's collision areas, to the velocities.
+        """
+        pairs = self._tree.query_point_pairs_in_range(self.collision_area_radius)
+        if not pairs:
+            return
+
+        rows = self._rows
+        first_rows = numpy.fromiter((rows[id(point)] for (point, other_point) in pairs), dtype=numpy.intp, count=len(pairs))
+        second_rows = numpy.fromiter((rows[id(other_point)] for (point, other_point) in pairs), dtype=numpy.intp, count=len(pairs))
+
+        positions = self.positions()
+        differences = positions[first_rows] - positions[second_rows]
+        distances_squared = differences[:, 0]**2 + differences[:, 1]**2
+        distances = numpy.sqrt(distances_squared)
+
+        # The direction between points at the same position is (0, 0), as in Point.direction_from.
+        scales = numpy.zeros_like(distances)
+        numpy.divide((self.FLOCK_IDEAL_DISTANCE_SQUARED - distances_squared) * self.FLOCK_FORCE_SCALE, distances, out=scales, where=distances > 0)
+        forces = differences * scales[:, numpy.newaxis]
+
+        # Each pair pushes or pulls its points equally, in opposite directions.
+        velocities = self.velocities()
+        point_count = len(self._points)
+        for axis in (0, 1):
+            velocities[:, axis] += (
+                numpy.bincount(first_rows, weights=forces[:, axis], minlength=point_count) -
+                numpy.bincount(second_rows, weights=forces[:, axis], minlength=point_count))
+
+    def add_point(self, point):
+        if self._tree.insert(point):
+            self._add_row(point)
+
+    def remove_point(self, point):
+        if self._tree.remove(point):
+            self._remove_rows([self._rows[id(point)]])
+        self._stop_removing_points_if_none_are_left()
+
+    def remove_random_points(self, count):
+        """
+        Removes count points, or every point if there are fewer, chosen at random from the rows rather than
+        sampled from the tree.
+        """
+        rows = self._rng.sample(range(len(self._points)), min(count, len(self._points)))
+        if rows:
+            self._tree.remove_points([self._points[row] for row in rows])
+            self._remove_rows(rows)
+        self._stop_removing_points_if_none_are_left()
+
+    def remove_points_in_region(self, region):
+        points = self._tree.remove_points_in_region(region)
+        if points:
+            self._remove_rows([self._rows[id(point)] for point in points])
+        self._stop_removing_points_if_none_are_left()
+        return points
+
+    def _add_row(self, point):
+        row = len(self._points)
+        if row == len(self._positions):
+            self._positions = numpy.concatenate((self._positions, numpy.empty_like(self._positions)))
+            self._velocities = numpy.concatenate((self._velocities, numpy.empty_like(self._velocities)))
+        self._positions[row] = (point.x, point.y)
+        self._velocities[row] = (point.velocity.x, point.velocity.y)
+        self._points.append(point)
+        self._rows[id(point)] = row
+
+    def _remove_rows(self, rows):
+        """
+        Moves the last row into each removed row, so that removing a row costs O(1) rather than shifting the rows after it.
+        @param rows iteratable of the distinct rows to remove
+
+        >>> simulation = VectorizedPointQuadTreeSimulation(PointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(8, 8), node_capacity=2), collision_area_radius=1)
+        >>> for i in range(5):
+        ...     simulation.add_point(MovingPoint(i, i))
+        >>> simulation._remove_rows([1, 4, 0])
+        >>> simulation.get_points(), simulation.positions().tolist()
+        ([(2,2), (3,3)], [[2.0, 2.0], [3.0, 3.0]])
+        >>> [simulation._rows[id(point)] for point in simulation.get_points()], len(simulation._rows)
+        ([0, 1], 2)
+        """
+        # Removing from the end first means that the last row, which moves into the removed row, is never itself removed.
+        for row in sorted(rows, reverse=True):
+            del self._rows[id(self._points[row])]
+            last_row = len(self._points) - 1
+            last_point = self._points.pop()
+            if row != last_row:
+                self._points[row] = last_point
+                self._rows[id(last_point)] = row
+                self._positions[row] = self._positions[last_row]
+                self._velocities[row] = self._velocities[last_row]
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree
+    module_dependencies = [point_quad_tree]
+
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    run_tests()
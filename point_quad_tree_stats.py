@@ -0,0 +1,156 @@
+"""
+Counters of the work that PointQuadTree operations do, for diagnosing slow operations.
+
+See PointQuadTree.enable_stats and PointQuadTree.collect_stats.
+"""
+
+from point_quad_tree_hooks import PointQuadTreeHook
+
+
+class OperationStats:
+    """
+    The work done by one or more calls of one operation.
+
+    >>> stats = OperationStats()
+    >>> stats.nodes_visited += 3
+    >>> total = OperationStats()
+    >>> total.add(stats)
+    >>> total.add(stats)
+    >>> total.nodes_visited
+    6
+    >>> total.as_dict()['nodes_visited']
+    6
+    """
+    COUNTERS = (
+        'calls',
+        'nodes_visited',
+        'contains_tests',
+        'intersects_tests',
+        'points_tested',
+        'points_returned',
+        'subdivisions',
+        'collapses',
+        'bubble_ups',
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.nodes_visited = 0
+        self.contains_tests = 0
+        self.intersects_tests = 0
+        self.points_tested = 0
+        self.points_returned = 0
+        self.subdivisions = 0
+        self.collapses = 0
+        self.bubble_ups = 0
+
+    def add(self, other):
+        """
+        @param other OperationStats
+        """
+        for counter in OperationStats.COUNTERS:
+            setattr(self, counter, getattr(self, counter) + getattr(other, counter))
+
+    def as_dict(self):
+        return {counter: getattr(self, counter) for counter in OperationStats.COUNTERS}
+
+    def __repr__(self):
+        """
+        >>> repr(OperationStats())
+        'OperationStats<calls=0, nodes_visited=0, contains_tests=0, intersects_tests=0, points_tested=0, points_returned=0, subdivisions=0, collapses=0, bubble_ups=0>'
+        """
+        return 'OperationStats<{}>'.format(', '.join('{}={}'.format(counter, getattr(self, counter)) for counter in OperationStats.COUNTERS))
+
+
+class PointQuadTreeStats(PointQuadTreeHook):
+    """
+    The stats of every operation on a tree, by operation name, since the stats were enabled or reset.
+
+    Every node of the tree shares the same PointQuadTreeStats.  As an operation hook on the tree,
+    it begins and ends an operation around each public method, and the nodes add to the counters
+    of the current operation.
+
+    >>> stats = PointQuadTreeStats()
+    >>> stats.begin_operation('insert').nodes_visited += 2
+    >>> stats.end_operation()
+    >>> stats.begin_operation('insert').nodes_visited += 3
+    >>> stats.end_operation()
+    >>> stats.get_operation_stats('insert').nodes_visited
+    5
+    >>> stats.get_operation_stats('insert').calls
+    2
+    >>> stats.get_last_operation_stats('insert').nodes_visited
+    3
+    >>> stats.snapshot()
+    {'insert': {'calls': 2, 'nodes_visited': 5, 'contains_tests': 0, 'intersects_tests': 0, 'points_tested': 0, 'points_returned': 0, 'subdivisions': 0, 'collapses': 0, 'bubble_ups': 0}}
+    >>> stats.reset()
+    >>> stats.snapshot()
+    {}
+    """
+
+    QUERY_OPERATIONS = ('get_all_points', 'query_points_in_region', 'query_points_in_region_lod', 'query_points_in_region_page', 'query_points_in_polygon', 'query_points_near_polyline', 'query_points_matching', 'query_point_pairs_in_range', 'query_nearest_point', 'sample_points')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._operation_stats = {}
+        self._last_operation_stats = {}
+        self._operation = None
+
+        # The counters that the nodes add to.  Counters recorded outside of an operation are discarded.
+        self.current = OperationStats()
+
+    def begin_operation(self, operation):
+        """
+        @param operation String The name of the operation
+        @return OperationStats the counters of this call
+        """
+        self._operation = operation
+        self.current = OperationStats()
+        self.current.calls = 1
+        return self.current
+
+    def on_operation_start(self, operation):
+        self.begin_operation(operation)
+
+    def on_operation_end(self, operation, result_count):
+        if operation in PointQuadTreeStats.QUERY_OPERATIONS:
+            self.current.points_returned = result_count
+        self.end_operation()
+
+    def end_operation(self):
+        self._operation_stats.setdefault(self._operation, OperationStats()).add(self.current)
+        self._last_operation_stats[self._operation] = self.current
+        self._operation = None
+        self.current = OperationStats()
+
+    def get_operation_stats(self, operation):
+        """
+        @return OperationStats the totals of every call of the operation
+        """
+        return self._operation_stats.get(operation, OperationStats())
+
+    def get_last_operation_stats(self, operation):
+        """
+        @return OperationStats the counters of the most recent call of the operation
+        """
+        return self._last_operation_stats.get(operation, OperationStats())
+
+    def snapshot(self):
+        """
+        @return {operation: {counter: value}}
+        """
+        return {operation: operation_stats.as_dict() for operation, operation_stats in self._operation_stats.items()}
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__])
+
+if __name__ == '__main__':
+    run_tests()
@@ -1,11 +1,14 @@
 # TODO: Add the ability to save/load the current viewer state.
-# TODO: Add the ability to change the node-capacity (rebuilding the tree).
 # TODO: Add the ability to profile running one iteration of the current main loop.
 
 from point_quad_tree import PointQuadTree, AxisAlignedBoundingBox, Point
+from point_quad_tree_simulation import PointQuadTreeSimulation, VectorizedPointQuadTreeSimulation, MovingPoint
 
+import itertools
 import sys
-import random
+import time
+
+import numpy
 
 import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = 'hide'
@@ -14,20 +17,6 @@ import pygame
 QUAD_TREE_NODE_CAPACITY = 20
 BOUNDARY_WIDTH, BOUNDARY_HEIGHT = 640, 480
 
-def sign(x):
-    """
-    @return 1 if x >=0, -1 otherwise
-    """
-    if x >= 0:
-        return 1
-    else:
-        return -1
-
-class MovingPoint(Point):
-    def __init__(self, x, y):
-        super().__init__(x, y)
-        self.velocity = Point(0, 0)
-
 class PointQuadTreeViewer:
     """
     Displays a PointQuadTree
@@ -40,6 +29,16 @@ class PointQuadTreeViewer:
     _COLLISION_AREA_RADIUS_INITIAL = _COLLISION_AREA_RADIUS_MIN
     _COLLISION_AREA_RADIUS_GROWTH_RATE = _POINT_RADIUS
     _RANDOM_POINT_INSERTION_RATE_INITIAL = 0
+    _HEATMAP_CELL_SIZE = 16
+    _HEATMAP_MAX_ALPHA = 200
+    _FRAME_TIMES_FONT_SIZE = 20
+    # The weight of each frame in the smoothed per-stage frame-times.
+    _FRAME_TIME_SMOOTHING = 0.1
+    # The view zooms out by powers of two, around the tree's center.  Zoomed out, each node smaller than
+    # _LOD_CELL_SIZE pixels is drawn as one point, from query_points_in_region_lod.
+    _ZOOM_MIN = 1 / 16
+    _LOD_CELL_SIZE = 2 * _POINT_RADIUS
+    _FRAME_STAGES = ('events', 'tick', 'clear', 'heatmap', 'partitions', 'collision lines', 'points', 'collision area', 'overlay', 'flip')
 
     _BACKGROUND_COLOR = pygame.Color(0, 0, 0)
     _COLLISION_AREA_STATS_BACKGROUND_COLOR = pygame.Color(0, 0, 0, 150)
@@ -47,6 +46,8 @@ class PointQuadTreeViewer:
     _RED_COLOR = pygame.Color(255, 0, 0)
     _GREEN_COLOR = pygame.Color(0, 255, 0)
     _COLLISION_LINE_COLOR = pygame.Color(30, 30, 255)
+    _HEATMAP_COLOR = pygame.Color(255, 140, 0)
+    _SPRITE_COLOR_KEY = pygame.Color(255, 0, 255)
 
     _KEY_QUIT = pygame.K_ESCAPE
     _KEY_COLLISION_AREA_SHRINK = pygame.K_MINUS
@@ -57,31 +58,53 @@ class PointQuadTreeViewer:
     _KEY_RANDOM_POINT_INSERTION_RATE_INCREASE = pygame.K_k
     _KEY_TOGGLE_POINT_MOVEMENT = pygame.K_m
     _KEY_REMOVE_COLLISION_AREA_POINTS = pygame.K_BACKSPACE
+    _KEY_NODE_CAPACITY_DECREASE = pygame.K_LEFTBRACKET
+    _KEY_NODE_CAPACITY_INCREASE = pygame.K_RIGHTBRACKET
+    _KEY_TOGGLE_APPROXIMATE_FLOCKING = pygame.K_b
+    _KEY_TOGGLE_VECTORIZED_SIMULATION = pygame.K_v
+    _KEY_TOGGLE_HEATMAP = pygame.K_h
+    _KEY_TOGGLE_FRAME_TIMES = pygame.K_t
+    _KEY_ZOOM_OUT = pygame.K_COMMA
+    _KEY_ZOOM_IN = pygame.K_PERIOD
 
     def __init__(self, point_quad_tree):
         """
         @param point_quad_tree PointQuadTree
         """
         self._tree = point_quad_tree
+        self._tree_stats = self._tree.enable_stats()
+        self._simulation = PointQuadTreeSimulation(self._tree, self._COLLISION_AREA_RADIUS_INITIAL)
+        self._simulation.random_point_insertion_rate = self._RANDOM_POINT_INSERTION_RATE_INITIAL
+        self._zoom = 1
 
         pygame.init()
 
-        pygame.display.set_caption('PointQuadTree Viewer: node_capacity={}'.format(self._tree._node_capacity))
+        self._update_caption()
 
         self.fpsClock = pygame.time.Clock()
 
         self._font = pygame.font.Font(None, self._COLLISION_STATS_FONT_SIZE)
+        self._frame_times_font = pygame.font.Font(None, self._FRAME_TIMES_FONT_SIZE)
 
-        self._random_point_insertion_rate = self._RANDOM_POINT_INSERTION_RATE_INITIAL
-        self._random_point_insertion_accumulator = 0
-
-        self._collision_area_points = []
         self._mouse_x = 0
         self._mouse_y = 0
-        self._collision_area_radius = self._COLLISION_AREA_RADIUS_INITIAL
+        # The points near the mouse, which the tree keeps up to date as the points move.
+        self._collision_area_watcher = self._tree.add_region_watcher(self._get_mouse_collision_boundary())
+        self._collision_area_query_stats = self._tree_stats.get_last_operation_stats('query_points_in_region')
         self._collision_lines_visible = True
         self._subdivisions_visible = True
-        self._has_point_movement = True
+        self._heatmap_visible = False
+        self._frame_times_visible = True
+
+        # {stage: smoothed milliseconds} of the stages that ran in the last frame.
+        self._stage_milliseconds = {}
+
+        # The partition lines, drawn once per structure_version of the tree.
+        self._partition_surface = None
+        self._partition_surface_key = None
+
+        # {color: Surface} of a point, so that points are drawn with one blits() call.
+        self._point_sprites = {}
 
     def run(self):
         self.print_controls()
@@ -89,8 +112,8 @@ class PointQuadTreeViewer:
         self.screen = pygame.display.set_mode(self.size(), pygame.DOUBLEBUF)
 
         while True:
-            self._handle_events()
-            self._tick()
+            self._time_stage('events', self._handle_events)
+            self._time_stage('tick', self._tick)
             self._draw()
 
             # Wait long enough to run at 30 FPS.
@@ -102,15 +125,28 @@ class PointQuadTreeViewer:
         print('\t{}: Remove collision-area points'.format(pygame.key.name(self._KEY_REMOVE_COLLISION_AREA_POINTS)))
         print('\t{}: Toggle subdivision display'.format(pygame.key.name(self._KEY_TOGGLE_SUBDIVISION_DISPLAY)))
         print('\t{}: Toggle collison lines'.format(pygame.key.name(self._KEY_TOGGLE_COLLISION_LINES)))
+        print('\t{}: Toggle density heatmap'.format(pygame.key.name(self._KEY_TOGGLE_HEATMAP)))
+        print('\t{}: Toggle frame-time breakdown'.format(pygame.key.name(self._KEY_TOGGLE_FRAME_TIMES)))
         print('\t{}: Toggle point movement'.format(pygame.key.name(self._KEY_TOGGLE_POINT_MOVEMENT)))
+        print('\t{}: Toggle Barnes-Hut flocking (off: exact neighbour queries)'.format(pygame.key.name(self._KEY_TOGGLE_APPROXIMATE_FLOCKING)))
+        print('\t{}: Toggle the vectorized NumPy simulation (exact flocking)'.format(pygame.key.name(self._KEY_TOGGLE_VECTORIZED_SIMULATION)))
         print('\t{}/{}: Decrease/increase random-point insertion-rate'.format(
             pygame.key.name(self._KEY_RANDOM_POINT_INSERTION_RATE_DECREASE),
             pygame.key.name(self._KEY_RANDOM_POINT_INSERTION_RATE_INCREASE)))
         print('\t{}/{}: Shrink/grow collision area'.format(
             pygame.key.name(self._KEY_COLLISION_AREA_SHRINK),
             pygame.key.name(self._KEY_COLLISION_AREA_GROW)))
+        print('\t{}/{}: Zoom out/in'.format(
+            pygame.key.name(self._KEY_ZOOM_OUT),
+            pygame.key.name(self._KEY_ZOOM_IN)))
+        print('\t{}/{}: Halve/double node-capacity (rebuilding the tree)'.format(
+            pygame.key.name(self._KEY_NODE_CAPACITY_DECREASE),
+            pygame.key.name(self._KEY_NODE_CAPACITY_INCREASE)))
         print('\t{}: Quit'.format(pygame.key.name(self._KEY_QUIT)))
 
+    def _update_caption(self):
+        pygame.display.set_caption('PointQuadTree Viewer: node_capacity={}, zoom={}'.format(self._tree.node_capacity, self._zoom))
+
     def _get_points(self):
         return self._tree.get_all_points()
 
@@ -136,6 +172,10 @@ class PointQuadTreeViewer:
                     self._collision_lines_visible = not self._collision_lines_visible
                 elif event.key == self._KEY_TOGGLE_SUBDIVISION_DISPLAY:
                     self._subdivisions_visible = not self._subdivisions_visible
+                elif event.key == self._KEY_TOGGLE_HEATMAP:
+                    self._heatmap_visible = not self._heatmap_visible
+                elif event.key == self._KEY_TOGGLE_FRAME_TIMES:
+                    self._frame_times_visible = not self._frame_times_visible
                 elif event.key == self._KEY_RANDOM_POINT_INSERTION_RATE_DECREASE:
                     self._change_random_point_insertion_rate(-1)
                 elif event.key == self._KEY_RANDOM_POINT_INSERTION_RATE_INCREASE:
@@ -143,187 +183,201 @@ class PointQuadTreeViewer:
                 elif event.key == self._KEY_REMOVE_COLLISION_AREA_POINTS:
                     self._remove_collision_area_points()
                 elif event.key == self._KEY_TOGGLE_POINT_MOVEMENT:
-                    self._has_point_movement = not self._has_point_movement
+                    self._simulation.has_point_movement = not self._simulation.has_point_movement
+                elif event.key == self._KEY_TOGGLE_APPROXIMATE_FLOCKING:
+                    self._simulation.has_approximate_flocking = not self._simulation.has_approximate_flocking
+                    print('Barnes-Hut flocking {}.'.format('enabled' if self._simulation.has_approximate_flocking else 'disabled'))
+                elif event.key == self._KEY_TOGGLE_VECTORIZED_SIMULATION:
+                    self._toggle_vectorized_simulation()
+                elif event.key == self._KEY_ZOOM_OUT:
+                    self._set_zoom(max(self._ZOOM_MIN, self._zoom / 2))
+                elif event.key == self._KEY_ZOOM_IN:
+                    self._set_zoom(min(1, self._zoom * 2))
+                elif event.key == self._KEY_NODE_CAPACITY_DECREASE:
+                    self._rebuild_tree(max(1, self._tree.node_capacity // 2))
+                elif event.key == self._KEY_NODE_CAPACITY_INCREASE:
+                    self._rebuild_tree(2 * self._tree.node_capacity)
             elif event.type == pygame.MOUSEMOTION:
                 mouse_x, mouse_y = event.pos
                 self._update_mouse_position(mouse_x, mouse_y)
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 mouse_x, mouse_y = event.pos
-                self._add_point(MovingPoint(mouse_x, mouse_y))
+                self._add_point(MovingPoint(*self._to_tree_position(mouse_x, mouse_y)))
 
     def _update_mouse_position(self, mouse_x, mouse_y):
         """
-        @param mouse_point Point
+        @param mouse_x, mouse_y Number The mouse's position on the screen
         """
-        self._mouse_x = mouse_x
-        self._mouse_y = mouse_y
-        self._update_mouse_collision_area_points()
+        self._mouse_x, self._mouse_y = self._to_tree_position(mouse_x, mouse_y)
+        self._move_mouse_collision_area()
 
-    def _update_mouse_collision_area_points(self):
-        self._collision_area_points = self._get_points_in_collision_area_for_coordinate(self._mouse_x, self._mouse_y)
+    def _set_zoom(self, zoom):
+        if zoom != self._zoom:
+            self._zoom = zoom
+            self._update_caption()
+            self._update_mouse_position(*pygame.mouse.get_pos())
 
-    def _get_points_in_collision_area_for_point(self, point):
+    def _to_screen_position(self, x, y):
         """
-        @return iteratable(Point) the points in point's collision area
+        @return the screen position of the tree's position (x, y)
         """
-        points = self._get_points_in_collision_area_for_coordinate(point.x, point.y)
-        if point in points:
-            points.remove(point)
-        return points
+        boundary = self._tree.boundary
+        return (boundary.center_x + (x - boundary.center_x) * self._zoom, boundary.center_y + (y - boundary.center_y) * self._zoom)
 
-    def _get_points_in_collision_area_for_coordinate(self, x, y):
-        region = self._get_collision_boundary(x, y)
-        points = self._tree.query_points_in_region(region)
-        return points
+    def _to_tree_position(self, x, y):
+        """
+        @return the tree's position of the screen position (x, y)
+        """
+        boundary = self._tree.boundary
+        return (boundary.center_x + (x - boundary.center_x) / self._zoom, boundary.center_y + (y - boundary.center_y) / self._zoom)
+
+    def _move_mouse_collision_area(self):
+        self._tree.move_region_watcher(self._collision_area_watcher, self._get_mouse_collision_boundary())
+        self._collision_area_query_stats = self._tree_stats.get_last_operation_stats('query_points_in_region')
+
+    def _toggle_vectorized_simulation(self):
+        simulation = self._simulation
+        if isinstance(simulation, VectorizedPointQuadTreeSimulation):
+            simulation.store_velocities()
+            self._simulation = PointQuadTreeSimulation(self._tree, simulation.collision_area_radius)
+        else:
+            self._simulation = VectorizedPointQuadTreeSimulation(self._tree, simulation.collision_area_radius)
+        self._simulation.random_point_insertion_rate = simulation.random_point_insertion_rate
+        self._simulation.has_point_movement = simulation.has_point_movement
+        self._simulation.has_approximate_flocking = simulation.has_approximate_flocking
+        print('Vectorized simulation {}.'.format('enabled' if isinstance(self._simulation, VectorizedPointQuadTreeSimulation) else 'disabled'))
+
+    def _rebuild_tree(self, node_capacity):
+        if node_capacity != self._tree.node_capacity:
+            self._tree.rebuild(node_capacity)
+            self._update_caption()
+            print('Node-capacity changed to {}.'.format(node_capacity))
 
     def _grow_collision_area(self, amount):
-        new_collision_area_radius = max(self._COLLISION_AREA_RADIUS_MIN, self._collision_area_radius + amount)
-        if self._collision_area_radius != new_collision_area_radius:
-            self._collision_area_radius = new_collision_area_radius
-            self._update_mouse_collision_area_points()
-            print('Collision-area radius changed to {}.'.format(self._collision_area_radius))
+        new_collision_area_radius = max(self._COLLISION_AREA_RADIUS_MIN, self._simulation.collision_area_radius + amount)
+        if self._simulation.collision_area_radius != new_collision_area_radius:
+            self._simulation.collision_area_radius = new_collision_area_radius
+            self._move_mouse_collision_area()
+            print('Collision-area radius changed to {}.'.format(new_collision_area_radius))
 
     def _remove_collision_area_points(self):
-        for point in self._collision_area_points:
-            self._remove_point(point)
+        self._simulation.remove_points_in_region(self._get_mouse_collision_boundary())
 
     def _change_random_point_insertion_rate(self, amount):
-        self._set_random_point_insertion_rate(self._random_point_insertion_rate + amount)
+        self._set_random_point_insertion_rate(self._simulation.random_point_insertion_rate + amount)
 
     def _set_random_point_insertion_rate(self, value):
         # Don't remove points if none are left
         if value < 0 and not self._get_points():
             return
 
-        self._random_point_insertion_rate = value
-        print('Random-point insertion-rate changed to {}.'.format(self._random_point_insertion_rate))
-
-    def _stop_removing_points_if_none_are_left(self):
-        if not self._get_points():
-            self._set_random_point_insertion_rate(0)
-
-    def _tick_point_insertion(self):
-        self._random_point_insertion_accumulator += self._random_point_insertion_rate
-        while abs(self._random_point_insertion_accumulator) >= 1:
-            step = sign(self._random_point_insertion_accumulator)
-            self._random_point_insertion_accumulator -= step
-            if step > 0:
-                self._add_random_point()
-            else:
-                self._remove_random_point()
-
-    def _tick_point_movement(self):
-        for point in self._get_points():
-            nearby_points = self._get_points_in_collision_area_for_point(point)
-            for other_point in nearby_points:
-                self._apply_flock_forces(point, other_point)
-            self._move_point(point)
-
-    def _apply_flock_forces(self, point, other_point):
-        FLOCK_IDEAL_DISTANCE_SQUARED = 400
-        desired_distance_squared_delta = FLOCK_IDEAL_DISTANCE_SQUARED - point.distance_squared(other_point)
-        desired_distance_force = point.direction_from(other_point).scale(desired_distance_squared_delta * 0.0001)
-
-        total_force = Point(0, 0)
-        total_force.translate_by_point(desired_distance_force)
-        point.velocity.translate(total_force.x, total_force.y)
-
-    def _move_point(self, point):
-        translate_result = self._tree.translate_point(point, point.velocity.x, point.velocity.y)
-        if translate_result == PointQuadTree.TranslatePointResult.removed:
-            self._stop_removing_points_if_none_are_left()
-        self._update_mouse_collision_area_points()
+        self._simulation.random_point_insertion_rate = value
+        print('Random-point insertion-rate changed to {}.'.format(value))
 
     def _tick(self):
-        self._tick_point_insertion()
-        if self._has_point_movement:
-            self._tick_point_movement()
-
-    def _add_random_point(self):
-        x = random.randint(self._tree.boundary.x_min(), self._tree.boundary.x_max())
-        y = random.randint(self._tree.boundary.y_min(), self._tree.boundary.y_max())
-        point = MovingPoint(x, y)
-
-        vx = self._get_random_nonzero_mirrored_number(1, 5)
-        vy = self._get_random_nonzero_mirrored_number(1, 5)
-        point.velocity.translate(vx, vy)
-
-        self._add_point(point)
-
-    @staticmethod
-    def _get_random_nonzero_mirrored_number(absolute_min, absolute_max):
-        sign = (2 * random.randint(0, 1)) - 1
-        return random.uniform(absolute_min, absolute_max) * sign
+        self._simulation.tick()
 
     def _add_point(self, point):
-        self._tree.insert(point)
-        self._update_mouse_collision_area_points()
-
-    def _remove_random_point(self):
-        points = self._get_points()
-        if not points:
-            return
-
-        point = random.choice(points)
-        self._remove_point(point)
-
-    def _remove_point(self, point):
-        self._tree.remove(point)
-        self._update_mouse_collision_area_points()
-        self._stop_removing_points_if_none_are_left()
+        self._simulation.add_point(point)
 
     def _get_mouse_collision_boundary(self):
         return self._get_collision_boundary(self._mouse_x, self._mouse_y)
 
     def _get_collision_boundary(self, x, y):
-        return AxisAlignedBoundingBox(
-            center_x=x,
-            center_y=y,
-            half_size_x=self._collision_area_radius,
-            half_size_y=self._collision_area_radius)
+        return self._simulation.get_collision_boundary(x, y)
+
+    def _time_stage(self, stage, function, *args):
+        """
+        Calls function(*args) and adds its time to the stage's smoothed frame-time.
+        """
+        start_time = time.perf_counter()
+        function(*args)
+        milliseconds = (time.perf_counter() - start_time) * 1000
+
+        previous_milliseconds = self._stage_milliseconds.get(stage)
+        if previous_milliseconds is not None:
+            milliseconds = previous_milliseconds + self._FRAME_TIME_SMOOTHING * (milliseconds - previous_milliseconds)
+        self._stage_milliseconds[stage] = milliseconds
 
     def _draw(self):
-        self.screen.fill(self._BACKGROUND_COLOR)
+        self._time_stage('clear', self.screen.fill, self._BACKGROUND_COLOR)
+
+        if self._heatmap_visible:
+            self._time_stage('heatmap', self._draw_heatmap, self._HEATMAP_COLOR)
+        else:
+            self._stage_milliseconds.pop('heatmap', None)
 
         if self._subdivisions_visible:
-            self._draw_tree_partitions(self._WHITE_COLOR)
+            self._time_stage('partitions', self._draw_tree_partitions, self._WHITE_COLOR)
+        else:
+            self._stage_milliseconds.pop('partitions', None)
 
-        if self._collision_lines_visible:
-            self._draw_collision_lines(self._COLLISION_LINE_COLOR)
+        # Zoomed out, the collision lines are hidden, since there are as many as there are pairs of nearby points.
+        if self._collision_lines_visible and self._zoom == 1:
+            self._time_stage('collision lines', self._draw_collision_lines, self._COLLISION_LINE_COLOR)
+        else:
+            self._stage_milliseconds.pop('collision lines', None)
 
-        self._draw_points(self._RED_COLOR)
-        self._draw_collision_area_and_points(self._GREEN_COLOR)
-        self._draw_collision_area_stats(self._WHITE_COLOR)
+        self._time_stage('points', self._draw_points, self._RED_COLOR)
+        self._time_stage('collision area', self._draw_collision_area_and_points, self._GREEN_COLOR)
+        self._time_stage('overlay', self._draw_overlay)
 
-        pygame.display.flip()
+        self._time_stage('flip', pygame.display.flip)
+
+    def _draw_overlay(self):
+        self._draw_collision_area_stats(self._WHITE_COLOR)
+        if self._frame_times_visible:
+            self._draw_frame_times(self._WHITE_COLOR)
 
     def _draw_points(self, color):
-        for point in self._get_points():
-            self._draw_point(color, point)
+        if self._zoom < 1:
+            representatives = self._tree.query_points_in_region_lod(self._tree.boundary, self._LOD_CELL_SIZE / self._zoom)
+            self._draw_point_batch(color, [point for (point, count) in representatives])
+        else:
+            self._draw_point_batch(color, self._get_points())
 
-    def _draw_point(self, color, point):
+    def _draw_point_batch(self, color, points):
         """
-        @param point Point
+        Blits a pre-drawn circle at each point, with one call.
+        @param points iterable(Point)
         """
-        pygame.draw.circle(self.screen, color, (round(point.x), round(point.y)), self._POINT_RADIUS)
+        sprite = self._get_point_sprite(color)
+        radius = self._POINT_RADIUS
+        zoom = self._zoom
+        offset_x, offset_y = self._to_screen_position(0, 0)
+        offset_x -= radius
+        offset_y -= radius
+        self.screen.blits([(sprite, (round(point.x * zoom + offset_x), round(point.y * zoom + offset_y))) for point in points], doreturn=False)
+
+    def _get_point_sprite(self, color):
+        key = tuple(color)
+        sprite = self._point_sprites.get(key)
+        if sprite is None:
+            # A color-keyed, run-length-encoded surface in the screen's format blits faster than one with alpha.
+            radius = self._POINT_RADIUS
+            sprite = pygame.Surface((2 * radius + 1, 2 * radius + 1))
+            sprite.fill(self._SPRITE_COLOR_KEY)
+            pygame.draw.circle(sprite, color, (radius, radius), radius)
+            sprite.set_colorkey(self._SPRITE_COLOR_KEY, pygame.RLEACCEL)
+            sprite = sprite.convert(self.screen)
+            self._point_sprites[key] = sprite
+        return sprite
 
     def _draw_collision_area_and_points(self, color):
         # Highlight the area near the mouse location.
         self._draw_boundry(color, self._get_mouse_collision_boundary(), border_thickness=1)
 
         # Highlight points near the mouse location.
-        for point in self._collision_area_points:
-            self._draw_point(color, point)
+        self._draw_point_batch(color, self._collision_area_watcher.points())
 
     def _draw_boundry(self, color, axis_aligned_bounding_box, border_thickness=0):
         """
         @param axis_aligned_bounding_box AxisAlignedBoundingBox
         @border_thickness Integer The border thickness.  Fills if the value is 0.
         """
-        center_x = axis_aligned_bounding_box.center_x
-        center_y = axis_aligned_bounding_box.center_y
-        half_size_x = axis_aligned_bounding_box.half_size_y
-        half_size_y = axis_aligned_bounding_box.half_size_y
+        center_x, center_y = self._to_screen_position(axis_aligned_bounding_box.center_x, axis_aligned_bounding_box.center_y)
+        half_size_x = axis_aligned_bounding_box.half_size_y * self._zoom
+        half_size_y = axis_aligned_bounding_box.half_size_y * self._zoom
         rect = (
             center_x - half_size_x,
             center_y - half_size_y,
@@ -332,74 +386,160 @@ class PointQuadTreeViewer:
 
         pygame.draw.rect(self.screen, color, rect, border_thickness)
 
-    def _draw_tree_partitions(self, color):
-        self._draw_tree_partitions_helper(self._tree, color)
+    def _draw_heatmap(self, color):
+        """
+        Shades each cell of a grid over the tree by its share of the densest cell's points.
+        """
+        width, height = self.size()
+        left, top = self._to_screen_position(self._tree.boundary.x_min(), self._tree.boundary.y_min())
+        cols = max(1, int(width * self._zoom) // self._HEATMAP_CELL_SIZE)
+        rows = max(1, int(height * self._zoom) // self._HEATMAP_CELL_SIZE)
+        grid = self._tree.density_grid(self._tree.boundary, cols, rows)
+        max_count = max(max(row) for row in grid)
+        if max_count == 0:
+            return
 
-    def _draw_tree_partitions_helper(self, tree, color):
+        cell_width = width * self._zoom / cols
+        cell_height = height * self._zoom / rows
+        heatmap_surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        for row_index, row in enumerate(grid):
+            for col_index, count in enumerate(row):
+                if count:
+                    cell_color = pygame.Color(color.r, color.g, color.b, self._HEATMAP_MAX_ALPHA * count // max_count)
+                    rect = (round(left + col_index * cell_width), round(top + row_index * cell_height), round(cell_width) + 1, round(cell_height) + 1)
+                    heatmap_surface.fill(cell_color, rect)
+        self.screen.blit(heatmap_surface, (0, 0))
+
+    def _draw_tree_partitions(self, color):
+        """
+        Blits the partition lines, which are only redrawn when the tree subdivides or collapses.
+        """
+        key = (self._tree.structure_version, tuple(color), self._zoom)
+        if self._partition_surface is None or self._partition_surface_key != key:
+            self._partition_surface = pygame.Surface(self.size(), pygame.SRCALPHA)
+            self._draw_tree_partitions_helper(self._partition_surface, self._tree, color)
+            self._partition_surface_key = key
+        self.screen.blit(self._partition_surface, (0, 0))
+
+    def _draw_tree_partitions_helper(self, surface, tree, color):
         if not tree._has_subdivided():
             return
 
-        center_x = tree.boundary.center_x
-        center_y = tree.boundary.center_y
-        pygame.draw.line(self.screen, color, (tree.boundary.x_min(), center_y), (tree.boundary.x_max(), center_y))
-        pygame.draw.line(self.screen, color, (center_x, tree.boundary.y_min()), (center_x, tree.boundary.y_max()))
+        x_min, y_min = self._to_screen_position(tree.boundary.x_min(), tree.boundary.y_min())
+        x_max, y_max = self._to_screen_position(tree.boundary.x_max(), tree.boundary.y_max())
+        center_x, center_y = self._to_screen_position(tree.boundary.center_x, tree.boundary.center_y)
+        pygame.draw.line(surface, color, (x_min, center_y), (x_max, center_y))
+        pygame.draw.line(surface, color, (center_x, y_min), (center_x, y_max))
 
         for subtree in tree._subtree_iterator():
-            self._draw_tree_partitions_helper(subtree, color)
+            self._draw_tree_partitions_helper(surface, subtree, color)
 
     def _draw_collision_area_stats(self, color):
-        message_background_surface = pygame.Surface((7*self._COLLISION_STATS_FONT_SIZE, self._COLLISION_STATS_FONT_SIZE))
+        query_stats = self._collision_area_query_stats
+        messages = [
+            'Compare {}/{} points'.format(len(self._collision_area_watcher), len(self._get_points())),
+            'Visited {} nodes, tested {} points'.format(query_stats.nodes_visited, query_stats.points_tested),
+        ]
+
+        message_background_surface = pygame.Surface((10*self._COLLISION_STATS_FONT_SIZE, len(messages)*self._COLLISION_STATS_FONT_SIZE))
         message_background_surface = message_background_surface.convert_alpha()
         message_background_surface.fill(self._COLLISION_AREA_STATS_BACKGROUND_COLOR)
         self.screen.blit(message_background_surface, (0, 0))
 
-        message = 'Compare {}/{} points'.format(len(self._collision_area_points), len(self._get_points()))
+        for message_index, message in enumerate(messages):
+            message_surface = self._font.render(message, True, color)
+            message_rect = message_surface.get_rect()
+            message_rect.topleft = (5, 5 + message_index*self._COLLISION_STATS_FONT_SIZE)
+            self.screen.blit(message_surface, message_rect)
 
-        message_surface = self._font.render(message, True, color)
-        message_rect = message_surface.get_rect()
-        message_rect.topleft = (5, 5)
-        self.screen.blit(message_surface, message_rect)
+    def _draw_frame_times(self, color):
+        """
+        Lists the smoothed time of each stage of the frame, below the collision-area stats.
+        """
+        total_milliseconds = sum(self._stage_milliseconds.values())
+        messages = ['Frame {:.1f}ms ({:.0f} FPS max)'.format(total_milliseconds, 1000 / total_milliseconds if total_milliseconds else 0)]
+        messages.extend('  {} {:.1f}ms'.format(stage, self._stage_milliseconds[stage]) for stage in self._FRAME_STAGES if stage in self._stage_milliseconds)
 
-    def _draw_collision_lines(self, color):
-        for point in self._get_points():
-            collision_area_points = self._get_points_in_collision_area_for_point(point)
-            for other_point in collision_area_points:
-                pygame.draw.line(self.screen, color, (point.x, point.y), (other_point.x, other_point.y), self._POINT_RADIUS)
+        line_height = self._frame_times_font.get_linesize()
+        top = 2 * self._COLLISION_STATS_FONT_SIZE
+        message_surfaces = [self._frame_times_font.render(message, True, color) for message in messages]
+        width = 10 + max(message_surface.get_width() for message_surface in message_surfaces)
 
-def view_point_quad_tree(point_quad_tree):
-    viewer = PointQuadTreeViewer(point_quad_tree)
-    viewer.run()
+        message_background_surface = pygame.Surface((width, len(messages) * line_height + 10), pygame.SRCALPHA)
+        message_background_surface.fill(self._COLLISION_AREA_STATS_BACKGROUND_COLOR)
+        self.screen.blit(message_background_surface, (0, top))
+        self.screen.blits([(message_surface, (5, top + 5 + message_index * line_height)) for message_index, message_surface in enumerate(message_surfaces)], doreturn=False)
 
-class DiagnosticPointQuadTree(PointQuadTree):
-    def __init__(self, boundary, node_capacity):
+    def _draw_collision_lines(self, color):
         """
-        @param boundary AxisAlignedBoundingBox
-        @param node_capacity Integer the maximum number of points that each node in the tree can hold
+        Draws one line between each pair of points in each other's collision areas, from one query of the tree.
+        The lines are rasterized together, and written to the screen's pixels with one assignment.
         """
-        self.num_points = 0
-        super().__init__(boundary, node_capacity)
+        pairs = self._tree.query_point_pairs_in_range(self._simulation.collision_area_radius)
+        if not pairs:
+            return
 
-    def insert(self, point):
-        """
-        @param point Point
-        @return True if the point was inserted, false otherwise (if the point is not in the tree's region)
-        """
-        self.num_points += 1
-        super().insert(point)
+        segments = numpy.fromiter(
+            itertools.chain.from_iterable((point.x, point.y, other_point.x, other_point.y) for (point, other_point) in pairs),
+            dtype=float, count=4 * len(pairs)).reshape(-1, 4)
+        offset_x, offset_y = self._to_screen_position(0, 0)
+        segments = segments * self._zoom + (offset_x, offset_y, offset_x, offset_y)
+
+        mask = _get_segment_mask(segments, self._POINT_RADIUS, self.screen.get_size())
+        pixels = pygame.surfarray.pixels2d(self.screen)
+        pixels[mask] = self.screen.map_rgb(color)
+        # The screen stays locked until its pixel array is released.
+        del pixels
 
-def main():
+def _get_segment_mask(segments, width, size):
     """
-    Animate a PointQuadTree as points are added to it.
+    Rasterizes line segments all at once: samples each segment at every pixel along its longer axis, then
+    widens the samples with one shifted copy of the mask per pixel of a width-by-width square.
+    @param segments NumPy array of (x0, y0, x1, y1) rows
+    @param width Integer The lines' width, in pixels
+    @param size (width, height) of the surface.  Pixels outside of it are dropped.
+    @return NumPy array of Boolean of shape size, True for the lines' pixels
+
+    >>> mask = _get_segment_mask(numpy.array([[0, 0, 3, 0], [1, 2, 1, 2]]), 1, (3, 3))
+    >>> mask.T.astype(int)
+    array([[1, 1, 1],
+           [0, 0, 0],
+           [0, 1, 0]])
+    >>> _get_segment_mask(numpy.array([[0.0, 0.0, 2.0, 4.0]]), 2, (5, 6)).T.astype(int)
+    array([[1, 1, 0, 0, 0],
+           [1, 1, 0, 0, 0],
+           [1, 1, 1, 0, 0],
+           [0, 1, 1, 1, 0],
+           [0, 0, 1, 1, 0],
+           [0, 0, 1, 1, 0]])
     """
-    boundary_half_size = Point(BOUNDARY_WIDTH/2, BOUNDARY_HEIGHT/2)
-    boundary = AxisAlignedBoundingBox(
-        center_x=boundary_half_size.x,
-        center_y=boundary_half_size.y,
-        half_size_x=boundary_half_size.x,
-        half_size_y=boundary_half_size.y)
-    tree = DiagnosticPointQuadTree(boundary=boundary, node_capacity=QUAD_TREE_NODE_CAPACITY)
-
-    view_point_quad_tree(tree)
+    x0s, y0s, x1s, y1s = segments.T
+    dxs = x1s - x0s
+    dys = y1s - y0s
+    step_counts = numpy.maximum(numpy.ceil(numpy.maximum(numpy.abs(dxs), numpy.abs(dys))), 1).astype(numpy.intp)
+
+    # Sample i of segment j is at step_indices[i] of step_counts[j] steps along it.  Each axis is indexed
+    # separately, since gathering rows of a two-dimensional array is several times slower.
+    segment_indices = numpy.repeat(numpy.arange(len(segments)), step_counts + 1)
+    first_samples = numpy.cumsum(step_counts + 1) - (step_counts + 1)
+    step_indices = numpy.arange(len(segment_indices)) - first_samples[segment_indices]
+    fractions = step_indices / step_counts[segment_indices]
+
+    # The samples are marked in a mask padded by width on each side, so that the shifted copies stay in bounds.
+    width_x, width_y = size
+    padded_mask = numpy.zeros((width_x + 2 * width, width_y + 2 * width), dtype=bool)
+    xs = numpy.rint(x0s[segment_indices] + dxs[segment_indices] * fractions).astype(numpy.intp) + width
+    ys = numpy.rint(y0s[segment_indices] + dys[segment_indices] * fractions).astype(numpy.intp) + width
+    is_inside = (xs >= 0) & (xs < width_x + 2 * width) & (ys >= 0) & (ys < width_y + 2 * width)
+    padded_mask[xs[is_inside], ys[is_inside]] = True
+
+    # A sample at x widens to the pixels from x - (width - 1) // 2 to x + width // 2.
+    mask = numpy.zeros(size, dtype=bool)
+    offsets = range(-((width - 1) // 2), width // 2 + 1)
+    for offset_x in offsets:
+        for offset_y in offsets:
+            mask |= padded_mask[width - offset_x:width - offset_x + width_x, width - offset_y:width - offset_y + width_y]
+    return mask
 
 def run_tests():
     """
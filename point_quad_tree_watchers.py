@@ -0,0 +1,92 @@
+"""
+Standing queries of the points in a region of a PointQuadTree.
+
+Add a watcher with PointQuadTree.add_region_watcher.  The tree keeps each watcher's points up to date as
+points are inserted, removed, and translated, and calls its on_enter and on_leave callbacks as they change.
+Each watcher is registered on the lowest node whose boundary contains its region, so a mutation only checks
+the watchers registered on the nodes that contain the points it moves, rather than every watcher.
+
+The callbacks must not mutate the tree.
+"""
+
+
+class RegionWatcher:
+    """
+    The points of a PointQuadTree in a region, which the tree updates incrementally.
+
+    >>> entered, left = [], []
+    >>> watcher = RegionWatcher(region=None, on_enter=entered.append, on_leave=left.append)
+    >>> p1, p2 = object(), object()
+    >>> watcher._update_point(p1, True)
+    >>> watcher._update_point(p1, True)
+    >>> watcher._update_point(p2, False)
+    >>> len(watcher), p1 in watcher, p2 in watcher, entered == [p1], left
+    (1, True, False, True, [])
+    >>> watcher._update_points([p2])
+    >>> watcher.points() == [p2], entered == [p1, p2], left == [p1]
+    (True, True, True)
+    """
+
+    def __init__(self, region, on_enter=None, on_leave=None):
+        """
+        @param region AxisAlignedBoundingBox
+        @param on_enter function(Point) Called when a point enters the region
+        @param on_leave function(Point) Called when a point leaves the region, including by being removed from the tree
+        """
+        self.region = region
+        self._on_enter = on_enter
+        self._on_leave = on_leave
+
+        # {id(point): point} of the points in the region.
+        self._points = {}
+
+    def points(self):
+        """
+        @return an array of the Point's in the region, in the order that they entered it
+        """
+        return list(self._points.values())
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, point):
+        return id(point) in self._points
+
+    def _update_point(self, point, is_in_region):
+        """
+        Calls on_enter or on_leave if the point entered or left the region.
+        """
+        if is_in_region:
+            if id(point) not in self._points:
+                self._points[id(point)] = point
+                if self._on_enter is not None:
+                    self._on_enter(point)
+        elif self._points.pop(id(point), None) is not None:
+            if self._on_leave is not None:
+                self._on_leave(point)
+
+    def _update_points(self, points):
+        """
+        @param points iterable(Point) All of the points in the region
+        """
+        points = list(points)
+        point_ids = set(map(id, points))
+        for point in [point for point_id, point in self._points.items() if point_id not in point_ids]:
+            self._update_point(point, False)
+        for point in points:
+            self._update_point(point, True)
+
+    def __repr__(self):
+        return 'RegionWatcher<region={}, points={}>'.format(self.region, len(self._points))
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__])
+
+if __name__ == '__main__':
+    run_tests()
@@ -0,0 +1,206 @@
+"""
+Simple polygons, for querying the points in a geofence.
+"""
+
+
+class BoxClassification:
+    """
+    Where a box is relative to a shape.
+    """
+    outside = 0
+    crossing = 1
+    inside = 2
+
+
+class Polygon:
+    """
+    A simple polygon.  Points on its edges are inside it, as points on the edges of an AxisAlignedBoundingBox are.
+
+    >>> square_with_notch = Polygon([(0, 0), (4, 0), (4, 4), (2, 2), (0, 4)])
+    >>> square_with_notch.contains(1, 1), square_with_notch.contains(2, 3), square_with_notch.contains(5, 1)
+    (True, False, False)
+
+    Points on the edges and vertices are inside:
+    >>> square_with_notch.contains(4, 2), square_with_notch.contains(0, 0), square_with_notch.contains(3, 3)
+    (True, True, True)
+    """
+
+    def __init__(self, vertices):
+        """
+        @param vertices iterable((x, y)) The polygon's vertices, in order.  The last vertex connects to the first.
+
+        A polygon needs at least 3 vertices:
+        >>> Polygon([(0, 0), (1, 1)])
+        Traceback (most recent call last):
+        AssertionError
+        """
+        self.vertices = [(x, y) for (x, y) in vertices]
+        assert len(self.vertices) >= 3
+
+        # The edges as (x1, y1, x2, y2).
+        self.edges = [vertex + next_vertex for vertex, next_vertex in zip(self.vertices, self.vertices[1:] + self.vertices[:1])]
+
+        self.x_min = min(x for (x, y) in self.vertices)
+        self.x_max = max(x for (x, y) in self.vertices)
+        self.y_min = min(y for (x, y) in self.vertices)
+        self.y_max = max(y for (x, y) in self.vertices)
+
+    def contains(self, x, y):
+        """
+        @return True if (x, y) is inside the polygon or on its edges
+        """
+        if not (self.x_min <= x <= self.x_max and self.y_min <= y <= self.y_max):
+            return False
+
+        # Count the edges that a ray from (x, y) in the +x direction crosses.
+        is_inside = False
+        for (x1, y1, x2, y2) in self.edges:
+            if (y1 > y) != (y2 > y):
+                crossing_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+                if x < crossing_x:
+                    is_inside = not is_inside
+                elif x == crossing_x:
+                    return True
+            elif (y1 == y or y2 == y) and Polygon._is_on_segment(x, y, x1, y1, x2, y2):
+                # A horizontal edge, or a vertex, at the point's height.
+                return True
+        return is_inside
+
+    def contains_point(self, point):
+        return self.contains(point.x, point.y)
+
+    def get_box_contains_point(self, box, crossing_edges):
+        """
+        Tests points in a box that the polygon crosses against only the edges that cross the box.
+
+        A point is inside the polygon if the box's center is and the segment between them crosses an even
+        number of edges, or if the center is not and the segment crosses an odd number.  The segment is
+        inside the box, so only the edges that cross the box can cross it.  The center is tested once,
+        against every edge.  Points whose segment touches a vertex or runs along an edge fall back to contains().
+
+        @param box AxisAlignedBoundingBox
+        @param crossing_edges The edges that cross the box, from classify_box
+        @return function(Point) -> Boolean, which is only correct for points in the box
+
+        >>> from point import Point
+        >>> from axis_aligned_bounding_box import AxisAlignedBoundingBox
+        >>> notch = Polygon([(0, 0), (8, 0), (8, 8), (4, 2), (0, 8)])
+        >>> box = AxisAlignedBoundingBox(center_x=4, center_y=4, half_size_x=4, half_size_y=4)
+        >>> contains_point = notch.get_box_contains_point(box, notch.classify_box(box)[1])
+        >>> [contains_point(point) for point in (Point(1, 1), Point(7, 7), Point(2, 5), Point(3, 3), Point(4, 2), Point(4, 3))]
+        [True, False, True, True, True, False]
+        """
+        center_x = box.center_x
+        center_y = box.center_y
+        is_center_inside = self.contains(center_x, center_y)
+
+        def contains_point(point):
+            x = point.x
+            y = point.y
+            is_inside = is_center_inside
+            for (x1, y1, x2, y2) in crossing_edges:
+                center_side = (x2 - x1) * (center_y - y1) - (y2 - y1) * (center_x - x1)
+                point_side = (x2 - x1) * (y - y1) - (y2 - y1) * (x - x1)
+                if center_side == 0 or point_side == 0:
+                    return self.contains(x, y)
+                if (center_side > 0) != (point_side > 0):
+                    side_1 = (x - center_x) * (y1 - center_y) - (y - center_y) * (x1 - center_x)
+                    side_2 = (x - center_x) * (y2 - center_y) - (y - center_y) * (x2 - center_x)
+                    if side_1 == 0 or side_2 == 0:
+                        return self.contains(x, y)
+                    if (side_1 > 0) != (side_2 > 0):
+                        is_inside = not is_inside
+            return is_inside
+
+        return contains_point
+
+    def classify_box(self, box, edges=None):
+        """
+        @param box AxisAlignedBoundingBox
+        @param edges The edges that may cross the box, or None for all of them
+        @return (BoxClassification, crossing_edges), where crossing_edges are the edges that intersect the box.
+            Only these can cross a box inside of this one, so pass them when classifying its subdivisions.
+
+        >>> from axis_aligned_bounding_box import AxisAlignedBoundingBox
+        >>> triangle = Polygon([(0, 0), (8, 0), (0, 8)])
+        >>> triangle.classify_box(AxisAlignedBoundingBox(center_x=2, center_y=2, half_size_x=1, half_size_y=1))[0] == BoxClassification.inside
+        True
+        >>> triangle.classify_box(AxisAlignedBoundingBox(center_x=7, center_y=7, half_size_x=1, half_size_y=1))[0] == BoxClassification.outside
+        True
+        >>> classification, crossing_edges = triangle.classify_box(AxisAlignedBoundingBox(center_x=4, center_y=4, half_size_x=1, half_size_y=1))
+        >>> classification == BoxClassification.crossing, crossing_edges
+        (True, [(8, 0, 0, 8)])
+
+        A box around the whole polygon crosses it, and a box inside a polygon's hole is outside:
+        >>> triangle.classify_box(AxisAlignedBoundingBox(center_x=4, center_y=4, half_size_x=10, half_size_y=10))[0] == BoxClassification.crossing
+        True
+        >>> notch = Polygon([(0, 0), (8, 0), (8, 8), (4, 2), (0, 8)])
+        >>> notch.classify_box(AxisAlignedBoundingBox(center_x=4, center_y=6, half_size_x=1, half_size_y=1))[0] == BoxClassification.outside
+        True
+        """
+        box_x_min = box.x_min()
+        box_x_max = box.x_max()
+        box_y_min = box.y_min()
+        box_y_max = box.y_max()
+        if box_x_min > self.x_max or box_x_max < self.x_min or box_y_min > self.y_max or box_y_max < self.y_min:
+            return BoxClassification.outside, []
+
+        if edges is None:
+            edges = self.edges
+        crossing_edges = [edge for edge in edges if segment_intersects_box(edge, box_x_min, box_x_max, box_y_min, box_y_max)]
+        if crossing_edges:
+            return BoxClassification.crossing, crossing_edges
+
+        # No edge enters the box, so it is all inside or all outside of the polygon, like its center.
+        if self.contains(box.center_x, box.center_y):
+            return BoxClassification.inside, crossing_edges
+        return BoxClassification.outside, crossing_edges
+
+    @staticmethod
+    def _is_on_segment(x, y, x1, y1, x2, y2):
+        if (x2 - x1) * (y - y1) != (y2 - y1) * (x - x1):
+            return False
+        return min(x1, x2) <= x <= max(x1, x2) and min(y1, y2) <= y <= max(y1, y2)
+
+
+def segment_intersects_box(segment, x_min, x_max, y_min, y_max):
+    """
+    Clips the segment to the box, with the Liang-Barsky algorithm.
+    @param segment (x1, y1, x2, y2)
+    @return True if any part of the segment, including its endpoints, is in the box
+
+    >>> segment_intersects_box((-1, 1, 3, 1), 0, 2, 0, 2), segment_intersects_box((-1, 3, 3, 3), 0, 2, 0, 2)
+    (True, False)
+    >>> segment_intersects_box((-1, 0, 0, -1), 0, 2, 0, 2), segment_intersects_box((-1, 1, 1, -1), 0, 2, 0, 2)
+    (False, True)
+    """
+    x1, y1, x2, y2 = segment
+    dx = x2 - x1
+    dy = y2 - y1
+    t_min = 0.0
+    t_max = 1.0
+    for p, q in ((-dx, x1 - x_min), (dx, x_max - x1), (-dy, y1 - y_min), (dy, y_max - y1)):
+        if p == 0:
+            if q < 0:
+                return False
+        else:
+            t = q / p
+            if p < 0:
+                t_min = max(t_min, t)
+            else:
+                t_max = min(t_max, t)
+            if t_min > t_max:
+                return False
+    return True
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__])
+
+if __name__ == '__main__':
+    run_tests()
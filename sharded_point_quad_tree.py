@@ -0,0 +1,354 @@
+"""
+A PointQuadTree front end that splits its boundary into a grid of shards, with each shard held
+by its own worker process.
+
+Each shard is a PointQuadTree in a dedicated single-worker ProcessPoolExecutor, so that the
+shard's state stays in one process.  Inserts are routed to the shard that owns the point's
+position, and queries go to every shard that the query region intersects.  The bulk methods,
+insert_points and query_points_in_regions, send one task per shard and let the shards run in
+parallel; use them rather than the single-point methods when throughput matters, because each
+single-point call waits on a round-trip to a worker process.
+
+Points are sent to the workers as (x, y, key) and the front end maps keys back to the original
+objects, so the points returned from queries are the points that were inserted.
+"""
+
+from point import Point
+from axis_aligned_bounding_box import AxisAlignedBoundingBox
+from point_quad_tree import PointQuadTree
+import concurrent.futures
+import itertools
+
+# Shard boundaries are padded by this fraction of their size, so that floating-point rounding can
+# not leave a point that was routed to a shard just outside of the shard's boundary.
+_SHARD_BOUNDARY_PADDING = 1e-9
+
+
+class ShardedPointQuadTree:
+    """
+    >>> boundary = AxisAlignedBoundingBox(center_x=0, center_y=0, half_size_x=4, half_size_y=4)
+    >>> tree = ShardedPointQuadTree(boundary=boundary, node_capacity=1, columns=2, rows=2)
+    >>> p1, p2, p3, p4 = Point(-1, -1), Point(1, 1), Point(0, 0), Point(4, 4)
+    >>> tree.insert_points([p1, p2, p3, p4, Point(5, 5)])
+    [True, True, True, True, False]
+    >>> sorted(tree.get_all_points())
+    [(-1,-1), (0,0), (1,1), (4,4)]
+
+    Queries return the inserted point objects:
+    >>> region = AxisAlignedBoundingBox(center_x=0.5, center_y=0.5, half_size_x=0.5, half_size_y=0.5)
+    >>> sorted(tree.query_points_in_region(region))
+    [(0,0), (1,1)]
+    >>> any(point is p3 for point in tree.query_points_in_region(region))
+    True
+    >>> [sorted(points) for points in tree.query_points_in_regions([boundary, AxisAlignedBoundingBox(center_x=-1, center_y=-1, half_size_x=0, half_size_y=0)])]
+    [[(-1,-1), (0,0), (1,1), (4,4)], [(-1,-1)]]
+
+    >>> tree.remove(p3)
+    True
+    >>> tree.remove(p3)
+    False
+
+    Translate a point into another shard, and out of the tree:
+    >>> tree.translate_point(p1, 3, 3) == PointQuadTree.TranslatePointResult.translated
+    True
+    >>> tree.translate_point(p2, 10, 10) == PointQuadTree.TranslatePointResult.removed
+    True
+    >>> sorted(tree.get_all_points())
+    [(2,2), (4,4)]
+    >>> tree.close()
+    """
+
+    def __init__(self, boundary, node_capacity, columns, rows):
+        """
+        @param boundary AxisAlignedBoundingBox
+        @param node_capacity Integer the maximum number of points that each node in each shard can hold
+        @param columns, rows Integer The shard grid's dimensions.  Each shard gets its own worker process.
+
+        The grid must have at least one shard:
+        >>> ShardedPointQuadTree(boundary=None, node_capacity=1, columns=0, rows=1)
+        Traceback (most recent call last):
+        AssertionError
+        """
+        assert node_capacity >= 1
+        assert columns >= 1 and rows >= 1
+
+        self.boundary = boundary
+        self._node_capacity = node_capacity
+        self._columns = columns
+        self._rows = rows
+        self._shard_boundaries = [self._calculate_shard_boundary(column, row) for row in range(rows) for column in range(columns)]
+        self._executors = [
+            concurrent.futures.ProcessPoolExecutor(max_workers=1, initializer=_initialize_shard, initargs=(shard_boundary, node_capacity))
+            for shard_boundary in self._shard_boundaries]
+
+        self._next_key = itertools.count()
+        self._keys_by_point_id = {}
+        self._points_by_key = {}
+
+    def close(self):
+        """
+        Shuts down the worker processes.
+        """
+        for executor in self._executors:
+            executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_all_points(self):
+        """
+        @return an array of all Point's contained in this tree
+        """
+        return self.query_points_in_region(self.boundary)
+
+    def query_points_in_region(self, region):
+        """
+        @param region AxisAlignedBoundingBox
+        @return an array of Point's in the region
+        """
+        return self.query_points_in_regions([region])[0]
+
+    def query_points_in_regions(self, regions):
+        """
+        Queries every shard in parallel, sending each shard only the regions that intersect it.
+
+        @param regions iteratable(AxisAlignedBoundingBox)
+        @return an array with one array of Point's per region
+        """
+        regions = list(regions)
+        futures = []
+        for shard_index, shard_boundary in enumerate(self._shard_boundaries):
+            indexed_regions = [
+                (region_index, _pack_region(region))
+                for region_index, region in enumerate(regions)
+                if shard_boundary.intersects(region)]
+            if indexed_regions:
+                futures.append(self._executors[shard_index].submit(_query_regions, indexed_regions))
+
+        results = [[] for region in regions]
+        for future in futures:
+            for region_index, keys in future.result():
+                results[region_index].extend(self._points_by_key[key] for key in keys)
+        return results
+
+    def insert(self, point):
+        """
+        @param point Point
+        @return True if the point was inserted, false otherwise (if the point is not in the tree's region, or is already in the tree)
+        """
+        return self.insert_points([point])[0]
+
+    def insert_points(self, points):
+        """
+        Inserts the points into every shard in parallel.
+
+        Points are tracked by identity, so unlike PointQuadTree, a point object can only be in the tree once.
+
+        @param points iteratable(Point)
+        @return an array with, for each point, True if the point was inserted, false otherwise (if the point is not in the tree's region, or is already in the tree)
+
+        >>> tree = ShardedPointQuadTree(boundary=AxisAlignedBoundingBox.positive_quadrant_box(4, 4), node_capacity=1, columns=2, rows=1)
+        >>> p = Point(1, 1)
+        >>> tree.insert(p), tree.insert(p), tree.insert_points([Point(3, 3), p])
+        (True, False, [True, False])
+        >>> tree.remove(p)
+        True
+        >>> tree.get_all_points()
+        [(3,3)]
+        >>> tree.remove(p), tree.translate_point(p, 1, 1) == PointQuadTree.TranslatePointResult.not_in_tree
+        (False, True)
+        >>> tree.close()
+        """
+        inserted = []
+        entries_by_shard = {}
+        for point in points:
+            if not self.boundary.contains_point(point) or id(point) in self._keys_by_point_id:
+                inserted.append(False)
+                continue
+
+            key = self._add_key(point)
+            entries_by_shard.setdefault(self._get_shard_index(point.x, point.y), []).append((point.x, point.y, key))
+            inserted.append(True)
+
+        futures = [self._executors[shard_index].submit(_insert_entries, entries) for shard_index, entries in entries_by_shard.items()]
+        for future in futures:
+            future.result()
+        return inserted
+
+    def remove(self, point):
+        """
+        @param point Point
+        @return True if the point was removed, false otherwise (if the point is not in the tree)
+        """
+        assert point
+
+        key = self._keys_by_point_id.get(id(point))
+        if key is None:
+            return False
+
+        shard_index = self._get_shard_index(point.x, point.y)
+        point_was_removed = self._executors[shard_index].submit(_remove_entry, key).result()
+        if point_was_removed:
+            self._remove_key(point)
+        return point_was_removed
+
+    def translate_point(self, point, x, y):
+        """
+        If the translated position is outside the tree's boundary, the point will be removed.
+
+        @param point Point
+        @param x, y Number The amount to translate the point by.
+        @return PointQuadTree.TranslatePointResult
+        """
+        assert point
+
+        if not self.boundary.contains_point(point):
+            return PointQuadTree.TranslatePointResult.out_of_bounds
+
+        key = self._keys_by_point_id.get(id(point))
+        if key is None:
+            return PointQuadTree.TranslatePointResult.not_in_tree
+
+        old_shard_index = self._get_shard_index(point.x, point.y)
+        point.translate(x, y)
+
+        if not self.boundary.contains_point(point):
+            self._executors[old_shard_index].submit(_remove_entry, key).result()
+            self._remove_key(point)
+            return PointQuadTree.TranslatePointResult.removed
+
+        new_shard_index = self._get_shard_index(point.x, point.y)
+        if new_shard_index == old_shard_index:
+            self._executors[old_shard_index].submit(_translate_entry, key, x, y).result()
+        else:
+            self._executors[old_shard_index].submit(_remove_entry, key).result()
+            self._executors[new_shard_index].submit(_insert_entries, [(point.x, point.y, key)]).result()
+        return PointQuadTree.TranslatePointResult.translated
+
+    def _add_key(self, point):
+        key = next(self._next_key)
+        self._keys_by_point_id[id(point)] = key
+        self._points_by_key[key] = point
+        return key
+
+    def _remove_key(self, point):
+        key = self._keys_by_point_id.pop(id(point))
+        del self._points_by_key[key]
+
+    def _get_shard_index(self, x, y):
+        """
+        @return the index of the shard that owns the position, which must be in the tree's boundary
+
+        >>> tree = ShardedPointQuadTree.__new__(ShardedPointQuadTree)
+        >>> tree.boundary = AxisAlignedBoundingBox.positive_quadrant_box(4, 2)
+        >>> tree._columns, tree._rows = 2, 2
+        >>> [tree._get_shard_index(x, y) for (x, y) in ((0, 0), (3, 0), (0, 1.5), (4, 2))]
+        [0, 1, 2, 3]
+        """
+        column = int((x - self.boundary.x_min()) / (2 * self.boundary.half_size_x) * self._columns)
+        row = int((y - self.boundary.y_min()) / (2 * self.boundary.half_size_y) * self._rows)
+
+        # Points on the boundary's maximum edges belong to the last column or row.
+        column = min(column, self._columns - 1)
+        row = min(row, self._rows - 1)
+        return row * self._columns + column
+
+    def _calculate_shard_boundary(self, column, row):
+        """
+        >>> tree = ShardedPointQuadTree.__new__(ShardedPointQuadTree)
+        >>> tree.boundary = AxisAlignedBoundingBox.positive_quadrant_box(4, 2)
+        >>> tree._columns, tree._rows = 2, 1
+        >>> tree._calculate_shard_boundary(1, 0)
+        AABB<center=(3.0,1.0), half_size=(1.000000001,1.000000001)>
+        """
+        shard_half_size_x = self.boundary.half_size_x / self._columns
+        shard_half_size_y = self.boundary.half_size_y / self._rows
+        return AxisAlignedBoundingBox(
+            center_x=self.boundary.x_min() + (2 * column + 1) * shard_half_size_x,
+            center_y=self.boundary.y_min() + (2 * row + 1) * shard_half_size_y,
+            half_size_x=shard_half_size_x * (1 + _SHARD_BOUNDARY_PADDING),
+            half_size_y=shard_half_size_y * (1 + _SHARD_BOUNDARY_PADDING))
+
+
+def _pack_region(region):
+    """
+    @return the region as a tuple, which is cheaper to send to a worker process
+    """
+    return (region.center_x, region.center_y, region.half_size_x, region.half_size_y)
+
+
+class _ShardPoint(Point):
+    def __init__(self, x, y, key):
+        super().__init__(x, y)
+        self.key = key
+
+
+# The shard held by the current worker process.
+_shard_tree = None
+_shard_points_by_key = None
+
+
+def _initialize_shard(boundary, node_capacity):
+    global _shard_tree, _shard_points_by_key
+    _shard_tree = PointQuadTree(boundary=boundary, node_capacity=node_capacity)
+    _shard_points_by_key = {}
+
+
+def _insert_entries(entries):
+    """
+    @param entries iteratable((x, y, key))
+    """
+    for x, y, key in entries:
+        point = _ShardPoint(x, y, key)
+        point_was_inserted = _shard_tree.insert(point)
+        assert point_was_inserted
+        _shard_points_by_key[key] = point
+
+
+def _remove_entry(key):
+    """
+    @return True if the point was removed, false otherwise (if the point is not in the shard)
+    """
+    point = _shard_points_by_key.pop(key, None)
+    if point is None:
+        return False
+    return _shard_tree.remove(point)
+
+
+def _translate_entry(key, x, y):
+    """
+    The front end only translates points within a shard, so the point can not leave the shard.
+    """
+    point = _shard_points_by_key[key]
+    translate_result = _shard_tree.translate_point(point, x, y)
+    assert translate_result == PointQuadTree.TranslatePointResult.translated
+
+
+def _query_regions(indexed_regions):
+    """
+    @param indexed_regions iteratable((region_index, (center_x, center_y, half_size_x, half_size_y)))
+    @return an array of (region_index, array(key))
+    """
+    results = []
+    for region_index, packed_region in indexed_regions:
+        region = AxisAlignedBoundingBox(*packed_region)
+        results.append((region_index, [point.key for point in _shard_tree.query_points_in_region(region)]))
+    return results
+
+
+def run_tests():
+    """
+    @return (failure_count, test_count)
+    """
+    import point_quad_tree
+    module_dependencies = [point_quad_tree]
+
+    import sys
+    import test
+    return test.run_doctests(sys.modules[__name__], module_dependencies)
+
+if __name__ == '__main__':
+    run_tests()